@@ -0,0 +1,131 @@
+# Хранение хешей паролей и проверка учётных данных Basic Auth
+# Модуль для безопасного сравнения строк за постоянное время
+import hmac
+# Модуль хеш-функций (PBKDF2, SHA-256)
+import hashlib
+# Модуль для генерации соли и ключа кеша
+import secrets
+# Модуль для блокировки кеша между потоками
+import threading
+# Модуль для измерения времени жизни записей кеша
+import time
+# Упорядоченный словарь для LRU-кеша
+from collections import OrderedDict
+# Модуль для кодирования соли и хеша в строку
+import base64
+# Импорт типов для аннотаций
+from typing import Dict, Optional, Tuple
+
+# Количество итераций PBKDF2 (чем больше, тем медленнее перебор паролей)
+PBKDF2_ITERATIONS = 100_000
+
+
+# Хеширование пароля: строка вида pbkdf2_sha256$итерации$соль$хеш
+def hash_password(password: str, iterations: int = PBKDF2_ITERATIONS, salt: Optional[bytes] = None) -> str:
+    salt = salt or secrets.token_bytes(16)  # Случайная соль для каждого пароля
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    b64 = lambda b: base64.b64encode(b).decode()  # noqa: E731
+    return f"pbkdf2_sha256${iterations}${b64(salt)}${b64(digest)}"
+
+
+# Проверка пароля по сохранённому хешу (сравнение за постоянное время)
+def verify_password(password: str, encoded: str) -> bool:
+    try:
+        algorithm, iterations, salt, expected = encoded.split("$")
+    except ValueError:
+        return False
+    if algorithm != "pbkdf2_sha256":
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), base64.b64decode(salt), int(iterations))
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+# Проверка учётных данных с LRU-кешем успешных проверок
+class Authenticator:
+    """Медленный PBKDF2 выполняется только при первой проверке пары логин/пароль.
+    Успешные проверки кешируются на ttl секунд (не больше cache_size записей).
+    В кеше хранится HMAC от логина и пароля с секретным ключом процесса, а не сам пароль.
+    """
+
+    def __init__(self, users: Dict[str, str], cache_size: int = 1024, ttl: float = 300.0,
+                 token_secret: Optional[bytes] = None):
+        self._hashes = dict(users)  # Логин -> хеш пароля
+        self.cache_size = cache_size  # Максимум записей в кеше (0 - кеш выключен)
+        self.ttl = ttl  # Время жизни записи кеша в секундах
+        self._cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()  # Ключ -> (логин, срок)
+        self._lock = threading.Lock()  # Кеш используется из потоков пула
+        self._key = secrets.token_bytes(32)  # Секрет процесса для ключей кеша
+        # Ключ подписи коротких токенов (общий для воркеров, если задан явно)
+        self._token_key = token_secret or secrets.token_bytes(32)
+        # Хеш-заглушка: проверка несуществующего логина занимает столько же времени
+        self._dummy_hash = hash_password(secrets.token_hex(8))
+
+    def _cache_key(self, username: str, password: str) -> bytes:
+        return hmac.new(self._key, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+    def verify(self, username: str, password: str) -> bool:
+        key = self._cache_key(username, password) if self.cache_size > 0 else None
+        if key is not None:
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    cached_user, expires = entry
+                    # Ключ кеша уже включает пароль, поэтому совпадение ключа = совпадение пароля
+                    if cached_user == username and expires > time.monotonic():
+                        self._cache.move_to_end(key)  # Недавно использованная запись
+                        return True
+                    del self._cache[key]  # Запись устарела
+        encoded = self._hashes.get(username)
+        # Для неизвестного логина тоже выполняется PBKDF2 (время ответа не выдаёт существование логина)
+        ok = verify_password(password, encoded or self._dummy_hash) and encoded is not None
+        if ok and key is not None:
+            with self._lock:
+                self._cache[key] = (username, time.monotonic() + self.ttl)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)  # Вытеснение самой давней записи
+        return ok
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self._token_key, payload.encode(), hashlib.sha256).hexdigest()
+
+    def issue_token(self, username: str, ttl: float) -> str:
+        # Короткоживущий токен для клиентов, которые не могут передать заголовок Authorization
+        # (EventSource): логин и срок действия, подписанные HMAC
+        payload = f"{username}:{int(time.time() + ttl)}"
+        return base64.urlsafe_b64encode(f"{payload}:{self._sign(payload)}".encode()).decode()
+
+    def verify_token(self, token: str) -> Optional[str]:
+        # Логин из действительного токена или None (подпись не совпала или срок истёк)
+        try:
+            payload, signature = base64.urlsafe_b64decode(token.encode()).decode().rsplit(":", 1)
+            username, expires = payload.rsplit(":", 1)
+            expired = int(expires) < time.time()
+        except ValueError:  # Повреждённый токен (в том числе ошибки base64 и UTF-8)
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)) or expired:
+            return None
+        return username
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл auth.py - хранение паролей в виде хешей и проверка учётных данных для
+#    функции authenticate_user из main.py
+
+# 2. Функции hash_password / verify_password - PBKDF2-HMAC-SHA256 со случайной солью.
+#    Результат проверки сравнивается hmac.compare_digest (за постоянное время)
+
+# 3. Класс Authenticator - кеш успешных проверок (LRU с ограничением размера и TTL),
+#    чтобы медленный PBKDF2 не выполнялся на каждый запрос. Настраивается переменными
+#    окружения AUTH_CACHE_SIZE (0 - без кеша) и AUTH_CACHE_TTL. Пароли задаются при
+#    создании (USERS в main.py), смены пароля во время работы нет - запись кеша
+#    действует не дольше AUTH_CACHE_TTL
+
+# 4. Методы issue_token / verify_token - короткоживущие токены для браузерного EventSource,
+#    который не умеет отправлять заголовок Authorization. Токен подписан HMAC ключом
+#    token_secret (переменная EVENTS_TOKEN_SECRET в main.py; без неё - случайный ключ процесса,
+#    и при нескольких воркерах токен действует только в выдавшем его процессе)
+# */
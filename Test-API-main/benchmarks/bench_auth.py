@@ -0,0 +1,27 @@
+# Пропускная способность аутентифицированных запросов с кешем проверок паролей и без него
+# Запуск из папки Test-API-main: python benchmarks/bench_auth.py [число запросов]
+import sys
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main  # noqa: E402
+from auth import Authenticator  # noqa: E402
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500  # Запросов на каждый режим
+AUTH = ("admin", "123")
+
+client = TestClient(main.app)
+for cache_size in (1024, 0):
+    # Подмена объекта проверки: authenticate_user берёт main.authenticator при каждом вызове
+    main.authenticator = Authenticator(main.USERS, cache_size=cache_size)
+    client.get("/api/me", auth=AUTH)  # Прогрев (первая проверка всегда выполняет PBKDF2)
+    t0 = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get("/api/me", auth=AUTH).raise_for_status()
+    elapsed = time.perf_counter() - t0
+    mode = "кеш включён " if cache_size else "кеш выключен"
+    print(f"{mode}: {REQUESTS / elapsed:8.0f} запросов/с  ({elapsed / REQUESTS * 1000:.2f} мс на запрос)")
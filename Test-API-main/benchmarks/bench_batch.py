@@ -0,0 +1,57 @@
+# Импорт 10 000 элементов: пакетные маршруты :batch против запросов по одному элементу
+# Запуск из папки Test-API-main: python benchmarks/bench_batch.py [число элементов]
+# Бэкенд хранения - как у приложения (STORAGE_BACKEND, STORAGE_DIR)
+import os
+import sys
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Замер производительности, а не лимитов: ограничение частоты запросов выключено
+os.environ.setdefault("RATE_LIMIT", "0")
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main  # noqa: E402
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+AUTH = ("admin", "123")
+client = TestClient(main.app)
+client.get("/api/me", auth=AUTH)  # Прогрев кеша проверки пароля
+
+
+def report(name: str, elapsed: float):
+    print(f"{name:32} {elapsed:7.2f} с  {ITEMS / elapsed:9.0f} элементов/с")
+
+
+# Пользователи: по одному (POST /api/users) и одним пакетом (POST /api/users:batch)
+t0 = time.perf_counter()
+for i in range(ITEMS):
+    client.post("/api/users", json={"name": f"Пользователь {i}", "email": f"single{i}@example.com"}, auth=AUTH).raise_for_status()
+report("POST /api/users x N", time.perf_counter() - t0)
+t0 = time.perf_counter()
+users = [{"name": f"Пользователь {i}", "email": f"batch{i}@example.com"} for i in range(ITEMS)]
+client.post("/api/users:batch", json=users, auth=AUTH).raise_for_status()
+report("POST /api/users:batch", time.perf_counter() - t0)
+
+# Посты
+post = {"title": "Заголовок", "content": "Содержание поста", "author": "bench"}
+t0 = time.perf_counter()
+for _ in range(ITEMS):
+    client.post("/api/posts", json=post, auth=AUTH).raise_for_status()
+report("POST /api/posts x N", time.perf_counter() - t0)
+t0 = time.perf_counter()
+client.post("/api/posts:batch", json=[post] * ITEMS, auth=AUTH).raise_for_status()
+report("POST /api/posts:batch", time.perf_counter() - t0)
+
+# Оценки студентов: N изменений по кругу (в пакете каждый студент встречается один раз)
+ids = list(main.students_db)
+t0 = time.perf_counter()
+for i in range(ITEMS):
+    client.put(f"/api/students/{ids[i % len(ids)]}/grade", json={"grade": i % 13}, auth=AUTH).raise_for_status()
+report("PUT /api/students/{id}/grade x N", time.perf_counter() - t0)
+t0 = time.perf_counter()
+for start in range(0, ITEMS, len(ids)):
+    patch = [{"id": sid, "grade": (start + j) % 13} for j, sid in enumerate(ids)]
+    client.patch("/api/students:batch", json=patch, auth=AUTH).raise_for_status()
+report(f"PATCH /api/students:batch ({len(ids)} шт.)", time.perf_counter() - t0)
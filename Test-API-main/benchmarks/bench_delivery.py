@@ -0,0 +1,61 @@
+# Объём и задержка ответов: без сжатия, gzip и brotli; запросы Range к загрузкам
+# Запуск из папки Test-API-main: python benchmarks/bench_delivery.py [число постов]
+import io
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Замер производительности, а не лимитов: ограничение частоты запросов выключено
+os.environ.setdefault("RATE_LIMIT", "0")
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main  # noqa: E402
+
+POSTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+REPEAT = 20
+AUTH = ("admin", "123")
+WORDS = "урок студент преподаватель python typescript react задача код функция компонент состояние".split()
+
+client = TestClient(main.app)
+for i in range(POSTS):
+    content = " ".join(WORDS[(i + k) % len(WORDS)] for k in range(60))
+    client.post("/api/posts", json={"title": f"Пост {i}", "content": content, "author": f"автор{i % 20}"}, auth=AUTH)
+
+
+# Средний размер тела на проводе и медиана задержки
+def measure(url: str, headers: dict):
+    sizes, times = [], []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        # stream: тело читается без распаковки, как оно передаётся по сети
+        with client.stream("GET", url, headers=headers, auth=AUTH) as r:
+            wire = sum(len(chunk) for chunk in r.iter_raw())
+        times.append(time.perf_counter() - t0)
+        sizes.append(wire)
+    return statistics.mean(sizes), statistics.median(times) * 1000, r.headers.get("content-encoding") or "-"
+
+
+print(f"постов: {POSTS}")
+for url in ["/api/posts", "/api/posts?_sort=title", "/api/posts?_limit=20"]:
+    for accept in ["identity", "gzip", "br"]:
+        size, ms, encoding = measure(url, {"accept-encoding": accept})
+        print(f"{url:26} {accept:9} -> {encoding:5} {size / 1024:9.1f} КБ  {ms:7.2f} мс")
+
+# Загрузка: полный файл против первых 64 КБ (Range) и сжатой копии
+image = io.BytesIO(bytes(range(256)) * 4096 * 4)  # 4 МБ несжимаемых байт
+post = client.post(
+    "/api/posts/upload", data={"title": "f", "content": "c", "author": "bench"},
+    files={"image_file": ("big.bmp", image.getvalue(), "image/bmp")}, auth=AUTH,
+).json()
+url = f"/uploads/{post['image_file']}"
+for label, headers in [("полный файл", {"accept-encoding": "identity"}), ("Range 64 КБ", {"range": "bytes=0-65535"})]:
+    size, ms, _ = measure(url, headers)
+    print(f"{label:26} {size / 1024:9.1f} КБ  {ms:7.2f} мс")
+main.precompress(main.UPLOAD_DIR / post["image_file"])
+size, ms, encoding = measure(url, {"accept-encoding": "br, gzip"})
+print(f"{'сжатая копия':26} -> {encoding:5} {size / 1024:9.1f} КБ  {ms:7.2f} мс")
+client.delete(f"/api/posts/{post['id']}", auth=AUTH)
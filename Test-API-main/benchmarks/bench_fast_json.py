@@ -0,0 +1,43 @@
+# Сравнение GET /api/posts с обычной сериализацией response_model и в быстром режиме FAST_JSON
+# Запуск из папки Test-API-main: python benchmarks/bench_fast_json.py [размеры...]
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main  # noqa: E402
+
+SIZES = [int(a) for a in sys.argv[1:]] or [1_000, 10_000]  # Количество постов
+AUTH = ("admin", "123")
+client = TestClient(main.app)
+client.get("/api/me", auth=AUTH)  # Прогрев кеша проверки пароля
+
+for n in SIZES:
+    # Наполнение хранилища напрямую (через API это заняло бы больше времени, чем сам замер)
+    for pid in list(main.posts_db):
+        main.posts_db.pop(pid)
+    base = datetime.now()
+    for i in range(n):
+        post = main.Post(
+            id=str(uuid.uuid4()), title=f"Пост {i}", content="Содержание поста " * 10, author="bench",
+            created_at=base + timedelta(microseconds=i), updated_at=base + timedelta(microseconds=i),
+        )
+        main.posts_db.save(post)
+    repeat = max(5, 20_000 // n)
+    results = {}
+    for fast in (False, True):
+        main.FAST_JSON = fast
+        client.get("/api/posts", auth=AUTH)  # Прогрев (в быстром режиме заполняет кеш JSON)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            body = client.get("/api/posts", auth=AUTH).content
+        results[fast] = (time.perf_counter() - t0) / repeat * 1000
+    print(
+        f"n={n:>6,}  response_model: {results[False]:8.1f} мс  FAST_JSON: {results[True]:7.1f} мс  "
+        f"ускорение x{results[False] / results[True]:.1f}  ({len(body) / 1024:,.0f} КБ)"
+    )
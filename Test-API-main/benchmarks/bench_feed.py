@@ -0,0 +1,88 @@
+# Рассылка ленты изменений 1 000 подписчикам: время доставки событий и отключение медленных
+# Запуск из папки Test-API-main: python benchmarks/bench_feed.py [подписчиков] [событий] [событий/с]
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from feed import ChangeHub, SubscriberEvicted  # noqa: E402
+
+SUBSCRIBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+EVENTS = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+RATE = float(sys.argv[3]) if len(sys.argv) > 3 else 200  # Темп публикации (изменений в секунду)
+
+
+async def main():
+    hub = ChangeHub(queue_size=256)
+    sent_at = {}  # Номер события -> время публикации
+    latencies = []  # Задержка доставки (публикация -> получение подписчиком)
+    done = asyncio.Event()
+    remaining = SUBSCRIBERS
+    delivered = 0  # Всего доставленных событий
+
+    async def subscriber():
+        nonlocal remaining, delivered
+        sub, _ = hub.subscribe()
+        received = 0
+        try:
+            while received < EVENTS:
+                frames = await sub.get()
+                now = time.perf_counter()
+                for frame in frames:
+                    seq = int(frame.split(b"\n", 1)[0][4:])  # Строка "id: N"
+                    latencies.append(now - sent_at[seq])
+                received += len(frames)
+        except SubscriberEvicted:  # Не успел за публикацией (очередь переполнена)
+            pass
+        delivered += received
+        remaining -= 1
+        if not remaining:
+            done.set()
+
+    # Медленный подписчик: никогда не читает и должен быть отключён, не задерживая остальных
+    slow, _ = hub.subscribe()
+    tasks = [asyncio.create_task(subscriber()) for _ in range(SUBSCRIBERS)]
+    await asyncio.sleep(0)  # Подписка всех задач
+
+    # Публикация из отдельного потока - как из синхронных маршрутов в пуле потоков
+    def publisher():
+        start = time.perf_counter()
+        for i in range(EVENTS):
+            data = [{"id": i % 5 + 1, "grade": i % 13}]
+            sent_at[hub.seq + 1] = time.perf_counter()
+            hub.publish("students", data)
+            delay = start + (i + 1) / RATE - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    t0 = time.perf_counter()
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    await done.wait()
+    elapsed = time.perf_counter() - t0
+    thread.join()
+    await asyncio.gather(*tasks)
+    try:
+        await slow.get(timeout=0)
+        evicted = False
+    except SubscriberEvicted:
+        evicted = True
+    latencies.sort()
+    print(
+        f"подписчиков {SUBSCRIBERS:,}, событий {EVENTS:,} ({RATE:,.0f}/с): доставлено {delivered:,} за {elapsed:.2f} с "
+        f"({delivered / elapsed:,.0f} доставок/с)"
+    )
+    print(
+        f"задержка доставки: p50 {statistics.median(latencies) * 1000:.2f} мс, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс, max {latencies[-1] * 1000:.2f} мс"
+    )
+    print(f"медленный подписчик отключён: {'да' if evicted else 'нет'} (всего отключений: {hub.evictions})")
+    if hub.evictions > 1:
+        print("рассылка не успевает за таким темпом публикации - уменьшите темп или число подписчиков")
+
+
+asyncio.run(main())
@@ -0,0 +1,53 @@
+# Бенчмарк пагинации постов: прежний подход (копия + сортировка + срез) против PostStore
+# Запуск из папки Test-API-main: python benchmarks/bench_posts_store.py [размеры...]
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from store import PostStore  # noqa: E402
+
+SIZES = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]  # Размеры хранилища
+LIMIT = 10  # Размер страницы (_limit=10)
+REPEAT = 50  # Количество запросов страницы на каждый замер
+
+
+# Прежняя реализация get_posts
+def naive_page(posts_db: dict, start: int, limit: int):
+    posts = list(posts_db.values())
+    posts.sort(key=lambda x: x.created_at)
+    return posts[start:][:limit]
+
+
+def measure(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000  # Среднее время в миллисекундах
+
+
+for n in SIZES:
+    base = datetime(2025, 1, 1)
+    plain: dict = {}
+    store = PostStore()
+    for i in range(n):
+        created = base + timedelta(seconds=i)
+        # Все поля, которые читают индексы PostStore (сортировка, автор, поиск)
+        p = SimpleNamespace(
+            id=f"p{i}", title=f"Пост {i}", content="текст", author=f"автор{i % 20}",
+            created_at=created, updated_at=created,
+        )
+        plain[p.id] = p
+        store[p.id] = p
+    middle = n // 2  # Страница из середины списка
+    _, cursor = store.page(start=middle - LIMIT, limit=LIMIT)
+    naive_ms = measure(lambda: naive_page(plain, middle, LIMIT), max(1, REPEAT * 10_000 // n))
+    start_ms = measure(lambda: store.page(start=middle, limit=LIMIT), REPEAT * 100)
+    cursor_ms = measure(lambda: store.page(limit=LIMIT, cursor=cursor), REPEAT * 100)
+    print(
+        f"n={n:>9,}  naive={naive_ms:9.3f} ms  store(_start)={start_ms:7.4f} ms  "
+        f"store(_cursor)={cursor_ms:7.4f} ms  speedup={naive_ms / cursor_ms:,.0f}x"
+    )
@@ -0,0 +1,49 @@
+# Фильтрация и сортировка постов: вторичные индексы против сортировки копии всего списка
+# Запуск из папки Test-API-main: python benchmarks/bench_query.py [число постов]
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from store import PostStore  # noqa: E402
+
+POSTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+AUTHORS = [f"автор{i}" for i in range(100)]
+
+random.seed(1)
+store = PostStore()
+base = datetime(2025, 1, 1)
+for i in range(POSTS):
+    created = base + timedelta(seconds=i)
+    store[f"p{i}"] = SimpleNamespace(
+        id=f"p{i}", title=f"Заголовок {random.randrange(POSTS)}", content="текст", author=random.choice(AUTHORS),
+        created_at=created, updated_at=created + timedelta(seconds=random.randrange(100_000)),
+    )
+middle = base + timedelta(seconds=POSTS // 2)
+
+# Запросы: (описание, параметры query, эквивалент через полную копию и сортировку)
+CASES = [
+    ("автор, по дате", dict(author="автор7"),
+     lambda: sorted((p for p in store.values() if p.author == "автор7"), key=lambda p: p.created_at)),
+    ("created_from, desc", dict(created=(middle, None), descending=True),
+     lambda: sorted((p for p in store.values() if p.created_at >= middle), key=lambda p: p.created_at, reverse=True)),
+    ("сортировка по title", dict(sort="title"),
+     lambda: sorted(store.values(), key=lambda p: p.title.casefold())),
+    ("updated_at + автор", dict(sort="updated_at", author="автор7"),
+     lambda: sorted((p for p in store.values() if p.author == "автор7"), key=lambda p: p.updated_at)),
+]
+
+for name, params, full_sort in CASES:
+    t0 = time.perf_counter()
+    for _ in range(20):
+        total, page = store.query(limit=20, **params)
+        list(page)
+    indexed_ms = (time.perf_counter() - t0) / 20 * 1000
+    t0 = time.perf_counter()
+    full_sort()[:20]
+    sorted_ms = (time.perf_counter() - t0) * 1000
+    print(f"{name:22} найдено {total:>7,}  индекс: {indexed_ms:8.2f} мс  копия+сортировка: {sorted_ms:8.1f} мс")
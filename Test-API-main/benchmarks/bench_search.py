@@ -0,0 +1,54 @@
+# Задержка поиска по постам: инвертированный индекс против линейного перебора
+# Запуск из папки Test-API-main: python benchmarks/bench_search.py [число постов]
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from search import tokenize  # noqa: E402
+from store import PostStore  # noqa: E402
+
+POSTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+QUERIES = ["ёлка", "студент python", "зимний лес", "урок", "редкоеслово"]
+VOCAB = (
+    "урок студент преподаватель python typescript react зимний лес ёлка снег задача код "
+    "функция компонент состояние запрос ответ сервер клиент база данных тест ошибка"
+).split() + [f"слово{i}" for i in range(5000)]
+
+random.seed(1)
+store = PostStore()
+base = datetime(2025, 1, 1)
+t0 = time.perf_counter()
+for i in range(POSTS):
+    created = base + timedelta(seconds=i)
+    store[f"p{i}"] = SimpleNamespace(
+        id=f"p{i}", title=" ".join(random.choices(VOCAB, k=4)), content=" ".join(random.choices(VOCAB, k=40)),
+        author=random.choice(["Иван", "Мария", "Алексей"]), created_at=created, updated_at=created,
+    )
+print(f"индексирование {POSTS:,} постов: {time.perf_counter() - t0:.1f} с")
+
+
+# Прежний способ: перебор всех постов и проверка каждого слова запроса
+def linear_scan(query: str, limit: int = 20):
+    terms = tokenize(query)
+    found = []
+    for post in store.values():
+        words = set(tokenize(f"{post.title} {post.content} {post.author}"))
+        if all(t in words for t in terms):
+            found.append(post)
+    return found[:limit]
+
+
+for query in QUERIES:
+    t0 = time.perf_counter()
+    for _ in range(20):
+        _, total = store.search(query, limit=20)
+    indexed_ms = (time.perf_counter() - t0) / 20 * 1000
+    t0 = time.perf_counter()
+    linear_scan(query)
+    linear_ms = (time.perf_counter() - t0) * 1000
+    print(f"{query!r:20} найдено {total:>7,}  индекс: {indexed_ms:8.2f} мс  перебор: {linear_ms:9.1f} мс")
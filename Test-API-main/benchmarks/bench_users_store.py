@@ -0,0 +1,29 @@
+# Микробенчмарк вставки пользователей с проверкой уникальности email в UserStore
+# Запуск из папки Test-API-main: python benchmarks/bench_users_store.py [итоговый размер]
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from store import UserStore  # noqa: E402
+
+TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000  # Итоговое число пользователей
+STEP = TOTAL // 10  # Размер замеряемой партии
+
+store = UserStore()
+next_id = 0
+print(f"{'размер до':>12} {'вставок/с':>12}")
+while len(store) < TOTAL:
+    size_before = len(store)
+    t0 = time.perf_counter()
+    for _ in range(STEP):
+        next_id += 1
+        email = f"User{next_id}@Example.com"
+        # Та же последовательность, что в create_user: проверка индекса и вставка
+        if store.email_taken(email):
+            raise RuntimeError("дубликат email")
+        store[next_id] = SimpleNamespace(id=next_id, name=f"user {next_id}", email=email)
+    rate = STEP / (time.perf_counter() - t0)
+    print(f"{size_before:>12,} {rate:>12,.0f}")
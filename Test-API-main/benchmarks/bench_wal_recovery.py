@@ -0,0 +1,80 @@
+# Бенчмарк WAL-бэкенда: время восстановления при запуске и пропускная способность group commit
+# Запуск из папки Test-API-main: python benchmarks/bench_wal_recovery.py [число записей]
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from storage import WalBackend  # noqa: E402
+from store import PostStore  # noqa: E402
+
+RECORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000  # Количество постов
+THREADS = 16  # Потоков-писателей в тесте group commit
+WRITES_PER_THREAD = 200  # Записей на поток
+
+
+# Та же структура, что и Post в main.py
+class Post(BaseModel):
+    id: str
+    title: str
+    content: str
+    author: str
+    image_url: Optional[str] = None
+    image_file: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    # Заполнение журнала без ожидания fsync (подготовка данных)
+    backend = WalBackend(Path(tmp), sync=False)
+    now = datetime.now().isoformat()
+    t0 = time.perf_counter()
+    for i in range(RECORDS):
+        backend.put("posts", f"post-{i}", {
+            "id": f"post-{i}", "title": f"Пост {i}", "content": "Текст поста " * 5, "author": "bench",
+            "image_url": None, "image_file": None, "created_at": now, "updated_at": now,
+        })
+    backend.close()
+    print(f"запись {RECORDS:,} записей в журнал: {time.perf_counter() - t0:.1f} с")
+
+    # Первый запуск: проигрывание журнала + сворачивание в снимок + построение индексов
+    t0 = time.perf_counter()
+    backend = WalBackend(Path(tmp))
+    store = PostStore(model=Post, backend=backend)
+    print(f"восстановление из журнала: {time.perf_counter() - t0:.1f} с ({len(store):,} постов)")
+    backend.close()
+
+    # Повторный запуск: чтение только снимка
+    del store
+    t0 = time.perf_counter()
+    backend = WalBackend(Path(tmp))
+    store = PostStore(model=Post, backend=backend)
+    print(f"восстановление из снимка: {time.perf_counter() - t0:.1f} с ({len(store):,} постов)")
+
+    # Group commit: много потоков пишут с ожиданием fsync
+    def writer(n: int):
+        for i in range(WRITES_PER_THREAD):
+            backend.put("bench", f"{n}-{i}", {"n": n, "i": i})
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(THREADS)]
+    fsyncs_before = backend.fsyncs
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    total = THREADS * WRITES_PER_THREAD
+    print(
+        f"group commit: {total:,} надёжных записей из {THREADS} потоков за {elapsed:.2f} с "
+        f"({total / elapsed:,.0f} записей/с, fsync: {backend.fsyncs - fsyncs_before:,})"
+    )
+    backend.close()
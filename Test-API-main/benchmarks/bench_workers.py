@@ -0,0 +1,84 @@
+# Масштабирование чтения GET /api/posts по количеству воркеров uvicorn (бэкенд sqlite)
+# Запуск из папки Test-API-main: python benchmarks/bench_workers.py [--workers 1 2 4 8] [--duration 10]
+# Нагрузку создают несколько процессов-клиентов (как wrk/locust), чтобы клиент не был узким местом
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parent.parent  # Папка с main.py
+AUTH = ("admin", "123")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])  # Варианты числа воркеров
+parser.add_argument("--duration", type=float, default=10.0)  # Длительность замера, с
+parser.add_argument("--clients", type=int, default=4)  # Процессов-клиентов
+parser.add_argument("--connections", type=int, default=32)  # Соединений на процесс-клиент
+parser.add_argument("--posts", type=int, default=1000)  # Постов в хранилище
+parser.add_argument("--port", type=int, default=8100)
+args = parser.parse_args()
+
+
+async def hammer(url: str, duration: float, connections: int) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    async with httpx.AsyncClient(base_url=url, auth=AUTH, limits=httpx.Limits(max_connections=connections)) as client:
+        async def loop():
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                (await client.get("/api/posts", params={"_limit": 20})).raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+        await asyncio.gather(*(loop() for _ in range(connections)))
+    return latencies
+
+
+def client_process(url: str, duration: float, connections: int) -> list:
+    return asyncio.run(hammer(url, duration, connections))
+
+
+def wait_ready(url: str):
+    for _ in range(100):
+        try:
+            httpx.get(url + "/", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("сервер не запустился")
+
+
+def run(workers: int):
+    url = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, STORAGE_BACKEND="sqlite", STORAGE_DIR=data_dir, RATE_LIMIT="0")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(workers), "--log-level", "warning"],
+            cwd=APP_DIR, env=env,
+        )
+        try:
+            wait_ready(url)
+            with httpx.Client(base_url=url, auth=AUTH) as client:
+                for i in range(args.posts):  # Наполнение хранилища через API
+                    client.post("/api/posts", json={"title": f"Пост {i}", "content": "текст", "author": "bench"})
+            with multiprocessing.Pool(args.clients) as pool:
+                t0 = time.perf_counter()
+                results = pool.starmap(client_process, [(url, args.duration, args.connections)] * args.clients)
+                elapsed = time.perf_counter() - t0
+        finally:
+            server.terminate()
+            server.wait()
+    latencies = sorted(x for r in results for x in r)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"workers={workers}: {len(latencies) / elapsed:8.0f} запросов/с  p50={p50:6.1f} мс  p99={p99:6.1f} мс")
+
+
+if __name__ == "__main__":
+    for n in args.workers:
+        run(n)
@@ -0,0 +1,319 @@
+# Нагрузочный тест всего API: пропускная способность и перцентили задержки по группам маршрутов
+# Запуск из папки Test-API-main:
+#   python benchmarks/load_test.py [--target inprocess|uvicorn|both] [--duration 5] [--concurrency 16] [--out results.json]
+#   python benchmarks/load_test.py --url http://127.0.0.1:8000      (уже запущенный сервер)
+#   python benchmarks/load_test.py --compare old.json new.json      (сравнение двух прогонов)
+# inprocess - запросы к ASGI-приложению в этом же процессе (без сети), uvicorn - к локальному серверу.
+# Данные создаются через эндпоинты API; хранилище и загрузки - во временной папке
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parent.parent  # Папка с main.py
+AUTH = ("admin", "123")
+FAMILIES = ["posts", "upload", "users", "students", "auth_failures"]
+WORDS = "урок студент преподаватель python typescript react задача код функция компонент состояние запрос".split()
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--target", choices=["inprocess", "uvicorn", "both"], default="both")
+parser.add_argument("--url")  # Адрес уже запущенного сервера (вместо запуска своего)
+parser.add_argument("--families", nargs="+", choices=FAMILIES, default=FAMILIES)
+parser.add_argument("--duration", type=float, default=5.0)  # Длительность замера каждой группы, с
+parser.add_argument("--concurrency", type=int, default=16)  # Одновременных запросов
+parser.add_argument("--posts", type=int, default=2000)  # Постов до замера
+parser.add_argument("--users", type=int, default=1000)  # Пользователей до замера
+parser.add_argument("--uploads", type=int, default=50)  # Постов с загрузками до замера
+parser.add_argument("--upload-kb", type=int, default=64)  # Размер загружаемого файла, КБ
+parser.add_argument("--backend", default="memory")  # STORAGE_BACKEND приложения
+parser.add_argument("--port", type=int, default=8100)
+parser.add_argument("--seed", type=int, default=1)  # Одинаковые данные и порядок запросов в разных прогонах
+parser.add_argument("--out")  # Файл результатов JSON (по умолчанию - только вывод в консоль)
+parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+args = parser.parse_args()
+OUT = Path(args.out).resolve() if args.out else None  # До смены текущей папки в режиме inprocess
+# Ограничение частоты запросов приложения: по умолчанию выключено (замеряется пропускная способность)
+RATE_LIMIT = os.environ.get("RATE_LIMIT", "0")
+
+
+# Состояние прогона: id созданных объектов, которые используют запросы
+class State:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.posts: list = []  # Посты, созданные при подготовке (не удаляются)
+        self.created_posts: list = []  # Посты, созданные во время замера (их удаляет группа posts)
+        self.upload_posts: list = []
+        self.users: list = []
+        self.students: list = []
+        self.counter = 0  # Для уникальных заголовков и email
+        self.payload = bytes(self.rng.getrandbits(8) for _ in range(args.upload_kb * 1024))
+
+    def text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def unique(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+# --- Подготовка данных через эндпоинты ---
+async def seed(client: httpx.AsyncClient, state: State):
+    for start in range(0, args.posts, 500):
+        batch = [
+            {"title": state.text(4), "content": state.text(60), "author": f"автор{i % 25}"}
+            for i in range(start, min(start + 500, args.posts))
+        ]
+        r = await client.post("/api/posts:batch", json=batch)
+        r.raise_for_status()
+        state.posts += [item["id"] for item in r.json()["results"]]
+    for start in range(0, args.users, 500):
+        batch = [{"name": f"Пользователь {i}", "email": f"user{i}@load.test"} for i in range(start, min(start + 500, args.users))]
+        r = await client.post("/api/users:batch", json=batch)
+        r.raise_for_status()
+        state.users += [item["id"] for item in r.json()["results"]]
+    for i in range(args.uploads):
+        r = await upload(client, state, i)
+        r.raise_for_status()
+        state.upload_posts.append(r.json()["id"])
+    r = await client.get("/api/students")
+    r.raise_for_status()
+    state.students = [s["id"] for s in r.json()]
+
+
+def upload(client: httpx.AsyncClient, state: State, i: int):
+    return client.post(
+        "/api/posts/upload",
+        data={"title": f"загрузка {i}", "content": state.text(20), "author": "load"},
+        files={"image_file": (f"img{i}.jpg", state.payload, "image/jpeg")},
+    )
+
+
+# --- Запросы групп маршрутов: (операция, ответ, допустимые статусы) ---
+async def posts_request(client: httpx.AsyncClient, state: State, i: int):
+    op = ("list", "get", "create", "update", "delete")[i % 5]
+    if op == "list":
+        start = state.rng.randrange(max(len(state.posts) - 20, 1))
+        return op, await client.get("/api/posts", params={"_start": start, "_limit": 20}), {200}
+    if op == "get":
+        return op, await client.get(f"/api/posts/{state.rng.choice(state.posts)}"), {200}
+    if op == "create" or not state.created_posts:
+        r = await client.post("/api/posts", json={"title": f"новый {state.unique()}", "content": state.text(60), "author": "load"})
+        if r.status_code == 200:
+            state.created_posts.append(r.json()["id"])
+        return "create", r, {200}
+    if op == "update":
+        return op, await client.put(f"/api/posts/{state.rng.choice(state.posts)}", json={"title": state.text(4)}), {200}
+    return op, await client.delete(f"/api/posts/{state.created_posts.pop()}"), {200}
+
+
+async def upload_request(client: httpx.AsyncClient, state: State, i: int):
+    if i % 4 == 3:  # Замена изображения существующего поста
+        files = {"image_file": ("new.jpg", state.payload, "image/jpeg")}
+        return "replace", await client.put(f"/api/posts/{state.rng.choice(state.upload_posts)}/upload", files=files), {200}
+    return "create", await upload(client, state, i), {200}
+
+
+async def users_request(client: httpx.AsyncClient, state: State, i: int):
+    op = ("list", "get", "create", "update")[i % 4]
+    if op == "list":
+        start = state.rng.randrange(max(len(state.users) - 20, 1))
+        return op, await client.get("/api/users", params={"_start": start, "_limit": 20}), {200}
+    if op == "get":
+        return op, await client.get(f"/api/users/{state.rng.choice(state.users)}"), {200}
+    if op == "create":
+        n = state.unique()
+        return op, await client.post("/api/users", json={"name": f"Новый {n}", "email": f"new{n}@load.test"}), {200}
+    return op, await client.put(f"/api/users/{state.rng.choice(state.users)}", json={"name": f"Имя {state.unique()}"}), {200}
+
+
+async def students_request(client: httpx.AsyncClient, state: State, i: int):
+    op = ("list", "grade", "online")[i % 3]
+    if op == "list":
+        return op, await client.get("/api/students"), {200}
+    sid = state.rng.choice(state.students)
+    if op == "grade":
+        return op, await client.put(f"/api/students/{sid}/grade", json={"grade": state.rng.randrange(13)}), {200}
+    return op, await client.put(f"/api/students/{sid}/online", json={"online": bool(i % 2)}), {200}
+
+
+async def auth_failures_request(client: httpx.AsyncClient, state: State, i: int):
+    if i % 2:  # Без заголовка Authorization
+        return "missing", await client.get("/api/me", auth=None), {401}
+    return "wrong_password", await client.get("/api/me", auth=("admin", "wrong")), {401}
+
+
+REQUESTS = {
+    "posts": posts_request, "upload": upload_request, "users": users_request,
+    "students": students_request, "auth_failures": auth_failures_request,
+}
+
+
+# --- Замер ---
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] * 1000, 3) if ordered else None
+
+    return {
+        "requests": len(ordered), "errors": errors, "rps": round(len(ordered) / elapsed, 1),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3) if ordered else None,
+        "p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99), "max_ms": pct(100),
+    }
+
+
+async def run_family(client: httpx.AsyncClient, state: State, family: str) -> dict:
+    request = REQUESTS[family]
+    latencies = {}  # Операция -> задержки
+    errors = {}  # Операция -> ответы с неожиданным статусом
+    counter = iter(range(10 ** 9))
+    deadline = time.perf_counter() + args.duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            op, r, expected = await request(client, state, next(counter))
+            latencies.setdefault(op, []).append(time.perf_counter() - t0)
+            errors[op] = errors.get(op, 0) + (r.status_code not in expected)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    ops = {op: summarize(values, errors[op], elapsed) for op, values in sorted(latencies.items())}
+    total = summarize([v for values in latencies.values() for v in values], sum(errors.values()), elapsed)
+    return {**total, "operations": ops}
+
+
+async def run_target(client: httpx.AsyncClient) -> dict:
+    state = State(args.seed)
+    t0 = time.perf_counter()
+    await seed(client, state)
+    results = {"seed_seconds": round(time.perf_counter() - t0, 2), "families": {}}
+    for family in args.families:
+        result = results["families"][family] = await run_family(client, state, family)
+        print(
+            f"  {family:14} {result['rps']:9.1f} зап/с  p50 {result['p50_ms']:8.2f}  p90 {result['p90_ms']:8.2f}  "
+            f"p99 {result['p99_ms']:8.2f} мс  ошибок {result['errors']}"
+        )
+    return results
+
+
+def client_options(**kwargs) -> dict:
+    return dict(auth=AUTH, timeout=60, limits=httpx.Limits(max_connections=args.concurrency), **kwargs)
+
+
+async def run_inprocess() -> dict:
+    # Приложение импортируется во временной папке: хранилище и uploads/ не попадают в проект
+    os.chdir(tempfile.mkdtemp(prefix="load_test_"))
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ["RATE_LIMIT"] = RATE_LIMIT
+    sys.path.insert(0, str(APP_DIR))
+    import main  # noqa: E402
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", **client_options()) as client:
+        return await run_target(client)
+
+
+async def run_url(url: str) -> dict:
+    async with httpx.AsyncClient(base_url=url, **client_options()) as client:
+        return await run_target(client)
+
+
+def run_uvicorn() -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory(prefix="load_test_") as work_dir:
+        env = dict(os.environ, STORAGE_BACKEND=args.backend, STORAGE_DIR=str(Path(work_dir) / "data"), RATE_LIMIT=RATE_LIMIT)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(APP_DIR),
+             "--port", str(args.port), "--log-level", "warning", "--no-access-log"],
+            cwd=work_dir, env=env,
+        )
+        try:
+            for _ in range(100):  # Ожидание запуска сервера
+                try:
+                    httpx.get(url + "/", timeout=1)
+                    break
+                except httpx.HTTPError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("сервер не запустился")
+            return asyncio.run(run_url(url))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Сравнение двух файлов результатов: изменение пропускной способности и p99 по группам
+def compare(old_path: str, new_path: str):
+    old, new = (json.loads(Path(p).read_text()) for p in (old_path, new_path))
+    print(f"{old['meta']['git']} -> {new['meta']['git']}")
+    for target, new_target in new["targets"].items():
+        old_target = old["targets"].get(target)
+        if old_target is None:
+            continue
+        print(target)
+        for family, result in new_target["families"].items():
+            before = old_target["families"].get(family)
+            if before is None:
+                continue
+            rps = (result["rps"] / before["rps"] - 1) * 100 if before["rps"] else 0.0
+            p99 = (result["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else 0.0
+            print(f"  {family:14} зап/с {before['rps']:9.1f} -> {result['rps']:9.1f} ({rps:+6.1f}%)  "
+                  f"p99 {before['p99_ms']:8.2f} -> {result['p99_ms']:8.2f} мс ({p99:+6.1f}%)")
+
+
+if args.compare:
+    compare(*args.compare)
+    sys.exit(0)
+
+report = {
+    "meta": {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k != "compare"},
+        # Переменные окружения, которые меняют поведение приложения
+        "env": {
+            **{k: os.environ[k] for k in ("FAST_JSON", "COMPRESSION", "METRICS", "UPLOAD_CONTENT_ADDRESSED") if k in os.environ},
+            "RATE_LIMIT": RATE_LIMIT,
+        },
+    },
+    "targets": {},
+}
+print(f"постов {args.posts}, пользователей {args.users}, загрузок {args.uploads}, "
+      f"{args.concurrency} одновременных запросов, {args.duration:g} с на группу")
+if args.url:
+    print(f"сервер {args.url}")
+    report["targets"]["url"] = asyncio.run(run_url(args.url))
+else:
+    # Сначала отдельный процесс uvicorn: импорт приложения в этот процесс меняет текущую папку
+    if args.target in ("uvicorn", "both"):
+        print("uvicorn")
+        report["targets"]["uvicorn"] = run_uvicorn()
+    if args.target in ("inprocess", "both"):
+        print("inprocess")
+        report["targets"]["inprocess"] = asyncio.run(run_inprocess())
+if OUT is not None:
+    OUT.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"результаты: {OUT}")
@@ -0,0 +1,79 @@
+# Нагрузочный тест загрузок: N параллельных загрузок по M МБ и задержка других эндпоинтов
+# Запуск: RATE_LIMIT=0 UPLOAD_MAX_ACTIVE=100 UPLOAD_MAX_WAITING=100 uvicorn main:app --port 8000
+#         (в другом терминале; без этих переменных лишние загрузки получат 429/503), затем
+#         python benchmarks/load_uploads.py [--url http://127.0.0.1:8000] [--parallel 100] [--size-mb 10]
+# Ответы 429 (лимит частоты) и 503 (очередь загрузок полна) считаются отдельно, а не прерывают тест
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--url", default="http://127.0.0.1:8000")  # Адрес запущенного сервера
+parser.add_argument("--parallel", type=int, default=100)  # Количество одновременных загрузок
+parser.add_argument("--size-mb", type=int, default=10)  # Размер каждого файла в МБ
+args = parser.parse_args()
+
+AUTH = ("admin", "123")  # Учётные данные Basic Auth
+payload = os.urandom(args.size_mb * 1024 * 1024)  # Содержимое загружаемого файла
+
+
+# Отклонения сервера под нагрузкой - ожидаемый исход, а не ошибка теста
+REJECTED = {429, 503}
+
+
+async def upload(client: httpx.AsyncClient, i: int):
+    t0 = time.perf_counter()
+    r = await client.post(
+        "/api/posts/upload",
+        data={"title": f"load {i}", "content": "нагрузочный тест", "author": "bench"},
+        files={"image_file": (f"img{i}.jpg", payload, "image/jpeg")},
+        auth=AUTH,
+    )
+    if r.status_code not in REJECTED:
+        r.raise_for_status()
+    return r.status_code, time.perf_counter() - t0
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, samples: list):
+    # Пока идут загрузки, измеряем задержку лёгкого эндпоинта
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        (await client.get("/api/me", auth=AUTH)).raise_for_status()
+        samples.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.01)
+
+
+async def main():
+    limits = httpx.Limits(max_connections=args.parallel + 1)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=300) as client:
+        stop, probe_samples = asyncio.Event(), []
+        prober = asyncio.create_task(probe(client, stop, probe_samples))
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(upload(client, i) for i in range(args.parallel)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await prober
+    statuses = Counter(status for status, _ in results)
+    durations = sorted(duration for status, duration in results if status not in REJECTED)
+    print(f"загрузок: {args.parallel} x {args.size_mb} МБ за {elapsed:.2f} с, ответы: {dict(sorted(statuses.items()))}")
+    if durations:
+        total_mb = len(durations) * args.size_mb
+        print(f"пропускная способность: {total_mb / elapsed:.1f} МБ/с, {len(durations) / elapsed:.1f} загрузок/с")
+        p95 = durations[max(0, int(len(durations) * 0.95) - 1)]
+        print(f"задержка загрузки p50/p95: {statistics.median(durations):.2f} / {p95:.2f} с")
+    rejected = sum(statuses[s] for s in REJECTED)
+    if rejected:
+        print(f"отклонено сервером (429/503): {rejected} - для замера пропускной способности см. переменные в начале файла")
+    if probe_samples:
+        probe_samples.sort()
+        p50 = statistics.median(probe_samples) * 1000
+        p99 = probe_samples[max(0, int(len(probe_samples) * 0.99) - 1)] * 1000
+        print(f"GET /api/me во время загрузок: {len(probe_samples)} запросов, p50={p50:.1f} мс, p99={p99:.1f} мс")
+
+
+asyncio.run(main())
@@ -0,0 +1,143 @@
+# Нагрузочная проверка потокобезопасности: все маршруты записи из многих потоков и проверка инвариантов
+# Запуск из папки Test-API-main: python benchmarks/stress_writes.py [потоков] [итераций на поток]
+# Файлы загрузок сохраняются по содержимому (UPLOAD_CONTENT_ADDRESSED=1), чтобы проверить общие файлы
+import os
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("UPLOAD_CONTENT_ADDRESSED", "1")
+os.environ.setdefault("RATE_LIMIT", "0")  # Проверяются инварианты, а не лимиты частоты
+# Добавление папки приложения в путь поиска модулей
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main  # noqa: E402
+
+THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+AUTH = ("admin", "123")
+IMAGES = [bytes([i]) * 256 for i in range(4)]  # Несколько одинаковых "изображений" на все потоки
+
+client = TestClient(main.app)
+client.get("/api/me", auth=AUTH)  # Прогрев кеша проверки пароля
+files_before = set(os.listdir(main.UPLOAD_DIR))
+failures = []
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        failures.append(message)
+
+
+# Общий пост, поля которого одновременно меняют разные потоки
+shared_post = client.post("/api/posts", json={"title": "t", "content": "c", "author": "stress"}, auth=AUTH).json()["id"]
+student_ids = list(main.students_db)
+last_title = {}  # Поток -> последний записанный им заголовок общего поста
+last_content = {}
+last_grade = {}  # (поток, студент) -> последняя оценка
+created_users = []  # id пользователей, созданных с уникальными email
+contested_wins = Counter()  # Спорный email -> количество успешных созданий
+created_posts = []  # Посты с загруженными файлами
+lock = threading.Lock()
+
+
+def worker(n: int):
+    for i in range(ITERATIONS):
+        # Пользователи: уникальный email и email, за который соревнуются все потоки
+        r = client.post("/api/users", json={"name": f"u{n}-{i}", "email": f"u{n}-{i}@stress.test"}, auth=AUTH)
+        check(r.status_code == 200, f"create_user: {r.status_code}")
+        user_id = r.json().get("id")
+        contested = f"Shared{i}@Stress.test" if n % 2 else f"shared{i}@stress.test"
+        r = client.post("/api/users", json={"name": "contested", "email": contested}, auth=AUTH)
+        with lock:
+            created_users.append(user_id)
+            contested_wins[contested.lower()] += r.status_code == 200
+        # Смена email на спорный для одного из своих пользователей (не должна создать дубликат)
+        client.put(f"/api/users/{user_id}", json={"email": f"swap{i % 5}@stress.test"}, auth=AUTH)
+
+        # Частичные изменения общего поста: чётные потоки меняют заголовок, нечётные - текст
+        if n % 2 == 0:
+            title = f"title-{n}-{i}"
+            r = client.put(f"/api/posts/{shared_post}", json={"title": title}, auth=AUTH)
+            last_title[n] = title
+        else:
+            content = f"content-{n}-{i}"
+            r = client.put(f"/api/posts/{shared_post}", json={"content": content}, auth=AUTH)
+            last_content[n] = content
+        check(r.status_code == 200, f"update_post: {r.status_code}")
+
+        # Загрузки с общими файлами, замена файла и удаление
+        files = {"image_file": (f"img{i}.png", IMAGES[(n + i) % len(IMAGES)], "image/png")}
+        data = {"title": f"p{n}-{i}", "content": "x", "author": "stress"}
+        r = client.post("/api/posts/upload", data=data, files=files, auth=AUTH)
+        check(r.status_code == 200, f"create_post_upload: {r.status_code}")
+        post_id = r.json()["id"]
+        if i % 3 == 0:
+            files = {"image_file": ("new.png", IMAGES[(n + i + 1) % len(IMAGES)], "image/png")}
+            r = client.put(f"/api/posts/{post_id}/upload", files=files, auth=AUTH)
+            check(r.status_code == 200, f"update_post_upload: {r.status_code}")
+        if i % 2 == 0:
+            r = client.delete(f"/api/posts/{post_id}", auth=AUTH)
+            check(r.status_code == 200, f"delete_post: {r.status_code}")
+        else:
+            with lock:
+                created_posts.append(post_id)
+
+        # Студенты: каждый поток ставит оценки, онлайн статус меняют все
+        sid = student_ids[(n + i) % len(student_ids)]
+        grade = (n * 7 + i) % 13
+        r = client.put(f"/api/students/{sid}/grade", json={"grade": grade}, auth=AUTH)
+        check(r.status_code == 200, f"update_student_grade: {r.status_code}")
+        last_grade[n, sid] = grade
+        client.put(f"/api/students/{sid}/online", json={"online": bool(i % 2)}, auth=AUTH)
+
+    # Одновременное удаление одного поста: успешно ровно одно
+    return client.delete(f"/api/posts/{race_post}", auth=AUTH).status_code
+
+
+race_post = client.post("/api/posts", json={"title": "race", "content": "c", "author": "stress"}, auth=AUTH).json()["id"]
+with ThreadPoolExecutor(THREADS) as pool:
+    delete_statuses = list(pool.map(worker, range(THREADS)))
+
+# --- Инварианты ---
+users = main.users_db.values()
+ids = [u.id for u in users]
+check(len(ids) == len(set(ids)), "повторяющиеся id пользователей")
+emails = [main.users_db.normalize_email(u.email) for u in users]
+check(len(emails) == len(set(emails)), f"повторяющиеся email: {[e for e, c in Counter(emails).items() if c > 1][:5]}")
+check(all(main.users_db.find_by_email(u.email) == u.id for u in users), "индекс email не совпадает с пользователями")
+check(len(main.users_db._by_email) == len(users), "в индексе email лишние записи")
+check(all(c == 1 for c in contested_wins.values()), "спорный email создан не ровно один раз")
+check(max(ids) <= main.users_db._counter, "счётчик id меньше выданного id")
+
+post = main.posts_db[shared_post]
+check(post.title in last_title.values() or not last_title, "заголовок общего поста - не из последних записей")
+check(post.content in last_content.values() or not last_content, "текст общего поста - не из последних записей")
+for sid in student_ids:
+    finals = {g for (_, s), g in last_grade.items() if s == sid}
+    check(not finals or main.students_db[sid].grade in finals, f"оценка студента {sid} - не из последних записей")
+check(sorted(delete_statuses).count(200) == 1, f"одновременное удаление: {Counter(delete_statuses)}")
+posts = main.posts_db.values()
+for field, index in main.posts_db._sorted.items():
+    check(len(index) == len(posts), f"индекс {field}: {len(index)} записей при {len(posts)} постах")
+check(len(main.posts_db._search) == len(posts), "полнотекстовый индекс не совпадает с постами")
+
+refs = Counter(p.image_file for p in posts if p.image_file)
+check(all(main.upload_refs.count(name) == c for name, c in refs.items()), "счётчики ссылок на файлы не совпадают")
+check(all((main.UPLOAD_DIR / name).exists() for name in refs), "файл поста удалён с диска")
+
+# Уборка: удаление постов стресс-теста - после него не должно остаться новых файлов
+for post_id in created_posts + [shared_post]:
+    client.delete(f"/api/posts/{post_id}", auth=AUTH)
+leftover = set(os.listdir(main.UPLOAD_DIR)) - files_before
+check(not leftover, f"файлы без ссылок после удаления постов: {sorted(leftover)[:5]}")
+
+print(f"потоков {THREADS}, итераций {ITERATIONS}: пользователей {len(users)}, спорных email {len(contested_wins)}")
+if failures:
+    for message, count in Counter(failures).most_common():
+        print(f"ОШИБКА x{count}: {message}")
+    sys.exit(1)
+print("все инварианты выполнены")
@@ -0,0 +1,209 @@
+# Доставка ответов: сжатие gzip/brotli, предварительно сжатые копии файлов и выбор кодировки
+# Модуль для работы с файловой системой
+import os
+# Модуль для сжатия gzip
+import zlib
+# Модуль для работы с путями файловой системы
+from pathlib import Path
+# Импорт типов для аннотаций
+from typing import Iterable, List, Optional, Sequence
+
+# Выполнение сжатия больших тел в рабочем потоке (не занимает цикл событий)
+import anyio
+# Заголовки запроса и изменяемые заголовки ответа
+from starlette.datastructures import Headers, MutableHeaders
+
+# brotli - необязательная зависимость: без неё используется только gzip
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+# Типы содержимого, которые имеет смысл сжимать (text/event-stream намеренно не входит)
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/javascript", "text/plain", "text/html",
+    "text/css", "text/csv", "image/svg+xml",
+}
+# Расширения загрузок, для которых создаются сжатые копии (остальные форматы уже сжаты).
+# Загрузки не сжимаются на лету: копия создаётся один раз, а не при каждом запросе
+PRECOMPRESS_EXTENSIONS = {".bmp"}
+# Расширение сжатой копии файла для каждой кодировки
+SIDECAR_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Тела больше этого размера сжимаются в рабочем потоке
+THREAD_THRESHOLD = 256 * 1024
+
+
+# Кодировки, доступные в этом окружении (в порядке предпочтения)
+def available_encodings() -> List[str]:
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+# Выбор кодировки по заголовку Accept-Encoding (с учётом q-значений); None - без сжатия
+def negotiate(accept_encoding: str, encodings: Sequence[str]) -> Optional[str]:
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0  # Некорректное значение - кодировка не используется
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:  # При равных весах выигрывает более ранняя кодировка
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+# Потоковый компрессор: каждая порция сразу отдаётся клиенту (без ожидания конца тела)
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31 - формат gzip
+
+    def compress(self, data: bytes) -> bytes:
+        # Сжатие порции со сбросом буфера: клиент может распаковать всё, что уже получил
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        # Последняя порция и завершение потока
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.finish()
+        return self._gz.compress(data) + self._gz.flush()
+
+
+# ASGI middleware: сжатие ответов gzip/brotli, в том числе потоковых
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        encodings: Iterable[str] = ("br", "gzip"),
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app  # Следующее ASGI-приложение
+        # Разрешённые кодировки, которые поддерживаются в окружении
+        self.encodings = [e for e in encodings if e in available_encodings()]
+        self.minimum_size = minimum_size  # Меньшие ответы не сжимаются (выигрыш меньше затрат)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality  # 4 - быстро и заметно лучше gzip для JSON
+
+    @staticmethod
+    def compressible(status: int, headers: MutableHeaders) -> bool:
+        # Сжимаются только полные ответы подходящего типа, ещё не закодированные
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return media_type in COMPRESSIBLE_TYPES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not self.encodings:
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        start = None  # Начало ответа откладывается до первой порции тела
+        compressor: Optional[_Compressor] = None  # None - ответ передаётся без изменений
+
+        async def compress(chunk: bytes, last: bool) -> bytes:
+            if len(chunk) >= THREAD_THRESHOLD:  # zlib и brotli освобождают GIL
+                return await anyio.to_thread.run_sync(compressor.finish if last else compressor.compress, chunk)
+            return compressor.finish(chunk) if last else compressor.compress(chunk)
+
+        async def compressing_send(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:  # Первая порция: решение о сжатии
+                headers = MutableHeaders(raw=start["headers"])
+                if not self.compressible(start["status"], headers):
+                    await send(start)
+                    start = None
+                    return await send(message)
+                headers.add_vary_header("Accept-Encoding")  # Ответ зависит от Accept-Encoding
+                if encoding is None or (not more_body and len(body) < self.minimum_size):
+                    await send(start)
+                    start = None
+                    return await send(message)
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["content-encoding"] = encoding
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    headers["etag"] = f"W/{headers['etag']}"  # Сжатое тело - другие байты
+                data = await compress(body, not more_body)
+                if more_body:
+                    del headers["content-length"]  # Длина потока заранее неизвестна
+                else:
+                    headers["content-length"] = str(len(data))
+                await send(start)
+                start = None
+                return await send({"type": "http.response.body", "body": data, "more_body": more_body})
+            if compressor is None:
+                return await send(message)
+            data = await compress(body, not more_body)
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+
+# Создание сжатых копий файла (file.bmp.br, file.bmp.gz), если они заметно меньше оригинала
+def precompress(path: Path, gzip_level: int = 9, brotli_quality: int = 11) -> List[Path]:
+    data = path.read_bytes()
+    created = []
+    for encoding in available_encodings():
+        compressor = _Compressor(encoding, gzip_level, brotli_quality)
+        packed = compressor.finish(data)
+        if len(packed) > len(data) * 0.9:  # Выигрыш меньше 10% - копия не нужна
+            continue
+        sidecar = path.with_name(path.name + SIDECAR_SUFFIXES[encoding])
+        tmp = sidecar.with_name(sidecar.name + ".part")
+        tmp.write_bytes(packed)
+        os.replace(tmp, sidecar)  # Копия появляется атомарно
+        created.append(sidecar)
+    return created
+
+
+# Является ли имя сжатой копией другого файла (file.bmp.gz -> file.bmp)
+def sidecar_original(name: str) -> Optional[str]:
+    for suffix in SIDECAR_SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return None
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл delivery.py - уменьшение объёма ответов: сжатие JSON-ответов API и отдача
+#    заранее сжатых копий загруженных файлов
+
+# 2. Функция negotiate - выбор кодировки (br или gzip) по заголовку Accept-Encoding
+#    с учётом q-значений. brotli - необязательная зависимость
+
+# 3. Класс CompressionMiddleware - сжимает ответы подходящих типов больше minimum_size.
+#    Потоковые ответы (StreamingResponse) сжимаются по порциям, каждая порция сразу
+#    уходит клиенту. Не сжимаются: Server-Sent Events (text/event-stream), ответы 304,
+#    частичные ответы 206 и ответы, у которых уже есть Content-Encoding (например,
+#    сжатые копии файлов). Строгий ETag сжатого ответа становится слабым (W/)
+
+# 4. Функции precompress / sidecar_original - сжатые копии файлов из uploads/
+#    (file.bmp.br, file.bmp.gz), которые создаются командой python main.py
+#    precompress-uploads и отдаются вместо оригинала клиентам, поддерживающим сжатие.
+#    Копии удаляются вместе с оригиналом (UploadRegistry.release_file в media.py)
+# */
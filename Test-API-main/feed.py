@@ -0,0 +1,163 @@
+# Лента изменений: рассылка изменений подписчикам (Server-Sent Events)
+# Модуль для работы с циклом событий asyncio
+import asyncio
+# Модуль для сериализации событий
+import json
+# Модуль для блокировки (публикация идёт из потоков пула синхронных маршрутов)
+import threading
+# Очередь с быстрым добавлением и удалением с обоих концов
+from collections import deque
+# Импорт типов для аннотаций
+from typing import Any, Deque, List, Optional, Set, Tuple
+
+
+# Кадр Server-Sent Events: id - номер события (браузер вернёт его в Last-Event-ID)
+def sse_frame(event: str, data: Any, seq: Optional[int] = None) -> bytes:
+    head = f"id: {seq}\n" if seq is not None else ""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"{head}event: {event}\ndata: {body}\n\n".encode()
+
+
+# Подписчик отключён из-за переполнения очереди (не успевает читать события)
+class SubscriberEvicted(Exception):
+    pass
+
+
+# Подписка: ограниченная очередь готовых кадров одного клиента
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize  # Максимум непрочитанных событий
+        self.queue: Deque[Tuple[int, bytes]] = deque()  # (номер, кадр)
+        self.last_seq = 0  # Номер последнего события, попавшего в очередь
+        self.evicted = False  # Отключён ли подписчик
+        self._ready = asyncio.Event()  # Есть новые события (или подписчик отключён)
+
+    def _push(self, events: List[Tuple[int, bytes]]) -> bool:
+        # Вызывается в цикле событий; False - очередь переполнена
+        if events[0][0] <= self.last_seq:  # Часть событий уже попала в очередь при подписке
+            events = [item for item in events if item[0] > self.last_seq]
+            if not events:
+                return True
+        if len(self.queue) + len(events) > self.maxsize:
+            return False
+        self.queue.extend(events)
+        self.last_seq = events[-1][0]
+        self._ready.set()
+        return True
+
+    def _evict(self):
+        self.evicted = True
+        self.queue.clear()
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> List[bytes]:
+        """Все накопившиеся кадры одним списком; [] - истёк timeout (время отправить ping)."""
+        if not self.queue and not self.evicted:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        if self.evicted:
+            raise SubscriberEvicted()
+        frames = [frame for _, frame in self.queue]
+        self.queue.clear()
+        self._ready.clear()
+        return frames
+
+
+# Центр рассылки: нумерует события, хранит последние для возобновления и рассылает подписчикам
+class ChangeHub:
+    def __init__(self, history: int = 1024, queue_size: int = 256):
+        self.queue_size = queue_size  # Размер очереди каждого подписчика
+        self.seq = 0  # Номер последнего опубликованного события
+        self.evictions = 0  # Сколько подписчиков отключено за отставание
+        self._history: Deque[Tuple[int, bytes]] = deque(maxlen=history)  # Последние события
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()  # Порядок номеров и истории при публикации из разных потоков
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # Цикл событий подписчиков
+        self._pending: List[Tuple[int, bytes]] = []  # События, ещё не разосланные подписчикам
+        self._scheduled = False  # Запланирована ли рассылка в цикле событий
+
+    def __len__(self) -> int:
+        return len(self._subscribers)  # Количество подписчиков
+
+    def publish(self, event: str, data: Any) -> int:
+        """Публикация события из любого потока. Кадр кодируется один раз для всех подписчиков."""
+        with self._lock:
+            self.seq += 1
+            frame = sse_frame(event, data, self.seq)
+            self._history.append((self.seq, frame))
+            loop = self._loop
+            if loop is None or not self._subscribers:
+                return self.seq
+            self._pending.append((self.seq, frame))
+            if not self._scheduled:
+                # Одна рассылка в цикле событий на все события, накопившиеся до её выполнения
+                try:
+                    loop.call_soon_threadsafe(self._fan_out)
+                    self._scheduled = True
+                except RuntimeError:  # Цикл событий уже закрыт (остановка сервера)
+                    self._pending.clear()
+            return self.seq
+
+    def _fan_out(self):
+        # Добавление событий в очереди подписчиков; переполненные очереди - отключение подписчика
+        with self._lock:
+            events, self._pending, self._scheduled = self._pending, [], False
+        if not events:
+            return
+        for sub in list(self._subscribers):
+            if not sub._push(events):
+                self._subscribers.discard(sub)
+                self.evictions += 1
+                sub._evict()
+
+    def subscribe(self, last_seq: Optional[int] = None) -> Tuple[Subscription, bool]:
+        """Новая подписка (вызывается в цикле событий).
+
+        last_seq - номер последнего полученного события (Last-Event-ID): пропущенные события
+        из истории сразу попадают в очередь. Второе значение False - подписка новая или
+        пропущенных событий в истории уже нет: клиенту нужен полный снимок данных.
+        """
+        sub = Subscription(self.queue_size)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            complete = False
+            if last_seq is not None:
+                oldest = self._history[0][0] if self._history else self.seq + 1
+                # Номер из прошлого запуска процесса тоже требует полной загрузки
+                complete = oldest - 1 <= last_seq <= self.seq
+                if last_seq > self.seq:
+                    last_seq = 0
+                missed = [item for item in self._history if item[0] > last_seq]
+                complete = complete and len(missed) <= self.queue_size
+                if complete and missed:
+                    sub._push(missed)
+            sub.last_seq = max(sub.last_seq, self.seq)  # Уже разосланные события не дублируются
+            self._subscribers.add(sub)
+        return sub, complete
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл feed.py - лента изменений студентов для маршрута GET /api/students/events
+#    (вместо опроса GET /api/students каждую секунду)
+
+# 2. Класс ChangeHub - маршруты изменения публикуют в него короткие изменения (только
+#    изменённые поля). Каждое событие получает номер и кодируется в кадр SSE один раз,
+#    последние события хранятся для возобновления после переподключения. События,
+#    опубликованные подряд, рассылаются подписчикам одним проходом (_fan_out)
+
+# 3. Класс Subscription - очередь одного клиента ограниченного размера. Клиент, который
+#    не успевает читать события, отключается (событие evicted) и может переподключиться
+#    с заголовком Last-Event-ID, не замедляя рассылку остальным
+
+# 4. Лента работает внутри одного процесса: при нескольких воркерах изменения других
+#    процессов попадают в ленту после синхронизации хранилища (см. main.py)
+# */
@@ -0,0 +1,57 @@
+# Условные GET-запросы: ETag / Last-Modified и ответ 304 Not Modified
+# Модуль для форматирования и разбора дат HTTP
+from email.utils import formatdate, parsedate_to_datetime
+# Модуль для работы с датой и временем
+from datetime import datetime
+# Импорт типов для аннотаций
+from typing import Dict
+
+# Классы запроса и ответа Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+# Заголовки-валидаторы ресурса
+def validators(etag: str, last_modified: datetime) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified.timestamp(), usegmt=True),  # Дата в формате HTTP
+        "Cache-Control": "no-cache",  # Клиент может хранить ответ, но обязан перепроверять его
+    }
+
+
+# Проверка условного запроса: True - у клиента актуальная версия
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:  # If-None-Match важнее If-Modified-Since (RFC 9110)
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Слабое сравнение: W/"x" и "x" считаются одинаковыми
+        return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False  # Некорректная дата - заголовок игнорируется
+        # Даты HTTP с точностью до секунды
+        return int(last_modified.timestamp()) <= since.timestamp()
+    return False
+
+
+# Ответ 304 без тела (вместо сериализации моделей)
+def not_modified_response(etag: str, last_modified: datetime) -> Response:
+    return Response(status_code=304, headers=validators(etag, last_modified))
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл http_cache.py - поддержка условных GET-запросов для постов и пользователей
+
+# 2. Функция validators - заголовки ETag и Last-Modified, которые отправляются с ответом
+
+# 3. Функция is_not_modified - сравнивает If-None-Match / If-Modified-Since из запроса
+#    с текущими значениями. Если данные не менялись, маршрут сразу возвращает 304
+#    (функция not_modified_response), не сериализуя модели
+# */
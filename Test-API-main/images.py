@@ -0,0 +1,232 @@
+# Варианты изображений из uploads/: уменьшение и перекодирование с кешем на диске
+# Модуль для работы с циклом событий asyncio
+import asyncio
+# Модуль для работы с файловой системой
+import os
+# Модуль для блокировки индекса кеша (инвалидация вызывается из потоков пула)
+import threading
+# Модуль для генерации уникальных имён временных файлов
+import uuid
+# Упорядоченный словарь - порядок использования вариантов (LRU)
+from collections import OrderedDict
+# Пул процессов: обработка изображений не занимает цикл событий и GIL
+from concurrent.futures import ProcessPoolExecutor
+# Модуль для работы с путями файловой системы
+from pathlib import Path
+# Импорт типов для аннотаций
+from typing import Dict, Optional, Set
+
+# Pillow - необязательная зависимость: без неё варианты изображений недоступны (501)
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - зависит от окружения
+    Image = ImageOps = None
+
+# Поддерживаемые форматы вариантов: значение параметра fmt -> формат Pillow
+VARIANT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG", "jpg": "JPEG", "png": "PNG"}
+# Максимальная ширина и высота варианта
+MAX_DIMENSION = 4096
+# Допустимые размеры вариантов: запрошенная ширина/высота округляется вверх до ближайшего.
+# Маршрут открыт без аутентификации - произвольные размеры позволили бы заставлять сервер
+# обрабатывать и кешировать бесконечно много вариантов одного файла
+VARIANT_SIZES = (160, 320, 640, 960, 1280, 1920, 2560, MAX_DIMENSION)
+
+
+# Ближайший допустимый размер не меньше запрошенного (None - без ограничения по этой стороне)
+def snap_size(value: Optional[int]) -> Optional[int]:
+    if value is None:
+        return None
+    return next((size for size in VARIANT_SIZES if size >= value), MAX_DIMENSION)
+
+
+# Доступна ли обработка изображений
+def available() -> bool:
+    return Image is not None
+
+
+# Ошибка: исходный файл не является изображением, которое умеет открыть Pillow
+class InvalidImage(Exception):
+    pass
+
+
+# Ошибка: у изображения слишком много пикселей (защита Pillow от "бомб распаковки")
+class ImageTooLarge(Exception):
+    pass
+
+
+# Создание варианта (выполняется в процессе пула, поэтому функция верхнего уровня)
+def render_variant(src: str, dst: str, width: Optional[int], height: Optional[int], fmt: str) -> bytes:
+    """Уменьшает изображение до width x height (с сохранением пропорций, без увеличения)
+    и сохраняет в формате fmt. Возвращает содержимое файла варианта."""
+    tmp = f"{dst}.{uuid.uuid4().hex}.part"
+    try:
+        with Image.open(src) as img:
+            img = ImageOps.exif_transpose(img)  # Поворот по EXIF (фото с телефонов)
+            if width or height:
+                img.thumbnail((width or MAX_DIMENSION * 4, height or MAX_DIMENSION * 4))
+            if VARIANT_FORMATS[fmt] == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")  # JPEG без прозрачности
+            img.save(tmp, VARIANT_FORMATS[fmt], quality=80)
+        data = Path(tmp).read_bytes()
+    except Image.DecompressionBombError as exc:
+        Path(tmp).unlink(missing_ok=True)
+        raise ImageTooLarge(str(exc)) from None
+    except (OSError, ValueError) as exc:
+        Path(tmp).unlink(missing_ok=True)
+        raise InvalidImage(str(exc)) from None
+    os.replace(tmp, dst)  # Атомарное появление варианта в кеше
+    return data
+
+
+# Кеш вариантов на диске с ограничением общего размера и вытеснением давно не использованных (LRU).
+# Размер учитывается в памяти процесса: у нескольких воркеров с общей папкой предел у каждого свой
+class VariantCache:
+    def __init__(self, directory: Path, max_bytes: int, workers: Optional[int] = None):
+        self.directory = Path(directory)  # Папка вариантов (не отдаётся напрямую)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes  # Предельный общий размер вариантов
+        self.workers = workers  # Количество процессов обработки (None - по числу CPU)
+        self._pool: Optional[ProcessPoolExecutor] = None  # Создаётся при первой обработке
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # Имя варианта -> размер (порядок - LRU)
+        self._by_original: Dict[str, Set[str]] = {}  # Исходный файл -> его варианты
+        self._pending: Dict[str, asyncio.Future] = {}  # Варианты, которые создаются прямо сейчас
+        self.size = 0  # Текущий общий размер вариантов
+        # Восстановление индекса по папке: старые по времени доступа вытесняются первыми
+        entries = sorted(
+            (e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".part")),
+            key=lambda e: e.stat().st_atime,
+        )
+        for entry in entries:
+            self._add(entry.name, entry.stat().st_size)
+
+    @staticmethod
+    def variant_name(original: str, width: Optional[int], height: Optional[int], fmt: str) -> str:
+        # Имя файла варианта: исходное имя + параметры (по нему находятся все варианты файла)
+        return f"{original}__{width or 0}x{height or 0}.{fmt}"
+
+    @staticmethod
+    def _original_of(variant: str) -> str:
+        return variant.rsplit("__", 1)[0]
+
+    def _add(self, name: str, size: int):
+        self._files[name] = size
+        self._files.move_to_end(name)
+        self._by_original.setdefault(self._original_of(name), set()).add(name)
+        self.size += size
+
+    def _remove(self, name: str):
+        size = self._files.pop(name, None)
+        if size is None:
+            return
+        self.size -= size
+        original = self._original_of(name)
+        names = self._by_original.get(original)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._by_original[original]
+        (self.directory / name).unlink(missing_ok=True)
+
+    def _evict(self, keep: str):
+        # Удаление давно не использованных вариантов, пока кеш больше предела.
+        # Только что созданный вариант keep не удаляется, даже если он один больше предела
+        for name in list(self._files):
+            if self.size <= self.max_bytes:
+                break
+            if name != keep:
+                self._remove(name)
+
+    async def get(self, src: Path, width: Optional[int], height: Optional[int], fmt: str) -> bytes:
+        """Содержимое варианта src; при отсутствии вариант создаётся в пуле процессов.
+
+        Возвращаются байты, а не путь: файл может вытеснить или удалить параллельный запрос
+        (или другой воркер) раньше, чем ответ успеет его прочитать.
+        """
+        name = self.variant_name(src.name, width, height, fmt)
+        with self._lock:
+            cached = name in self._files
+            if cached:
+                self._files.move_to_end(name)  # Недавно использованный
+        if cached:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(None, (self.directory / name).read_bytes)
+            except FileNotFoundError:  # Вариант только что удалён - создаём заново
+                with self._lock:
+                    self._remove(name)
+        with self._lock:
+            pending = self._pending.get(name)
+            if pending is None:  # Одинаковые одновременные запросы ждут одну обработку
+                pending = self._pending[name] = asyncio.get_running_loop().create_future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return await asyncio.shield(pending)
+        try:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            data = await asyncio.get_running_loop().run_in_executor(
+                self._pool, render_variant, str(src), str(self.directory / name), width, height, fmt
+            )
+            with self._lock:
+                if not src.exists():  # Исходный файл удалили во время обработки
+                    (self.directory / name).unlink(missing_ok=True)
+                    raise FileNotFoundError(src.name)
+                self._add(name, len(data))
+                self._evict(keep=name)
+            pending.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as exc:
+            pending.set_exception(exc)
+            pending.exception()  # Ошибка передана ожидающим, предупреждение asyncio не нужно
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(name, None)
+
+    def invalidate(self, original: str):
+        # Удаление всех вариантов исходного файла (вызывается при удалении файла из uploads/)
+        with self._lock:
+            for name in list(self._by_original.get(original, ())):
+                self._remove(name)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл images.py - варианты изображений для маршрута GET /uploads/{name}?w=&h=&fmt=
+#    (уменьшенные копии для списков вместо полноразмерных фотографий)
+
+# 2. Функция render_variant - уменьшение и перекодирование изображения через Pillow.
+#    Выполняется в пуле процессов (ProcessPoolExecutor), поэтому не блокирует цикл
+#    событий и не конкурирует с запросами за GIL. Pillow - необязательная зависимость:
+#    без неё маршрут вариантов отвечает 501
+
+# 3. Класс VariantCache - кеш готовых вариантов в отдельной папке. Общий размер
+#    ограничен, при превышении удаляются давно не использованные варианты (LRU), кроме
+#    только что созданного. Метод get возвращает содержимое варианта, поэтому вытеснение
+#    параллельным запросом не ломает уже начатый ответ. Одинаковые одновременные запросы
+#    ждут одну обработку. При удалении исходного файла из uploads/ все его варианты
+#    удаляются (метод invalidate)
+
+# 4. Размер кеша считается в памяти процесса (при запуске - по содержимому папки). При
+#    нескольких воркерах uvicorn с общей папкой каждый ограничивает только свои варианты,
+#    и папка может вырасти до VARIANT_CACHE_SIZE x число воркеров - предел стоит делить
+#    на число воркеров. Вариант, удалённый другим воркером, просто создаётся заново
+
+# 5. Изображения больше предела Pillow (Image.MAX_IMAGE_PIXELS) не обрабатываются:
+#    ImageTooLarge, маршрут отвечает 422
+
+# 6. Функция snap_size - ширина и высота варианта округляются вверх до одного из размеров
+#    VARIANT_SIZES, поэтому у каждого файла ограниченное число вариантов (на каждый новый
+#    размер не тратятся процесс обработки и место в кеше)
+# */
@@ -1,15 +1,19 @@
 # Импорт необходимых модулей и классов из FastAPI и стандартной библиотеки Python
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, Response
+# Запуск блокирующих функций в пуле потоков из async-маршрутов
+from fastapi.concurrency import run_in_threadpool
+# Преобразование моделей в JSON-совместимые объекты (как при обычном ответе FastAPI)
+from fastapi.encoders import jsonable_encoder
 # Middleware для обработки CORS (Cross-Origin Resource Sharing)
 from fastapi.middleware.cors import CORSMiddleware
+# Потоковый ответ (большие списки отправляются частями) и JSON-ответ с явным статусом
+from fastapi.responses import JSONResponse, StreamingResponse
 # Модуль для базовой HTTP аутентификации
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-# Модуль для обслуживания статических файлов
-from fastapi.staticfiles import StaticFiles
 # Базовый класс для создания моделей данных с валидацией
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 # Импорт типов для аннотаций
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 # Модуль для генерации уникальных идентификаторов
 import uuid
 # Модуль для работы с датой и временем
@@ -18,43 +22,302 @@ from datetime import datetime
 from enum import Enum
 # Модуль для работы с путями файловой системы
 from pathlib import Path
-# Модуль для высокоуровневых файловых операций
-import shutil
+# Модуль для чтения переменных окружения
+import os
+# Модуль для аргументов командной строки и завершения процесса с сообщением
+import sys
+# Модуль для фоновой синхронизации ленты изменений
+import asyncio
+# Модуль для округления Retry-After вверх
+import math
+# Модуль для сериализации объектов потокового ответа без кеша хранилища
+import json
+# Контекстный менеджер жизненного цикла приложения (запуск и остановка)
+from contextlib import asynccontextmanager
+# Хранилище постов с индексом по дате создания
+from store import InvalidCursor, PostStore, Store, UserStore
+# Подключаемые бэкенды хранения данных (память или журнал WAL)
+from storage import DuplicateKey, StorageLocked, create_backend
+# Хеширование паролей и кеш проверенных учётных данных
+from auth import Authenticator, hash_password
+# Условные GET-запросы (ETag / Last-Modified / 304)
+from http_cache import is_not_modified, not_modified_response, validators
+# Лента изменений студентов (Server-Sent Events)
+from feed import ChangeHub, SubscriberEvicted, sse_frame
+# Сжатие ответов gzip/brotli и сжатые копии загрузок
+from delivery import CompressionMiddleware, PRECOMPRESS_EXTENSIONS, precompress
+# Варианты изображений (уменьшение и перекодирование в пуле процессов, кеш на диске)
+import images
+# Метрики запросов (Prometheus) и профилировщик медленных запросов
+from metrics import MetricsMiddleware, SlowRequestProfiler, create_registry
+# Ограничение частоты запросов и одновременных загрузок
+from ratelimit import ConcurrencyGate, MemoryBuckets, RateLimiter, SqliteBuckets, UploadConcurrencyMiddleware, parse_budgets
+# Реестр ссылок постов на загруженные файлы
+from media import (
+    UploadLimitMiddleware, UploadRegistry, UploadsStaticFiles, UploadTooLarge, format_size, reconcile, spooling_route,
+    stream_upload,
+)
+
+# Жизненный цикл приложения: фоновые задачи при запуске, закрытие хранилища при остановке
+# (функции объявлены ниже, рядом с тем, что они запускают и останавливают)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_metrics()
+    await start_feed_sync()
+    try:
+        yield
+    finally:
+        for name in ("metrics_flush", "feed_sync"):  # Остановка фоновых задач
+            task = getattr(app.state, name, None)
+            if task is not None:
+                task.cancel()
+        close_storage()
 
 # Создание экземпляра FastAPI приложения с метаданными
 app = FastAPI(
     title="Учебный API для постов и пользователей",  # Название API
     description="API для изучения работы с REST запросами, Basic Auth и загрузкой изображений",  # Описание API
     version="1.2.0",  # Версия API
+    lifespan=lifespan,  # Запуск и остановка фоновых задач и хранилища
+)
+
+# --- Сжатие ответов ---
+# Кодировки сжатия через запятую в порядке предпочтения (COMPRESSION=off - без сжатия)
+COMPRESSION = [e.strip() for e in os.environ.get("COMPRESSION", "br,gzip").split(",") if e.strip() not in ("", "off")]
+# Ответы меньше COMPRESS_MIN_SIZE байт не сжимаются; уровни сжатия gzip (1-9) и brotli (0-11)
+app.add_middleware(
+    CompressionMiddleware,
+    encodings=COMPRESSION,
+    minimum_size=int(os.environ.get("COMPRESS_MIN_SIZE", 1024)),
+    gzip_level=int(os.environ.get("GZIP_LEVEL", 6)),
+    brotli_quality=int(os.environ.get("BROTLI_QUALITY", 4)),
+)
+
+# --- Обслуживание статических файлов (загрузки) ---
+UPLOAD_DIR = Path("uploads")  # Создание объекта Path для директории загрузок
+UPLOAD_DIR.mkdir(exist_ok=True)  # Создание директории, если она не существует
+UPLOAD_TMP_DIR = Path("uploads_tmp")  # Директория для недописанных загрузок (не отдаётся клиентам)
+UPLOAD_TMP_DIR.mkdir(exist_ok=True)
+# Формы загрузок разбираются сразу в UPLOAD_TMP_DIR: файл пишется на диск один раз и переименовывается
+app.router.route_class = spooling_route(UPLOAD_TMP_DIR)
+# Режим адресации по содержимому: одинаковые изображения хранятся одним файлом <sha256>.<ext>
+UPLOAD_CONTENT_ADDRESSED = os.environ.get("UPLOAD_CONTENT_ADDRESSED", "0") == "1"
+# Максимальный размер загружаемого изображения в байтах (по умолчанию 20 МБ)
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 20 * 1024 * 1024))
+# Не больше UPLOAD_MAX_ACTIVE одновременных загрузок на процесс и UPLOAD_MAX_WAITING в очереди
+# (ожидание до UPLOAD_WAIT_TIMEOUT секунд), остальным - 503 с Retry-After до чтения тела
+upload_gate = ConcurrencyGate(
+    max_active=int(os.environ.get("UPLOAD_MAX_ACTIVE", 8)),
+    max_waiting=int(os.environ.get("UPLOAD_MAX_WAITING", 32)),
+    wait_timeout=float(os.environ.get("UPLOAD_WAIT_TIMEOUT", 10)),
 )
+app.add_middleware(UploadConcurrencyMiddleware, gate=upload_gate)
+# Отклонение слишком больших загрузок до чтения тела (запас 64 КБ на поля формы)
+# (внешний слой относительно очереди загрузок: слишком большой файл не занимает место в очереди)
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_SIZE + 64 * 1024, label_bytes=MAX_UPLOAD_SIZE)
+
+# --- Метрики (GET /metrics) ---
+# METRICS_DIR - общая папка снимков метрик для нескольких воркеров (uvicorn --workers N)
+metrics = create_registry(Path(os.environ["METRICS_DIR"]) if os.environ.get("METRICS_DIR") else None)
+# Профилировщик медленных запросов включается порогом SLOW_REQUEST_MS (интервал снимков - PROFILE_INTERVAL_MS)
+slow_profiler = SlowRequestProfiler(
+    threshold=float(os.environ["SLOW_REQUEST_MS"]) / 1000,
+    interval=float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000,
+) if os.environ.get("SLOW_REQUEST_MS") else None
+# Middleware метрик - внешний слой (внутри CORS): время и размеры с учётом сжатия и проверки размера
+if os.environ.get("METRICS", "1") == "1":
+    app.add_middleware(MetricsMiddleware, registry=metrics, routes=app.routes, profiler=slow_profiler)
 
 # --- CORS (Cross-Origin Resource Sharing) ---
-# Добавление middleware для обработки CORS
+# Добавляется последним - самый внешний слой: заголовки CORS получают и ответы, созданные
+# другими middleware (413 слишком большой загрузки, 503 очереди загрузок), иначе браузер
+# показал бы ошибку CORS вместо настоящей причины
 app.add_middleware(
     CORSMiddleware,  # Класс middleware для CORS
     allow_origins=["*"],  # Разрешить запросы со всех источников
     allow_credentials=True,  # Разрешить отправку учетных данных
     allow_methods=["*"],  # Разрешить все HTTP методы
     allow_headers=["*"],  # Разрешить все заголовки
+    # Заголовки ответа, доступные JavaScript другого источника (axios во фронтенде):
+    # общее количество, курсор следующей страницы, валидаторы кеша и время повтора после 429/503
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag", "Last-Modified", "Retry-After"],
 )
 
-# --- Обслуживание статических файлов (загрузки) ---
-UPLOAD_DIR = Path("uploads")  # Создание объекта Path для директории загрузок
-UPLOAD_DIR.mkdir(exist_ok=True)  # Создание директории, если она не существует
-# Монтирование директории со статическими файлами
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# Показатели, которые вычисляются при чтении метрик
+def _uploads_bytes():
+    with os.scandir(UPLOAD_DIR) as entries:  # Один проход по папке загрузок
+        yield (), sum(e.stat().st_size for e in entries if e.is_file())
+
+metrics.gauge("app_store_objects", "Количество объектов в хранилище", ("store",), lambda: [
+    (("posts",), len(posts_db)), (("users",), len(users_db)), (("students",), len(students_db)),
+])
+metrics.gauge("app_uploads_bytes", "Общий размер файлов в uploads/", (), _uploads_bytes)
+metrics.gauge("app_variant_cache_bytes", "Размер кеша вариантов изображений", (), lambda: [((), image_variants.size)])
+metrics.gauge("app_feed_subscribers", "Подписчики ленты изменений студентов", (), lambda: [((), len(students_feed))])
+metrics.gauge("app_uploads_active", "Загрузки в обработке и в очереди", ("state",), lambda: [
+    (("active",), upload_gate.active), (("waiting",), upload_gate.waiting),
+])
+metrics.gauge("app_uploads_rejected", "Загрузки, отклонённые из-за переполненной очереди", (), lambda: [((), upload_gate.rejected)])
+
+# Маршрут метрик в текстовом формате Prometheus
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    metrics.write_snapshot()  # Свежий снимок этого воркера для остальных (если задан METRICS_DIR)
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+# Срок кеширования загрузок в браузере (имена файлов не меняются; 0 - всегда перепроверять)
+UPLOAD_CACHE_MAX_AGE = int(os.environ.get("UPLOAD_CACHE_MAX_AGE", 365 * 24 * 3600))
+# Статические файлы загрузок (ETag по хешу для файлов <sha256>.<ext>, Range, сжатые копии)
+uploads_static = UploadsStaticFiles(directory=str(UPLOAD_DIR), max_age=UPLOAD_CACHE_MAX_AGE)
+# Кеш вариантов изображений: папка, предельный размер (по умолчанию 256 МБ) и число процессов обработки.
+# Предел действует на процесс: при --workers N папка может занять до N x VARIANT_CACHE_SIZE
+image_variants = images.VariantCache(
+    Path(os.environ.get("VARIANT_CACHE_DIR", "uploads_variants")),
+    max_bytes=int(os.environ.get("VARIANT_CACHE_SIZE", 256 * 1024 * 1024)),
+    workers=int(os.environ["IMAGE_WORKERS"]) if os.environ.get("IMAGE_WORKERS") else None,
+)
+# Варианты, ссылки на которые отдаются в постах (поле image_variants)
+IMAGE_VARIANTS = {"thumb": "w=320&fmt=webp", "medium": "w=960&fmt=webp"}
+
+# Маршрут для получения загруженного файла или его варианта: /uploads/{name}?w=&h=&fmt=webp.
+# Объявлен до монтирования /uploads, иначе запрос перехватили бы статические файлы
+@app.get("/uploads/{name}")
+async def get_upload(
+    name: str,
+    request: Request,
+    w: Optional[int] = None,  # Максимальная ширина варианта (округляется вверх до images.VARIANT_SIZES)
+    h: Optional[int] = None,  # Максимальная высота варианта (так же)
+    fmt: Optional[str] = None,  # Формат варианта: webp, jpeg, png
+):
+    if w is None and h is None and fmt is None:  # Исходный файл - как раньше, через StaticFiles
+        return await uploads_static.get_response(name, request.scope)
+    if not images.available():  # Pillow не установлен
+        raise HTTPException(status_code=501, detail="Обработка изображений недоступна (нужен пакет Pillow)")
+    if any(v is not None and not 1 <= v <= images.MAX_DIMENSION for v in (w, h)):
+        raise HTTPException(status_code=400, detail=f"w и h должны быть от 1 до {images.MAX_DIMENSION}")
+    if fmt is None:  # Формат по умолчанию - формат исходного файла (если поддерживается), иначе webp
+        fmt = Path(name).suffix.lstrip(".").lower()
+        fmt = fmt if fmt in images.VARIANT_FORMATS else "webp"
+    fmt = fmt.lower()
+    if fmt not in images.VARIANT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"fmt: допустимые форматы - {', '.join(images.VARIANT_FORMATS)}")
+    fmt = "jpeg" if fmt == "jpg" else fmt  # Один вариант в кеше для jpg и jpeg
+    # Размеры округляются вверх до images.VARIANT_SIZES: вариантов у файла конечное число
+    w, h = images.snap_size(w), images.snap_size(h)
+    src = UPLOAD_DIR / name
+    if name.startswith(".") or not src.is_file():  # Только файлы из uploads/
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    try:
+        data = await image_variants.get(src, w, h, fmt)  # Из кеша или обработка в пуле процессов
+    except images.InvalidImage:
+        raise HTTPException(status_code=415, detail="Файл не является поддерживаемым изображением")
+    except images.ImageTooLarge:  # Слишком много пикселей для обработки
+        raise HTTPException(status_code=422, detail="Изображение слишком большое для обработки")
+    except FileNotFoundError:  # Исходный файл удалён во время обработки
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    return Response(
+        data, media_type=f"image/{fmt}",
+        headers={"cache-control": uploads_static.cache_control},  # Вариант неизменяемого файла тоже неизменяем
+    )
+
+# Монтирование директории со статическими файлами (запросы, не обработанные маршрутом выше, например HEAD)
+app.mount("/uploads", uploads_static, name="uploads")
+
+# --- Хранение данных ---
+# Бэкенд хранения: memory (по умолчанию, данные теряются при перезапуске) или wal (журнал на диске)
+try:
+    storage = create_backend(os.environ.get("STORAGE_BACKEND", "memory"), Path(os.environ.get("STORAGE_DIR", "data")))
+except StorageLocked as exc:
+    if sys.argv[1:2] == ["reconcile-uploads"]:
+        # Сверка открыла бы журнал работающего сервера: свернула бы его в снимок и очистила,
+        # пока сервер дописывает в него изменения
+        sys.exit(f"Папка данных занята работающим сервером ({exc}): остановите его перед сверкой загрузок")
+    # Журнал wal уже открыт другим процессом: uvicorn --workers N без общего бэкенда sqlite
+    sys.exit(f"Бэкенд wal не поддерживает несколько процессов ({exc}); для воркеров нужен STORAGE_BACKEND=sqlite")
+
+# Завершение записи журнала при остановке приложения
+def close_storage():
+    storage.close()
+    image_variants.close()  # Остановка пула процессов обработки изображений
+    metrics.remove_snapshot()  # Снимок метрик остановленного воркера больше не нужен
+
+# Запуск профилировщика и периодическая запись снимка метрик (для /metrics других воркеров)
+async def start_metrics():
+    if slow_profiler is not None:
+        slow_profiler.start()
+    if metrics.directory is None:
+        return
+
+    async def flush_loop():
+        while True:
+            await run_in_threadpool(metrics.write_snapshot)
+            await asyncio.sleep(metrics.stale_after / 4)
+
+    app.state.metrics_flush = asyncio.create_task(flush_loop())
+
+# Подтягивание изменений других процессов перед каждым запросом (общий бэкенд sqlite, uvicorn --workers N)
+def sync_storage():
+    for store in (posts_db, users_db, students_db):
+        store.sync()
+
+if storage.shared:
+    app.router.dependencies.append(Depends(sync_storage))  # Применяется ко всем маршрутам, объявленным ниже
 
 # --- Аутентификация (Basic Auth) ---
 security = HTTPBasic()  # Создание экземпляра HTTPBasic аутентификации
-# Словарь с пользователями и паролями (в реальном приложении хранить в базе данных)
-USERS = {"admin": "123"}
+# Словарь с пользователями и хешами паролей (в реальном приложении хранить в базе данных)
+USERS = {"admin": hash_password("123")}
+# Проверка паролей с кешем успешных проверок (размер и время жизни - из переменных окружения)
+authenticator = Authenticator(
+    USERS,
+    cache_size=int(os.environ.get("AUTH_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("AUTH_CACHE_TTL", "300")),
+    # Ключ подписи токенов ленты событий; при нескольких воркерах задаётся явно (общий для всех)
+    token_secret=os.environ.get("EVENTS_TOKEN_SECRET", "").encode() or None,
+)
+
+# --- Ограничение частоты запросов (token bucket) ---
+# Бюджеты маршрутов: имя=количество/период[:всплеск]; RATE_LIMIT=0 - без ограничений.
+# auth - неудачные попытки входа (каждая стоит полного вычисления хеша пароля)
+RATE_LIMITS = parse_budgets(os.environ.get(
+    "RATE_LIMITS", "upload=60/min:20,write=1200/min:200,demo_users=10/min:5,auth=30/min:10",
+))
+# Корзины в общей базе SQLite при общем бэкенде хранения (один лимит на все воркеры), иначе в памяти
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "sqlite" if storage.shared else "memory")
+rate_limiter = RateLimiter(
+    SqliteBuckets(Path(os.environ.get("STORAGE_DIR", "data")) / "ratelimit.sqlite3")
+    if RATE_LIMIT_BACKEND == "sqlite" else MemoryBuckets(),
+    RATE_LIMITS if os.environ.get("RATE_LIMIT", "1") == "1" else {},
+    ip_factor=float(os.environ.get("RATE_LIMIT_IP_FACTOR", 4)),  # Бюджет IP-адреса в N раз больше бюджета пользователя
+)
+metrics.counter("app_rate_limited_total", "Запросы, отклонённые ограничением частоты", ("budget",))
+
+# IP-адрес клиента (ключ корзин ограничения частоты)
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+# Ответ 429 Too Many Requests с временем, через которое запрос можно повторить
+def _too_many_requests(budget: str, retry_after: float) -> HTTPException:
+    metrics.inc("app_rate_limited_total", (budget,))
+    return HTTPException(
+        status_code=429,  # Too Many Requests
+        detail="Слишком много запросов, повторите позже",
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
 
 # Функция для аутентификации пользователя
-def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
+def authenticate_user(request: Request, credentials: HTTPBasicCredentials = Depends(security)):
     username = credentials.username  # Получение имени пользователя из credentials
     password = credentials.password  # Получение пароля из credentials
-    # Проверка существования пользователя и корректности пароля
-    if username not in USERS or password != USERS[username]:
+    ip = _client_ip(request)
+    # Клиент, исчерпавший бюджет неудачных попыток, получает 429 до вычисления хеша пароля
+    retry_after = rate_limiter.exhausted("auth", username, ip)
+    if retry_after:
+        raise _too_many_requests("auth", retry_after)
+    # Проверка существования пользователя и корректности пароля (по хешу, за постоянное время)
+    with metrics.timed("authenticate"):  # Время проверки пароля (хеш или кеш)
+        verified = authenticator.verify(username, password)
+    if not verified:
+        rate_limiter.check("auth", username, ip)  # Неудачная попытка расходует бюджет auth
         # Вызов исключения при неудачной аутентификации
         raise HTTPException(
             status_code=401,  # Код статуса HTTP 401 Unauthorized
@@ -63,6 +326,97 @@ def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
         )
     return username  # Возврат имени пользователя при успешной аутентификации
 
+# Зависимость маршрута: списание токена из бюджета пользователя (на его IP-адресе) и самого IP-адреса,
+# затем аутентификация. Бюджет проверяется до пароля, поэтому его расходуют и запросы с неверным паролем
+def rate_limited(budget: str):
+    def dependency(request: Request, credentials: HTTPBasicCredentials = Depends(security)) -> str:
+        retry_after = rate_limiter.check(budget, credentials.username, _client_ip(request))
+        if retry_after:
+            raise _too_many_requests(budget, retry_after)
+        return authenticate_user(request, credentials)
+    return dependency
+
+# --- Быстрые JSON-ответы ---
+# Быстрый режим (FAST_JSON=1): готовый JSON из кеша хранилища без повторной валидации response_model
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+
+# Ответ с готовым JSON; заголовки, выставленные маршрутом (ETag, X-Next-Cursor), переносятся
+def _json_response(body: bytes, response: Response) -> Response:
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Размер порции потокового ответа (объекты склеиваются в блоки, а не отправляются по одному)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Сериализация объекта так же, как в обычном ответе FastAPI (jsonable_encoder + JSONResponse)
+def _encode_json(obj) -> bytes:
+    return json.dumps(jsonable_encoder(obj), ensure_ascii=False, separators=(",", ":")).encode()
+
+# Потоковый JSON-массив: объекты сериализуются по мере отправки, весь список в памяти не собирается.
+# В быстром режиме (FAST_JSON=1) JSON берётся из кеша хранилища (и попадает в него), иначе кеш не трогается
+def _stream_json(store: Store, objects, response: Response) -> StreamingResponse:
+    def chunks():
+        buffer = bytearray(b"[")
+        for i, obj in enumerate(objects):
+            if i:
+                buffer += b","
+            buffer += store.json_bytes(obj.id, obj) if FAST_JSON else _encode_json(obj)
+            if len(buffer) >= STREAM_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b"]"
+        yield bytes(buffer)
+
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return StreamingResponse(chunks(), media_type="application/json", headers=headers)
+
+# Направление сортировки в параметре _order
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+# Даты фильтров сравниваются с локальным временем без часового пояса (как created_at/updated_at)
+def _local(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+# Проверка поля сортировки по списку индексированных полей хранилища
+def _sort_field(store: Store, sort: str) -> str:
+    if sort not in store.sort_fields:
+        allowed = ", ".join(store.sort_fields)
+        raise HTTPException(status_code=400, detail=f"_sort: допустимые поля - {allowed}")
+    return sort
+
+# --- Пакетные операции (маршруты :batch) ---
+# Максимальное количество элементов в одном пакете
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "10000"))
+
+# Результат обработки одного элемента пакета
+class BatchItemResult(BaseModel):
+    index: int  # Позиция элемента в запросе
+    status: int  # HTTP-статус элемента: 200 - применён, 400/404 - ошибка
+    id: Optional[Union[int, str]] = None  # ID созданного или изменённого объекта
+    detail: Optional[str] = None  # Описание ошибки
+
+# Ответ пакетного маршрута
+class BatchResult(BaseModel):
+    applied: bool  # Применён ли пакет (пакет применяется целиком или не применяется вовсе)
+    results: List[BatchItemResult]  # Результаты по элементам в порядке запроса
+
+# Проверка размера пакета
+def _check_batch_size(items: list):
+    if not items or len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Пакет должен содержать от 1 до {MAX_BATCH_SIZE} элементов")
+
+# Отказ в применении пакета: 400 и результаты по всем элементам. Ошибочные элементы - со своим
+# статусом, корректные - 424 (не применены из-за ошибок в других элементах)
+def _batch_rejected(results: List[BatchItemResult]) -> JSONResponse:
+    for result in results:
+        if result.status == 200:
+            result.status, result.detail = 424, "Не применён: в пакете есть ошибки"
+    return JSONResponse(status_code=400, content=BatchResult(applied=False, results=results).model_dump())
+
 # =========================================
 #                 ПОСТЫ
 # =========================================
@@ -91,58 +445,55 @@ class Post(BaseModel):
     created_at: datetime  # Дата и время создания
     updated_at: datetime  # Дата и время последнего обновления
 
-# Словарь для хранения постов в памяти (временная замена базы данных)
-posts_db: dict[str, Post] = {}
-
-# Функция для сохранения загруженного файла
-def _save_upload(file: UploadFile) -> str:
+    # Ссылки на уменьшенные варианты локального изображения (для списков постов)
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[Dict[str, str]]:
+        if not self.image_file or not images.available():
+            return None
+        return {size: f"/uploads/{self.image_file}?{query}" for size, query in IMAGE_VARIANTS.items()}
+
+# Хранилище постов в памяти (временная замена базы данных), упорядоченное по created_at
+posts_db = PostStore(model=Post, backend=storage)
+# Счётчики ссылок постов на файлы из /uploads (восстанавливаются по сохранённым постам)
+upload_refs = UploadRegistry()
+upload_refs.rebuild(p.image_file for p in posts_db.values())
+
+# Учёт ссылок на файлы из постов, изменённых другими процессами
+def _sync_upload_refs(old: Optional[Post], new: Optional[Post]):
+    upload_refs.release(old.image_file if old else None)  # Файл удаляет процесс, изменивший пост
+    upload_refs.acquire(new.image_file if new else None)
+
+posts_db.on_remote_change = _sync_upload_refs
+
+# Функция для сохранения загруженного файла (асинхронно, порциями, без блокировки цикла событий).
+# Возвращает имя файла, ссылка нового поста на который уже учтена
+async def _save_upload(file: UploadFile) -> str:
     # Получение расширения файла в нижнем регистре
     ext = Path(file.filename or "").suffix.lower()
     # Проверка допустимых расширений файлов
     if ext not in {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}:
         # Вызов исключения при недопустимом формате файла
         raise HTTPException(status_code=400, detail="Допустимы изображения: jpg, png, gif, webp, bmp")
-    # Генерация уникального имени файла
-    fname = f"{uuid.uuid4().hex}{ext}"
-    # Создание полного пути к файлу
-    dst = UPLOAD_DIR / fname
-    # Сохранение файла на диск
-    with open(dst, "wb") as f:
-        shutil.copyfileobj(file.file, f)  # Копирование содержимого файла
+    # Сохранение файла на диск через временный файл с атомарным переименованием.
+    # Имя файла - uuid4 или sha256 содержимого, ссылка на файл уже учтена в upload_refs
+    try:
+        with metrics.timed("save_upload"):  # Время записи загрузки на диск
+            fname = await stream_upload(
+                file, ext, UPLOAD_DIR, UPLOAD_TMP_DIR, upload_refs, MAX_UPLOAD_SIZE,
+                content_addressed=UPLOAD_CONTENT_ADDRESSED,
+            )
+    except UploadTooLarge:
+        # Вызов исключения при превышении допустимого размера
+        raise HTTPException(status_code=413, detail=f"Файл больше {format_size(MAX_UPLOAD_SIZE)}")
     return fname  # Возврат имени сохраненного файла
 
-# Функция проверки использования файла другими постами
-def _file_in_use(filename: Optional[str], exclude_id: Optional[str] = None) -> bool:
-    if not filename:  # Если имя файла не указано
-        return False
-    # Проверка всех постов кроме исключенного
-    for pid, p in posts_db.items():
-        if pid != exclude_id and p.image_file == filename:
-            return True  # Файл используется другим постом
-    return False  # Файл не используется
-
-# Функция удаления загруженного файла
-def _delete_upload(filename: Optional[str]):
-    if filename:  # Если имя файла указано
-        try:
-            # Попытка удаления файла (игнорирование если файл не существует)
-            (UPLOAD_DIR / filename).unlink(missing_ok=True)
-        except Exception:
-            pass  # Игнорирование любых ошибок при удалении
-
 # Функция удаления файла если он не используется
-def _delete_upload_if_unused(filename: Optional[str], exclude_id: Optional[str] = None):
-    """Удаляем файл из /uploads, но только если он больше никому не нужен."""
-    if not filename:  # Если имя файла не указано
-        return
-    # Проверка использования файла другими постами
-    if _file_in_use(filename, exclude_id=exclude_id):
-        return  # Выход если файл используется
-    try:
-        # Попытка удаления файла
-        (UPLOAD_DIR / filename).unlink(missing_ok=True)
-    except Exception:
-        pass  # Игнорирование ошибок
+def _delete_upload_if_unused(filename: Optional[str]):
+    """Снимаем ссылку поста на файл и удаляем его из /uploads, если он больше никому не нужен."""
+    # Снятие ссылки и удаление файла, если его не используют другие посты (одной операцией реестра)
+    if upload_refs.release_file(filename, UPLOAD_DIR):
+        image_variants.invalidate(filename)  # Варианты удалённого файла больше не нужны
 
 # Маршрут для корневого URL
 @app.get("/")
@@ -162,25 +513,90 @@ def get_current_user(current_user: str = Depends(authenticate_user)):
 # ------ CRUD операции для постов (JSON) ------
 # Маршрут для получения списка постов
 @app.get("/api/posts", response_model=List[Post])
-def get_posts(_limit: Optional[int] = None, _start: Optional[int] = None, current_user: str = Depends(authenticate_user)):
-    posts = list(posts_db.values())  # Получение всех постов
-    posts.sort(key=lambda x: x.created_at)  # Сортировка по дате создания (по возрастанию)
-    if _start is not None and _start > 0:  # Если указан параметр начала
-        posts = posts[_start:]  # Применение пагинации (начальная позиция)
-    if _limit is not None and _limit > 0:  # Если указан лимит
-        posts = posts[:_limit]  # Применение пагинации (количество записей)
+def get_posts(
+    request: Request,
+    response: Response,
+    _limit: Optional[int] = None,
+    _start: Optional[int] = None,
+    _cursor: Optional[str] = None,  # Непрозрачный курсор из заголовка X-Next-Cursor
+    author: Optional[str] = None,  # Фильтр по автору (без учёта регистра)
+    created_from: Optional[datetime] = None,  # Диапазон даты создания (включительно)
+    created_to: Optional[datetime] = None,
+    updated_from: Optional[datetime] = None,  # Диапазон даты обновления (включительно)
+    updated_to: Optional[datetime] = None,
+    _sort: Optional[str] = None,  # Поле сортировки: created_at, updated_at, title, author
+    _order: SortOrder = SortOrder.asc,  # Направление сортировки
+    current_user: str = Depends(authenticate_user),
+):
+    # ETag коллекции по счётчику версий: если посты не менялись - 304 без сериализации
+    etag, last_modified = posts_db.etag(), posts_db.last_modified
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers.update(validators(etag, last_modified))
+    filtered = any(v is not None for v in (author, created_from, created_to, updated_from, updated_to, _sort))
+    if filtered or _order is SortOrder.desc:
+        if _cursor is not None:  # Курсор привязан к порядку по дате создания без фильтров
+            raise HTTPException(status_code=400, detail="_cursor нельзя сочетать с фильтрами и сортировкой")
+        # Выборка по вторичным индексам: без копирования и сортировки всей коллекции
+        total, posts = posts_db.query(
+            author=author,
+            created=(_local(created_from), _local(created_to)),
+            updated=(_local(updated_from), _local(updated_to)),
+            sort=_sort_field(posts_db, _sort or "created_at"),
+            descending=_order is SortOrder.desc,
+            start=_start or 0,
+            limit=_limit,
+        )
+        response.headers["X-Total-Count"] = str(total)  # Общее количество подходящих постов
+        return _stream_json(posts_db, posts, response)
+    response.headers["X-Total-Count"] = str(len(posts_db))  # Общее количество постов
+    try:
+        # Страница постов по дате создания (по возрастанию) без сортировки всего списка
+        posts, next_cursor = posts_db.page(start=_start or 0, limit=_limit, cursor=_cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")  # Ошибка разбора курсора
+    if next_cursor:  # Если есть следующая страница - передаём курсор в заголовке
+        response.headers["X-Next-Cursor"] = next_cursor
+    if FAST_JSON:  # Готовый JSON из кеша хранилища
+        return _json_response(posts_db.json_list(posts), response)
     return posts  # Возврат списка постов
 
+# Маршрут для поиска постов по словам заголовка, текста и автора
+# (объявлен до /api/posts/{post_id}, иначе "search" был бы принят за ID поста)
+@app.get("/api/posts/search", response_model=List[Post])
+def search_posts(
+    response: Response,
+    q: str,  # Поисковый запрос
+    _start: int = 0,  # Смещение в списке результатов
+    _limit: int = 20,  # Количество результатов на странице
+    current_user: str = Depends(authenticate_user),
+):
+    if _limit <= 0 or _limit > 100:  # Проверка размера страницы
+        raise HTTPException(status_code=400, detail="_limit должен быть от 1 до 100")
+    posts, total = posts_db.search(q, start=_start, limit=_limit)  # Поиск по инвертированному индексу
+    response.headers["X-Total-Count"] = str(total)  # Общее количество найденных постов
+    if FAST_JSON:  # Готовый JSON из кеша хранилища
+        return _json_response(posts_db.json_list(posts), response)
+    return posts  # Посты по убыванию релевантности
+
 # Маршрут для получения конкретного поста по ID
 @app.get("/api/posts/{post_id}", response_model=Post)
-def get_post(post_id: str, current_user: str = Depends(authenticate_user)):
+def get_post(post_id: str, request: Request, response: Response, current_user: str = Depends(authenticate_user)):
     if post_id not in posts_db:  # Проверка существования поста
         raise HTTPException(status_code=404, detail="Пост не найден")  # Ошибка если пост не найден
-    return posts_db[post_id]  # Возврат найденного поста
+    p = posts_db[post_id]  # Получение поста
+    # ETag и Last-Modified поста по времени его последнего изменения
+    etag, last_modified = f'"{p.id}-{p.updated_at.timestamp()}"', p.updated_at
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers.update(validators(etag, last_modified))
+    if FAST_JSON:  # Готовый JSON из кеша хранилища
+        return _json_response(posts_db.json_bytes(post_id), response)
+    return p  # Возврат найденного поста
 
 # Маршрут для создания нового поста
 @app.post("/api/posts", response_model=Post)
-def create_post(post: PostCreate, current_user: str = Depends(authenticate_user)):
+def create_post(post: PostCreate, current_user: str = Depends(rate_limited("write"))):
     post_id = str(uuid.uuid4())  # Генерация уникального ID для поста
     now = datetime.now()  # Текущее время
     # Создание нового объекта поста
@@ -197,27 +613,46 @@ def create_post(post: PostCreate, current_user: str = Depends(authenticate_user)
     posts_db[post_id] = new_post  # Сохранение поста в "базе данных"
     return new_post  # Возврат созданного поста
 
+# Маршрут для пакетного создания постов (одна запись в хранилище на весь пакет)
+@app.post("/api/posts:batch", response_model=BatchResult)
+def create_posts_batch(posts: List[PostCreate], current_user: str = Depends(rate_limited("write"))):
+    _check_batch_size(posts)  # Все элементы уже проверены моделью PostCreate
+    now = datetime.now()  # Общее время создания пакета
+    new_posts = [
+        Post(id=str(uuid.uuid4()), image_file=None, created_at=now, updated_at=now, **post.model_dump())
+        for post in posts
+    ]
+    posts_db.save_many(new_posts)  # Сохранение всего пакета
+    return BatchResult(applied=True, results=[BatchItemResult(index=i, status=200, id=p.id) for i, p in enumerate(new_posts)])
+
 # Маршрут для обновления существующего поста
 @app.put("/api/posts/{post_id}", response_model=Post)
-def update_post(post_id: str, post_update: PostUpdate, current_user: str = Depends(authenticate_user)):
-    if post_id not in posts_db:  # Проверка существования поста
-        raise HTTPException(status_code=404, detail="Пост не найден")  # Ошибка если пост не найден
-    p = posts_db[post_id]  # Получение поста из базы данных
+def update_post(post_id: str, post_update: PostUpdate, current_user: str = Depends(rate_limited("write"))):
     # Преобразование модели обновления в словарь (исключая незаданные поля)
     upd = post_update.dict(exclude_unset=True)
+    # Чтение-изменение-запись под блокировкой поста: параллельные изменения не теряются
+    with posts_db.locked(post_id):
+        if post_id not in posts_db:  # Проверка существования поста
+            raise HTTPException(status_code=404, detail="Пост не найден")  # Ошибка если пост не найден
+        # Изменяется копия поста: читатели не видят частично обновлённый пост
+        p = posts_db[post_id].model_copy()
+        old_file = _apply_post_update(p, upd)
+        posts_db[post_id] = p  # Сохранение и обновление индексов
+        # Старый файл освобождается только после успешного сохранения (при ошибке пост ссылается на него)
+        _delete_upload_if_unused(old_file)
+    return p  # Возврат обновленного поста
 
+# Применение изменений PUT /api/posts/{post_id} к копии поста.
+# Возвращает файл, от которого пост отказался (освобождается после сохранения поста)
+def _apply_post_update(p: Post, upd: dict) -> Optional[str]:
     # Нормализация пустой строки в None для image_url
     if "image_url" in upd and isinstance(upd["image_url"], str) and upd["image_url"].strip() == "":
         upd["image_url"] = None
 
-    # Если установлен новый внешний URL и ранее был локальный файл - удаляем файл
-    if "image_url" in upd and upd["image_url"] is not None and p.image_file:
-        _delete_upload_if_unused(p.image_file, exclude_id=post_id)  # Удаление если не используется
-        p.image_file = None  # Очистка поля локального файла
-
-    # Если явно установлен image_url = None и был файл - удаляем файл
-    if "image_url" in upd and upd["image_url"] is None and p.image_file:
-        _delete_upload_if_unused(p.image_file, exclude_id=post_id)  # Удаление если не используется
+    old_file = None  # Файл, на который пост перестаёт ссылаться
+    # Если изменён image_url (новый внешний URL или явный None) и был локальный файл - файл отвязывается
+    if "image_url" in upd and p.image_file:
+        old_file = p.image_file
         p.image_file = None  # Очистка поля локального файла
 
     # Обновление полей поста
@@ -225,31 +660,32 @@ def update_post(post_id: str, post_update: PostUpdate, current_user: str = Depen
         setattr(p, f, v)  # Установка новых значений
 
     p.updated_at = datetime.now()  # Обновление времени изменения
-    return p  # Возврат обновленного поста
+    return old_file
 
 # Маршрут для удаления поста
 @app.delete("/api/posts/{post_id}")
-def delete_post(post_id: str, current_user: str = Depends(authenticate_user)):
-    if post_id not in posts_db:  # Проверка существования поста
+def delete_post(post_id: str, current_user: str = Depends(rate_limited("write"))):
+    try:
+        p = posts_db.pop(post_id)  # Удаление поста из базы данных
+    except KeyError:  # Поста нет (или его только что удалил другой запрос)
         raise HTTPException(status_code=404, detail="Пост не найден")  # Ошибка если пост не найден
-    p = posts_db.pop(post_id)  # Удаление поста из базы данных
-    _delete_upload_if_unused(p.image_file, exclude_id=post_id)  # Удаление связанного файла если не используется
+    _delete_upload_if_unused(p.image_file)  # Удаление связанного файла если не используется
     return {"message": f"Пост '{p.title}' успешно удалён пользователем {current_user}"}  # Сообщение об успехе
 
 # ------ Посты (загрузка файлов) ------
 # Маршрут для создания поста с загрузкой файла
 @app.post("/api/posts/upload", response_model=Post)
-def create_post_upload(
+async def create_post_upload(
     title: str = Form(...),  # Обязательное поле заголовка из формы
     content: str = Form(...),  # Обязательное поле содержания из формы
     author: str = Form(...),  # Обязательное поле автора из формы
     image_file: UploadFile | None = File(None),  # Опциональный файл изображения
-    current_user: str = Depends(authenticate_user),  # Аутентификация пользователя
+    current_user: str = Depends(rate_limited("upload")),  # Аутентификация и лимит загрузок
 ):
     post_id = str(uuid.uuid4())  # Генерация уникального ID
     now = datetime.now()  # Текущее время
     # Сохранение файла если он был передан
-    saved_name = _save_upload(image_file) if image_file else None
+    saved_name = await _save_upload(image_file) if image_file else None
     # Создание нового поста
     new_post = Post(
         id=post_id,
@@ -261,27 +697,48 @@ def create_post_upload(
         created_at=now,
         updated_at=now,
     )
-    posts_db[post_id] = new_post  # Сохранение поста
+    try:
+        await run_in_threadpool(posts_db.save, new_post)  # Сохранение поста (запись в бэкенд вне цикла событий)
+    except BaseException:
+        # Пост не сохранён - ссылка на загруженный файл снимается (файл удаляется, если он больше не нужен)
+        _delete_upload_if_unused(saved_name)
+        raise
     return new_post  # Возврат созданного поста
 
 # Маршрут для обновления изображения поста
 @app.put("/api/posts/{post_id}/upload", response_model=Post)
-def update_post_upload(
+async def update_post_upload(
     post_id: str,
     image_file: UploadFile | None = File(None),  # Новый файл изображения
-    current_user: str = Depends(authenticate_user),  # Аутентификация
+    current_user: str = Depends(rate_limited("upload")),  # Аутентификация и лимит загрузок
 ):
     if post_id not in posts_db:  # Проверка существования поста
         raise HTTPException(status_code=404, detail="Пост не найден")  # Ошибка
-    p = posts_db[post_id]  # Получение поста
     if image_file is None:  # Проверка что файл передан
         raise HTTPException(status_code=400, detail="Файл не передан")  # Ошибка
 
-    # Удаление старого файла если он не используется другими постами
-    _delete_upload_if_unused(p.image_file, exclude_id=post_id)
-    p.image_file = _save_upload(image_file)  # Сохранение нового файла
-    p.image_url = None  # Очистка внешнего URL при использовании файла
-    p.updated_at = datetime.now()  # Обновление времени изменения
+    new_file = await _save_upload(image_file)  # Сохранение нового файла (до удаления старого)
+    # Замена файла под блокировкой поста - в пуле потоков, чтобы не блокировать цикл событий
+    return await run_in_threadpool(_replace_post_image, post_id, new_file)
+
+# Привязка нового файла к посту (чтение-изменение-запись под блокировкой поста)
+def _replace_post_image(post_id: str, new_file: str) -> Post:
+    with posts_db.locked(post_id):
+        if post_id not in posts_db:  # Пост удалён, пока загружался файл
+            _delete_upload_if_unused(new_file)
+            raise HTTPException(status_code=404, detail="Пост не найден")
+        p = posts_db[post_id].model_copy()  # Изменяется копия поста
+        old_file = p.image_file
+        p.image_file = new_file  # Привязка нового файла к посту
+        p.image_url = None  # Очистка внешнего URL при использовании файла
+        p.updated_at = datetime.now()  # Обновление времени изменения
+        try:
+            posts_db[post_id] = p  # Повторное сохранение (индексы и бэкенд)
+        except BaseException:
+            _delete_upload_if_unused(new_file)  # Пост остался со старым файлом - новый не нужен
+            raise
+        # Удаление старого файла (после сохранения), если он не используется другими постами
+        _delete_upload_if_unused(old_file)
     return p  # Возврат обновленного поста
 
 # =========================================
@@ -303,67 +760,120 @@ class User(BaseModel):
     name: str  # Имя пользователя
     email: str  # Email пользователя
 
-# Словарь для хранения пользователей в памяти
-users_db: dict[int, User] = {}
-# Счетчик для генерации ID пользователей
-user_counter = 0
+# Хранилище пользователей с индексом по email (id выдаёт users_db.next_id())
+users_db = UserStore(model=User, backend=storage)
 
 # Маршрут для получения списка пользователей
 @app.get("/api/users", response_model=List[User])
-def get_users(current_user: str = Depends(authenticate_user)):
+def get_users(
+    request: Request,
+    response: Response,
+    _start: Optional[int] = None,  # Смещение
+    _limit: Optional[int] = None,  # Размер страницы
+    _sort: Optional[str] = None,  # Поле сортировки: id, name, email
+    _order: SortOrder = SortOrder.asc,  # Направление сортировки
+    current_user: str = Depends(authenticate_user),
+):
+    # ETag коллекции по счётчику версий: если пользователи не менялись - 304 без сериализации
+    etag, last_modified = users_db.etag(), users_db.last_modified
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers.update(validators(etag, last_modified))
+    response.headers["X-Total-Count"] = str(len(users_db))  # Общее количество пользователей
+    if _start is not None or _limit is not None or _sort is not None or _order is SortOrder.desc:
+        # Страница по индексу поля сортировки, ответ отправляется потоком
+        _, users = users_db.sorted_page(
+            _sort_field(users_db, _sort or "id"), descending=_order is SortOrder.desc, start=_start or 0, limit=_limit
+        )
+        return _stream_json(users_db, users, response)
+    if FAST_JSON:  # Готовый JSON из кеша хранилища
+        return _json_response(users_db.json_list(users_db.values()), response)
     return list(users_db.values())  # Возврат всех пользователей
 
 # Маршрут для получения конкретного пользователя по ID
 @app.get("/api/users/{user_id}", response_model=User)
-def get_user(user_id: int, current_user: str = Depends(authenticate_user)):
+def get_user(user_id: int, request: Request, response: Response, current_user: str = Depends(authenticate_user)):
     if user_id not in users_db:  # Проверка существования пользователя
         raise HTTPException(status_code=404, detail="Пользователь не найден")  # Ошибка
+    # ETag по версии пользователя; Last-Modified - время последнего изменения коллекции (верхняя граница)
+    etag, last_modified = users_db.etag(user_id), users_db.last_modified
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers.update(validators(etag, last_modified))
+    if FAST_JSON:  # Готовый JSON из кеша хранилища
+        return _json_response(users_db.json_bytes(user_id), response)
     return users_db[user_id]  # Возврат найденного пользователя
 
 # Маршрут для создания нового пользователя
 @app.post("/api/users", response_model=User)
-def create_user(user_data: UserCreate, current_user: str = Depends(authenticate_user)):
-    global user_counter  # Использование глобальной переменной счетчика
-    # Проверка уникальности email
-    for existing_user in users_db.values():
-        if existing_user.email == user_data.email:
-            raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")  # Ошибка
-    user_counter += 1  # Инкремент счетчика
-    # Создание нового пользователя
-    new_user = User(id=user_counter, name=user_data.name, email=user_data.email)
-    users_db[user_counter] = new_user  # Сохранение пользователя
+def create_user(user_data: UserCreate, current_user: str = Depends(rate_limited("write"))):
+    # Проверка уникальности email (поиск по индексу, без учёта регистра)
+    if users_db.email_taken(user_data.email):
+        raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")  # Ошибка
+    # Создание нового пользователя со следующим id
+    new_user = User(id=users_db.next_id(), name=user_data.name, email=user_data.email)
+    try:
+        users_db.save(new_user)  # Сохранение пользователя
+    except DuplicateKey:  # Email только что занят другим запросом или процессом
+        raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
     return new_user  # Возврат созданного пользователя
 
+# Маршрут для пакетного создания пользователей
+@app.post("/api/users:batch", response_model=BatchResult)
+def create_users_batch(users: List[UserCreate], current_user: str = Depends(rate_limited("write"))):
+    _check_batch_size(users)
+    # Проверка всего пакета за один проход: email свободен и не повторяется внутри пакета
+    results, seen = [], set()
+    for i, user_data in enumerate(users):
+        email = users_db.normalize_email(user_data.email)
+        if email in seen or users_db.email_taken(email):
+            results.append(BatchItemResult(index=i, status=400, detail="Пользователь с таким email уже существует"))
+        else:
+            results.append(BatchItemResult(index=i, status=200))
+        seen.add(email)
+    if any(r.status != 200 for r in results):  # Хотя бы одна ошибка - пакет не применяется
+        return _batch_rejected(results)
+    # Идентификаторы выдаются одним увеличением счётчика
+    new_users = [User(id=user_id, **data.model_dump()) for user_id, data in zip(users_db.next_ids(len(users)), users)]
+    try:
+        users_db.save_many(new_users)  # Сохранение всего пакета
+    except DuplicateKey:  # Email занят в другом процессе (общий бэкенд) - не сохранено ничего
+        raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
+    for result, user in zip(results, new_users):
+        result.id = user.id
+    return BatchResult(applied=True, results=results)
+
 # Маршрут для обновления пользователя
 @app.put("/api/users/{user_id}", response_model=User)
-def update_user(user_id: int, user_data: UserUpdate, current_user: str = Depends(authenticate_user)):
-    if user_id not in users_db:  # Проверка существования пользователя
-        raise HTTPException(status_code=404, detail="Пользователь не найден")  # Ошибка
-    user = users_db[user_id]  # Получение пользователя
+def update_user(user_id: int, user_data: UserUpdate, current_user: str = Depends(rate_limited("write"))):
     # Преобразование модели обновления в словарь
     update_data = user_data.dict(exclude_unset=True)
-    # Проверка уникальности email при обновлении
-    if "email" in update_data:
-        for existing_id, existing_user in users_db.items():
-            if existing_id != user_id and existing_user.email == update_data["email"]:
-                raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")  # Ошибка
-    # Обновление полей пользователя
-    for field, value in update_data.items():
-        setattr(user, field, value)  # Установка новых значений
+    with users_db.locked(user_id):  # Чтение-изменение-запись под блокировкой пользователя
+        if user_id not in users_db:  # Проверка существования пользователя
+            raise HTTPException(status_code=404, detail="Пользователь не найден")  # Ошибка
+        # Проверка уникальности email при обновлении
+        if "email" in update_data and users_db.email_taken(update_data["email"], exclude_id=user_id):
+            raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")  # Ошибка
+        # Обновлённая копия пользователя (в хранилище попадает только после успешного сохранения)
+        user = users_db[user_id].model_copy(update=update_data)
+        try:
+            users_db[user_id] = user  # Сохранение и обновление индекса email
+        except DuplicateKey:  # Email только что занят другим запросом или процессом
+            raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
     return user  # Возврат обновленного пользователя
 
 # Маршрут для удаления пользователя
 @app.delete("/api/users/{user_id}")
-def delete_user(user_id: int, current_user: str = Depends(authenticate_user)):
-    if user_id not in users_db:  # Проверка существования пользователя
+def delete_user(user_id: int, current_user: str = Depends(rate_limited("write"))):
+    try:
+        deleted_user = users_db.pop(user_id)  # Удаление пользователя
+    except KeyError:  # Пользователя нет (или его только что удалил другой запрос)
         raise HTTPException(status_code=404, detail="Пользователь не найден")  # Ошибка
-    deleted_user = users_db.pop(user_id)  # Удаление пользователя
     return {"message": f"Пользователь '{deleted_user.name}' успешно удален пользователем {current_user}"}  # Сообщение
 
 # Маршрут для создания демо-пользователей
 @app.post("/api/demo-users")
-def create_demo_users(current_user: str = Depends(authenticate_user)):
-    global user_counter  # Использование глобальной переменной счетчика
+def create_demo_users(current_user: str = Depends(rate_limited("demo_users"))):
     # Список демо-пользователей
     demo_users = [
         {"name": "Иван Иванов", "email": "ivan@example.com"},
@@ -374,11 +884,13 @@ def create_demo_users(current_user: str = Depends(authenticate_user)):
     # Создание демо-пользователей
     for du in demo_users:
         # Проверка что пользователь с таким email еще не существует
-        if not any(u.email == du["email"] for u in users_db.values()):
-            user_counter += 1  # Инкремент счетчика
-            # Создание нового пользователя
-            u = User(id=user_counter, name=du["name"], email=du["email"])
-            users_db[user_counter] = u  # Сохранение пользователя
+        if not users_db.email_taken(du["email"]):
+            # Создание нового пользователя со следующим id
+            u = User(id=users_db.next_id(), name=du["name"], email=du["email"])
+            try:
+                users_db.save(u)  # Сохранение пользователя
+            except DuplicateKey:  # Уже создан другим процессом
+                continue
             created.append(u)  # Добавление в список созданных
     return {"message": f"Создано {len(created)} демо пользователей", "users": created}  # Результат
 
@@ -411,53 +923,229 @@ class UpdateGrade(BaseModel):
 class UpdateOnline(BaseModel):
     online: bool  # Новый онлайн статус
 
-# База данных студентов в памяти
-students_db = {
-    1: Student(id=1, name="Дюсупов Аскербек Сабирович"),
-    2: Student(id=2, name="Исаев Владислав"),
-    3: Student(id=3, name="Лаас Михаил Юрьевич"),
-    4: Student(id=4, name="Нурмолдин Нурбай Бекболатович"),
-    5: Student(id=5, name="Шаунин Роман Владимирович"),
-}
+# Модель элемента пакетного обновления студентов (меняются только переданные поля)
+class StudentPatch(BaseModel):
+    id: int  # ID студента
+    attend: Optional[AttendStatus] = None  # Новый статус посещения
+    grade: Optional[int] = None  # Новая оценка
+    online: Optional[bool] = None  # Новый онлайн статус
+
+# База данных студентов
+students_db = Store("students", model=Student, backend=storage)
+# Начальный список студентов (только если в хранилище ещё нет данных)
+if not students_db:
+    for student in [
+        Student(id=1, name="Дюсупов Аскербек Сабирович"),
+        Student(id=2, name="Исаев Владислав"),
+        Student(id=3, name="Лаас Михаил Юрьевич"),
+        Student(id=4, name="Нурмолдин Нурбай Бекболатович"),
+        Student(id=5, name="Шаунин Роман Владимирович"),
+    ]:
+        students_db.save(student)
+
+# --- Лента изменений студентов ---
+# Центр рассылки изменений: размер истории для возобновления и очереди каждого подписчика
+students_feed = ChangeHub(
+    history=int(os.environ.get("FEED_HISTORY", "1024")),
+    queue_size=int(os.environ.get("FEED_QUEUE_SIZE", "256")),
+)
+# Интервал пустых сообщений (ping), по которым обнаруживаются отключившиеся клиенты
+FEED_PING_INTERVAL = float(os.environ.get("FEED_PING_INTERVAL", "15"))
+
+# Публикация изменений: список {"id": ..., изменённые поля}
+def _publish_students(diffs: List[dict]):
+    if diffs:
+        students_feed.publish("students", diffs)
+
+# Изменения студентов, сделанные другими процессами (общий бэкенд), тоже попадают в ленту
+def _publish_remote_student(old: Optional[Student], new: Optional[Student]):
+    if new is None:
+        return
+    before = old.model_dump(mode="json") if old else {}
+    after = new.model_dump(mode="json")
+    diff = {k: v for k, v in after.items() if before.get(k) != v}
+    if diff:
+        _publish_students([{**diff, "id": new.id}])
+
+students_db.on_remote_change = _publish_remote_student
+
+# При общем бэкенде чужие изменения подтягиваются по таймеру, пока есть подписчики
+async def start_feed_sync():
+    if not storage.shared:
+        return
+
+    async def sync_loop():
+        while True:
+            await asyncio.sleep(1)
+            if len(students_feed):
+                await run_in_threadpool(students_db.sync)
+
+    app.state.feed_sync = asyncio.create_task(sync_loop())
+
+# Время жизни токена ленты (токен проверяется только при подключении, поток живёт дольше)
+EVENTS_TOKEN_TTL = float(os.environ.get("EVENTS_TOKEN_TTL", "60"))
+# Basic Auth без автоматической ошибки: у ленты есть второй способ входа - токен в адресе
+optional_security = HTTPBasic(auto_error=False)
+
+# Аутентификация ленты: браузерный EventSource не отправляет заголовок Authorization,
+# поэтому принимается и короткоживущий токен ?token= из POST /api/students/events/token
+def authenticate_events(
+    request: Request,
+    token: Optional[str] = None,  # Токен из адреса подключения
+    credentials: Optional[HTTPBasicCredentials] = Depends(optional_security),
+) -> str:
+    if token is not None:
+        username = authenticator.verify_token(token)
+        if username is None:
+            raise HTTPException(status_code=401, detail="Токен недействителен или просрочен")
+        return username
+    if credentials is None:  # Ни токена, ни Basic Auth
+        raise HTTPException(
+            status_code=401, detail="Требуется аутентификация", headers={"WWW-Authenticate": "Basic"},
+        )
+    return authenticate_user(request, credentials)
+
+# Маршрут выдачи токена для подключения к ленте (обычная аутентификация Basic Auth)
+@app.post("/api/students/events/token")
+def create_events_token(current_user: str = Depends(authenticate_user)):
+    return {"token": authenticator.issue_token(current_user, EVENTS_TOKEN_TTL), "expires_in": EVENTS_TOKEN_TTL}
+
+# Маршрут ленты изменений студентов (Server-Sent Events).
+# Первое событие - snapshot (полный список), дальше - события students с изменёнными полями.
+# После переподключения браузер передаёт Last-Event-ID, и пропущенные события досылаются
+@app.get("/api/students/events")
+async def student_events(
+    request: Request,
+    since: Optional[int] = None,  # Номер последнего полученного события (если нет Last-Event-ID)
+    current_user: str = Depends(authenticate_events),
+):
+    last_event_id = request.headers.get("last-event-id", "")
+    last_seq = int(last_event_id) if last_event_id.isdigit() else since
+
+    async def events():
+        sub, complete = students_feed.subscribe(last_seq)
+        try:
+            if not complete:  # Новая подписка или история уже потеряна - полный снимок
+                snapshot = [s.model_dump(mode="json") for s in students_db.values()]
+                yield sse_frame("snapshot", snapshot, sub.last_seq)
+            while True:
+                try:
+                    frames = await sub.get(timeout=FEED_PING_INTERVAL)
+                except SubscriberEvicted:  # Клиент не успевал читать - отключение
+                    yield sse_frame("evicted", {"seq": sub.last_seq})
+                    return
+                yield b"".join(frames) if frames else b": ping\n\n"
+        finally:
+            students_feed.unsubscribe(sub)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Без буферизации в прокси
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
 
 # Маршрут для получения списка студентов
 @app.get("/api/students", response_model=List[Student])
-def get_students(current_user: str = Depends(authenticate_user)):
+def get_students(response: Response, current_user: str = Depends(authenticate_user)):
+    if FAST_JSON:  # Готовый JSON из кеша хранилища
+        return _json_response(students_db.json_list(students_db.values()), response)
     return list(students_db.values())  # Возврат всех студентов
 
 # Маршрут для обновления статуса посещения студента
 @app.put("/api/students/{student_id}/attend", response_model=Student)
-def update_student_attend(student_id: int, data: UpdateAttend, current_user: str = Depends(authenticate_user)):
-    if student_id not in students_db:  # Проверка существования студента
-        raise HTTPException(status_code=404, detail="Студент не найден")  # Ошибка
-    s = students_db[student_id]  # Получение студента
-    s.attend = data.attend  # Обновление статуса посещения
+def update_student_attend(student_id: int, data: UpdateAttend, current_user: str = Depends(rate_limited("write"))):
+    with students_db.locked(student_id):  # Чтение-изменение-запись под блокировкой студента
+        if student_id not in students_db:  # Проверка существования студента
+            raise HTTPException(status_code=404, detail="Студент не найден")  # Ошибка
+        # Обновление статуса посещения в копии студента
+        s = students_db[student_id].model_copy(update={"attend": data.attend})
+        students_db[student_id] = s  # Сохранение изменений
+        # Рассылка подписчикам ленты (под блокировкой - в порядке сохранения)
+        _publish_students([{"id": student_id, "attend": s.attend}])
     return s  # Возврат обновленного студента
 
 # Маршрут для обновления оценки студента
 @app.put("/api/students/{student_id}/grade", response_model=Student)
-def update_student_grade(student_id: int, data: UpdateGrade, current_user: str = Depends(authenticate_user)):
-    if student_id not in students_db:  # Проверка существования студента
-        raise HTTPException(status_code=404, detail="Студент не найден")  # Ошибка
+def update_student_grade(student_id: int, data: UpdateGrade, current_user: str = Depends(rate_limited("write"))):
     if not (0 <= data.grade <= 12):  # Проверка допустимого диапазона оценок
         raise HTTPException(status_code=400, detail="Оценка должна быть от 0 до 12")  # Ошибка
-    s = students_db[student_id]  # Получение студента
-    s.grade = data.grade  # Обновление оценки
+    with students_db.locked(student_id):  # Чтение-изменение-запись под блокировкой студента
+        if student_id not in students_db:  # Проверка существования студента
+            raise HTTPException(status_code=404, detail="Студент не найден")  # Ошибка
+        s = students_db[student_id].model_copy(update={"grade": data.grade})  # Обновление оценки в копии
+        students_db[student_id] = s  # Сохранение изменений
+        # Рассылка подписчикам ленты (под блокировкой - в порядке сохранения)
+        _publish_students([{"id": student_id, "grade": s.grade}])
     return s  # Возврат обновленного студента
 
 # Маршрут для обновления онлайн статуса студента
 @app.put("/api/students/{student_id}/online", response_model=Student)
-def update_student_online(student_id: int, data: UpdateOnline, current_user: str = Depends(authenticate_user)):
-    if student_id not in students_db:  # Проверка существования студента
-        raise HTTPException(status_code=404, detail="Студент не найден")  # Ошибка
-    s = students_db[student_id]  # Получение студента
-    s.online = data.online  # Обновление онлайн статуса
+def update_student_online(student_id: int, data: UpdateOnline, current_user: str = Depends(rate_limited("write"))):
+    with students_db.locked(student_id):  # Чтение-изменение-запись под блокировкой студента
+        if student_id not in students_db:  # Проверка существования студента
+            raise HTTPException(status_code=404, detail="Студент не найден")  # Ошибка
+        # Обновление онлайн статуса в копии студента
+        s = students_db[student_id].model_copy(update={"online": data.online})
+        students_db[student_id] = s  # Сохранение изменений
+        # Рассылка подписчикам ленты (под блокировкой - в порядке сохранения)
+        _publish_students([{"id": student_id, "online": s.online}])
     return s  # Возврат обновленного студента
 
+# Маршрут для пакетного обновления студентов (посещение, оценки, онлайн статус)
+@app.patch("/api/students:batch", response_model=BatchResult)
+def update_students_batch(patches: List[StudentPatch], current_user: str = Depends(rate_limited("write"))):
+    _check_batch_size(patches)
+    # Студенты пакета блокируются один раз на весь пакет (проверка, копии и сохранение)
+    with students_db.locked_many(p.id for p in patches):
+        # Проверка всего пакета за один проход; изменения готовятся на копиях студентов
+        results, updated, seen = [], [], set()
+        for i, patch in enumerate(patches):
+            changes = patch.model_dump(exclude_unset=True, exclude={"id"})
+            if patch.id not in students_db:  # Проверка существования студента
+                results.append(BatchItemResult(index=i, status=404, id=patch.id, detail="Студент не найден"))
+            elif patch.id in seen:  # Один студент - один элемент пакета
+                results.append(BatchItemResult(index=i, status=400, id=patch.id, detail="Студент повторяется в пакете"))
+            elif changes.get("grade") is not None and not (0 <= changes["grade"] <= 12):  # Диапазон оценок
+                results.append(BatchItemResult(index=i, status=400, id=patch.id, detail="Оценка должна быть от 0 до 12"))
+            elif any(value is None for value in changes.values()):  # null не является допустимым значением
+                results.append(BatchItemResult(index=i, status=400, id=patch.id, detail="Поля не могут быть null"))
+            else:
+                results.append(BatchItemResult(index=i, status=200, id=patch.id))
+                updated.append(students_db[patch.id].model_copy(update=changes))
+            seen.add(patch.id)
+        if len(updated) != len(patches):  # Хотя бы одна ошибка - пакет не применяется
+            return _batch_rejected(results)
+        students_db.save_many(updated)  # Сохранение всего пакета
+        # Одно событие ленты на весь пакет
+        _publish_students([{**p.model_dump(exclude_unset=True, exclude={"id"}), "id": p.id} for p in patches])
+    return BatchResult(applied=True, results=results)
+
 # Запуск приложения при непосредственном выполнении файла
 if __name__ == "__main__":
+    # Офлайн-сверка загрузок: python main.py reconcile-uploads [--delete]
+    if sys.argv[1:2] == ["reconcile-uploads"]:
+        if not storage.persistent:
+            # Посты бэкенда memory живут только в процессе сервера: здесь их нет, и каждый файл
+            # выглядел бы ненужным (а --delete удалил бы все загрузки)
+            sys.exit("Сверке нужны сохранённые посты: STORAGE_BACKEND=wal или sqlite")
+        orphans = reconcile(upload_refs, (p.image_file for p in posts_db.values()), UPLOAD_DIR, delete="--delete" in sys.argv)
+        for name in orphans:  # Вывод файлов, на которые не ссылается ни один пост
+            print(name)
+        print(f"Файлов без ссылок: {len(orphans)}" + (" (удалены)" if "--delete" in sys.argv else ""))
+        sys.exit(0)
+    # Сжатые копии загрузок (file.bmp.br, file.bmp.gz): python main.py precompress-uploads
+    if sys.argv[1:2] == ["precompress-uploads"]:
+        created = [
+            sidecar for path in sorted(UPLOAD_DIR.iterdir())
+            if path.suffix.lower() in PRECOMPRESS_EXTENSIONS for sidecar in precompress(path)
+        ]
+        print(f"Создано сжатых копий: {len(created)}")
+        sys.exit(0)
     import uvicorn  # Импорт сервера uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)  # Запуск сервера на всех интерфейсах порта 8000
+    # Количество процессов-воркеров (как у uvicorn: переменная окружения WEB_CONCURRENCY)
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    if workers > 1 and not storage.shared:
+        # У каждого процесса было бы своё состояние - нужен общий бэкенд
+        sys.exit("Для нескольких воркеров нужен общий бэкенд: STORAGE_BACKEND=sqlite")
+    # Запуск сервера на всех интерфейсах порта 8000 (несколько воркеров - только по строке импорта)
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers)
 
 # /*
 # ===========================================
@@ -479,16 +1167,24 @@ if __name__ == "__main__":
 #    для загрузок и ее монтирование для обслуживания статических файлов
 
 # 6. Комментарии "Аутентификация (Basic Auth)..." - объясняют реализацию базовой
-#    HTTP аутентификации с предопределенными пользователями
+#    HTTP аутентификации с предопределенными пользователями. Пароли хранятся в виде
+#    хешей PBKDF2, успешные проверки кешируются (см. auth.py)
 
 # 7. Комментарии "Модель Pydantic для..." - описывают структуры данных для валидации
 #    и сериализации запросов и ответов API
 
-# 8. Комментарии "Словарь для хранения..." - поясняют использование временного хранилища
-#    в памяти вместо реальной базы данных (для учебных целей)
+# 8. Комментарии "Хранилище ..." - поясняют хранилища из store.py, которые заменили
+#    словари в памяти. Бэкенд хранения выбирается переменной окружения STORAGE_BACKEND:
+#    memory (по умолчанию) или wal - журнал изменений и снимок в папке STORAGE_DIR,
+#    которые проигрываются при запуске, или sqlite - общая база SQLite (режим WAL)
+#    для запуска нескольких воркеров uvicorn (см. storage.py)
 
 # 9. Комментарии "Функция для сохранения загруженного файла..." - описывают логику
-#    работы с файлами: валидация, сохранение, проверка использования, удаление
+#    работы с файлами: валидация, сохранение, проверка использования, удаление.
+#    Загрузки сохраняются асинхронно порциями с ограничением MAX_UPLOAD_SIZE
+#    (переменная окружения), маршруты загрузки объявлены как async def.
+#    При UPLOAD_CONTENT_ADDRESSED=1 одинаковые изображения хранятся одним файлом
+#    с именем по sha256 содержимого и отдаются со строгим ETag
 
 # 10. Комментарии "Маршрут для..." - детально объясняют каждый эндпоинт API:
 #     - Назначение и HTTP метод
@@ -500,15 +1196,62 @@ if __name__ == "__main__":
 #     студентов с использованием Enum для ограничения допустимых значений
 
 # 12. Комментарии "Запуск приложения..." - объясняют условие для непосредственного
-#     запуска сервера при выполнении файла
+#     запуска сервера при выполнении файла (и команды reconcile-uploads для офлайн-сверки
+#     файлов в /uploads - только с сохраняющим бэкендом wal или sqlite; с wal - при
+#     остановленном сервере - и precompress-uploads для создания сжатых копий несжатых форматов)
 
 # ОСОБЕННОСТИ РЕАЛИЗАЦИИ:
 # - Использование Depends(authenticate_user) для защиты маршрутов аутентификацией
 # - Поддержка двух типов изображений: внешние URL и локальные загрузки файлов
 # - Автоматическая очистка неиспользуемых файлов при удалении/обновлении постов
+#   (счётчики ссылок UploadRegistry из media.py вместо перебора всех постов)
 # - Валидация данных на уровне моделей Pydantic
 # - Подробная обработка ошибок с соответствующими HTTP статусами
-# - Поддержка пагинации для запросов списка постов
+# - Условные GET-запросы (ETag / Last-Modified / 304) для постов и пользователей
+#   (http_cache.py), ETag коллекций строится по счётчику версий хранилища
+# - Быстрый режим ответов FAST_JSON=1: маршруты чтения отдают JSON, закешированный в
+#   хранилище (model_dump_json один раз на изменение), схема OpenAPI не меняется
+# - Полнотекстовый поиск GET /api/posts/search?q= по инвертированному индексу (search.py),
+#   который обновляется при каждом создании, изменении и удалении поста
+# - Поддержка пагинации для запросов списка постов (_start/_limit и курсор _cursor,
+#   хранилище PostStore из store.py поддерживает порядок по дате создания)
+# - Фильтры GET /api/posts (author, created_from/created_to, updated_from/updated_to) и
+#   сортировка _sort/_order для постов и пользователей выполняются по вторичным индексам
+#   хранилища без сортировки всей коллекции; такие ответы отправляются потоком
+#   (StreamingResponse) с общим количеством в заголовке X-Total-Count
+# - Пакетные маршруты POST /api/users:batch, POST /api/posts:batch и
+#   PATCH /api/students:batch: весь пакет проверяется за один проход и сохраняется
+#   целиком (одна запись в бэкенд) или не сохраняется вовсе; ответ содержит результат
+#   по каждому элементу (размер пакета ограничен MAX_BATCH_SIZE)
+# - Лента изменений студентов GET /api/students/events (Server-Sent Events, feed.py):
+#   маршруты изменения публикуют только изменённые поля, клиент получает их сразу,
+#   без опроса GET /api/students; возобновление по Last-Event-ID или ?since=. Браузерный
+#   EventSource подключается с токеном ?token= из POST /api/students/events/token
+#   (EVENTS_TOKEN_TTL, EVENTS_TOKEN_SECRET), остальные клиенты - с Basic Auth
+# - Потокобезопасные изменения: синхронные маршруты выполняются в пуле потоков, поэтому
+#   чтение-изменение-запись объекта идёт под его блокировкой (with posts_db.locked(id)),
+#   изменяется копия объекта, email занимается атомарно, id выдаются под отдельной
+#   блокировкой (store.py); проверка - benchmarks/stress_writes.py
+# - Варианты изображений GET /uploads/{name}?w=&h=&fmt=webp (images.py): обработка в
+#   пуле процессов, кеш на диске (uploads_variants/) с ограничением размера и вытеснением
+#   давно не использованных; варианты удаляются вместе с исходным файлом. Ширина и высота
+#   округляются до фиксированного набора размеров (число вариантов файла ограничено). Посты отдают
+#   ссылки на варианты в поле image_variants. Без Pillow маршрут отвечает 501
+# - Сжатие ответов gzip/brotli (delivery.py, переменные COMPRESSION, COMPRESS_MIN_SIZE,
+#   GZIP_LEVEL, BROTLI_QUALITY), в том числе потоковых списков; SSE не сжимается.
+#   Загрузки отдаются с Cache-Control: immutable (UPLOAD_CACHE_MAX_AGE), поддерживают
+#   Range (206) и сжатые копии файлов
+# - Метрики GET /metrics в формате Prometheus (metrics.py): гистограммы длительности и
+#   размеров запросов по шаблону маршрута, запросы в обработке, время проверки пароля
+#   и записи загрузок, размеры хранилищ и папки uploads/. При нескольких воркерах
+#   снимки метрик собираются через папку METRICS_DIR. SLOW_REQUEST_MS включает
+#   профилировщик медленных запросов (стеки потоков в журнал "metrics")
+# - Ограничение частоты маршрутов записи и загрузки (ratelimit.py): token bucket по
+#   паре пользователь + IP-адрес и по IP-адресу с бюджетами маршрутов RATE_LIMITS, ответ 429
+#   с Retry-After. Бюджет проверяется до пароля; неудачные попытки входа на любом маршруте
+#   расходуют бюджет auth, после его исчерпания хеш пароля не вычисляется (сразу 429).
+#   При общем бэкенде корзины хранятся в SQLite и действуют на все воркеры. Одновременные
+#   загрузки ограничены UPLOAD_MAX_ACTIVE на процесс, лишние получают 503 с Retry-After
 # - Генерация автоматической документации через FastAPI и Swagger UI
 # */
 
@@ -0,0 +1,478 @@
+# Учёт загруженных файлов изображений (папка uploads/)
+# Модуль для хеширования содержимого файлов
+import hashlib
+# Базовый класс файла, в который записывается часть формы
+import io
+# Модуль для тела ответа 413
+import json
+# Модуль для работы с файловой системой
+import os
+# Модуль для проверки имён файлов
+import re
+# Модуль для блокировки реестра (маршруты выполняются в нескольких потоках)
+import threading
+# Модуль для генерации уникальных имён временных файлов
+import uuid
+# Модуль для определения типа файла по расширению
+from mimetypes import guess_type
+# Модуль для работы с путями файловой системы
+from pathlib import Path
+# Импорт типов для аннотаций
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+# Асинхронная работа с файлами (файловые операции выполняются вне цикла событий)
+import anyio
+# Маршрут FastAPI с собственным разбором форм загрузки
+from fastapi import HTTPException, params
+from fastapi.routing import APIRoute
+# Разбор multipart/form-data (части формы пишутся сразу в папку временных загрузок)
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+from multipart.multipart import parse_options_header
+# Отдача статических файлов и ответы с файлами
+from starlette.datastructures import FormData, Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+# Сжатые копии файлов (file.bmp.br, file.bmp.gz) и выбор кодировки
+from delivery import SIDECAR_SUFFIXES, available_encodings, negotiate, sidecar_original
+
+# Размер порции при потоковом копировании загрузки (ограничивает буфер в памяти)
+CHUNK_SIZE = 1024 * 1024
+
+
+# Реестр загрузок: счётчик ссылок постов на каждый файл из uploads/
+class UploadRegistry:
+    def __init__(self):
+        self._refs: Dict[str, int] = {}  # Имя файла -> количество постов, которые на него ссылаются
+        self._lock = threading.RLock()  # Изменение счётчиков и удаление файла - одной операцией
+
+    def count(self, filename: Optional[str]) -> int:
+        return self._refs.get(filename, 0) if filename else 0  # Текущее число ссылок на файл
+
+    def acquire(self, filename: Optional[str]):
+        if filename:  # Пост начал ссылаться на файл
+            with self._lock:
+                self._refs[filename] = self._refs.get(filename, 0) + 1
+
+    def release(self, filename: Optional[str]) -> bool:
+        """Снимаем одну ссылку на файл. True - ссылок больше нет и файл можно удалить."""
+        if not filename:
+            return False
+        with self._lock:
+            left = self._refs.get(filename, 0) - 1  # Оставшееся число ссылок
+            if left > 0:
+                self._refs[filename] = left
+                return False
+            self._refs.pop(filename, None)  # Файл больше никому не нужен
+            return True
+
+    def release_file(self, filename: Optional[str], upload_dir: Path) -> bool:
+        """Снимаем ссылку и удаляем файл, если ссылок не осталось. True - файл удалён.
+
+        Удаление выполняется под блокировкой реестра: параллельная загрузка того же файла
+        (тот же sha256) либо успеет взять ссылку раньше, либо запишет файл заново после удаления.
+        """
+        with self._lock:
+            if not self.release(filename):
+                return False
+            for name in [filename] + [filename + s for s in SIDECAR_SUFFIXES.values()]:  # Файл и его сжатые копии
+                try:
+                    (upload_dir / name).unlink(missing_ok=True)
+                except OSError:
+                    pass  # Ошибки удаления не мешают изменению поста
+            return True
+
+    def rebuild(self, filenames: Iterable[Optional[str]]):
+        # Полный пересчёт ссылок (например, по всем постам хранилища)
+        refs: Dict[str, int] = {}
+        for filename in filenames:
+            if filename:
+                refs[filename] = refs.get(filename, 0) + 1
+        with self._lock:
+            self._refs = refs
+
+    def orphans(self, upload_dir: Path) -> List[str]:
+        # Файлы в папке загрузок, на которые не ссылается ни один пост (один проход по папке)
+        with os.scandir(upload_dir) as entries:
+            names = [e.name for e in entries if e.is_file()]
+        with self._lock:
+            # Сжатая копия используется, пока используется её оригинал
+            return sorted(name for name in names if name not in self._refs and sidecar_original(name) not in self._refs)
+
+
+# Сверка реестра с папкой загрузок: пересчёт ссылок и поиск "осиротевших" файлов
+def reconcile(registry: UploadRegistry, image_files: Iterable[Optional[str]], upload_dir: Path, delete: bool = False) -> List[str]:
+    registry.rebuild(image_files)  # Пересчёт ссылок по постам
+    orphans = registry.orphans(upload_dir)  # Файлы без ссылок
+    if delete:  # Удаление найденных файлов
+        for name in orphans:
+            (upload_dir / name).unlink(missing_ok=True)
+    return orphans
+
+# Ошибка: загружаемый файл больше допустимого размера
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes  # Действующее ограничение размера
+
+
+# Имя файла в режиме адресации по содержимому: sha256 содержимого + расширение
+_DIGEST_NAME = re.compile(r"^([0-9a-f]{64})\.[a-z0-9]+$")
+
+
+def content_digest(filename: str) -> Optional[str]:
+    match = _DIGEST_NAME.match(filename)  # Имя вида <sha256>.<ext>
+    return match.group(1) if match else None
+
+
+# Файл части формы в папке временных загрузок: sha256 считается во время записи,
+# при закрытии файл удаляется, если stream_upload не перенёс его в uploads/
+class SpoolFile(io.FileIO):
+    def __init__(self, path: Path):
+        super().__init__(path, "w+b")
+        self.path = path
+        self.digest = hashlib.sha256()  # Хеш содержимого (для режима адресации по содержимому)
+        self.claimed = False  # Файл перенесён в uploads/ и не удаляется при закрытии
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        view = memoryview(data)
+        while view:  # Небуферизованная запись может записать только часть порции
+            view = view[super().write(view):]
+        return len(data)
+
+    def close(self):
+        super().close()
+        if not self.claimed:
+            self.path.unlink(missing_ok=True)
+
+
+# Разбор формы, при котором файлы пишутся сразу в SpoolFile (а не в SpooledTemporaryFile Starlette):
+# загрузка попадает на диск один раз и затем только переименовывается
+class SpoolingMultiPartParser(MultiPartParser):
+    def __init__(self, *args, spool_dir: Path, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spool_dir = spool_dir  # Папка временных загрузок (та же файловая система, что и uploads/)
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is not None:  # Часть формы - файл
+            upload.file = SpoolFile(self.spool_dir / f"{uuid.uuid4().hex}.part")
+            self._files_to_close_on_error.append(upload.file)
+
+    async def parse(self) -> FormData:
+        try:
+            return await super().parse()
+        except BaseException:  # Ошибка формы или обрыв соединения - недописанные файлы удаляются
+            for file in self._files_to_close_on_error:
+                file.close()
+            raise
+
+
+# Класс маршрутов, у которых форма с файлами разбирается SpoolingMultiPartParser
+def spooling_route(spool_dir: Path) -> Type[APIRoute]:
+    class SpoolingRoute(APIRoute):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+            if not (self.body_field and isinstance(self.body_field.field_info, params.Form)):
+                return handler  # Маршрут без формы
+
+            async def route_handler(request: Request):
+                content_type, _ = parse_options_header(request.headers.get("content-type", ""))
+                if content_type == b"multipart/form-data":
+                    parser = SpoolingMultiPartParser(request.headers, request.stream(), spool_dir=spool_dir)
+                    try:
+                        # Разобранная форма кешируется в запросе, FastAPI берёт её из request.form()
+                        request._form = await parser.parse()
+                    except MultiPartException as exc:
+                        raise HTTPException(status_code=400, detail=exc.message)
+                return await handler(request)
+
+            return route_handler
+
+    return SpoolingRoute
+
+
+# Потоковое сохранение загрузки: порции -> временный файл -> атомарное переименование
+async def stream_upload(
+    file,
+    ext: str,
+    upload_dir: Path,
+    tmp_dir: Path,
+    registry: UploadRegistry,
+    max_bytes: int,
+    content_addressed: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> str:
+    """Сохраняет загрузку в upload_dir и возвращает имя файла с уже учтённой ссылкой в registry.
+
+    В режиме content_addressed имя файла - sha256 содержимого, одинаковые файлы хранятся один раз.
+    """
+    # Ранняя проверка по известному размеру файла (до копирования)
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    if isinstance(file.file, SpoolFile):  # Файл уже записан в tmp_dir при разборе формы - без копирования
+        return await _claim_spool(file.file, ext, upload_dir, registry, content_addressed)
+    tmp = tmp_dir / f"{uuid.uuid4().hex}.part"  # Временный файл в той же файловой системе
+    size = 0  # Количество уже записанных байт
+    digest = hashlib.sha256()  # Хеш содержимого считается во время копирования
+    try:
+        async with await anyio.open_file(tmp, "wb") as out:
+            while chunk := await file.read(chunk_size):  # Чтение очередной порции
+                size += len(chunk)
+                if size > max_bytes:  # Превышение лимита - прерываем копирование
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)  # Запись порции в рабочем потоке
+        fname = f"{digest.hexdigest() if content_addressed else uuid.uuid4().hex}{ext}"
+        # Ссылка учитывается до переименования: параллельное удаление поста не удалит общий файл
+        registry.acquire(fname)
+        try:
+            # Атомарное появление файла в uploads/ (одинаковое содержимое просто перезаписывается)
+            await anyio.to_thread.run_sync(os.replace, tmp, upload_dir / fname)
+        except BaseException:
+            registry.release(fname)
+            raise
+    except BaseException:
+        await anyio.to_thread.run_sync(lambda: tmp.unlink(missing_ok=True))  # Удаление недописанного файла
+        raise
+    return fname
+
+
+# Перенос файла части формы в uploads/ (атомарное переименование, содержимое не копируется)
+async def _claim_spool(spool: SpoolFile, ext: str, upload_dir: Path, registry: UploadRegistry, content_addressed: bool) -> str:
+    fname = f"{spool.digest.hexdigest() if content_addressed else uuid.uuid4().hex}{ext}"
+    registry.acquire(fname)  # Ссылка учитывается до переименования (как в stream_upload)
+    try:
+        await anyio.to_thread.run_sync(os.replace, spool.path, upload_dir / fname)
+    except BaseException:
+        registry.release(fname)
+        raise
+    spool.claimed = True  # Закрытие формы больше не удаляет файл
+    return fname
+
+
+# Часть файла для ответа 206 Partial Content (байты start..end включительно)
+class FileRangeResponse(FileResponse):
+    def __init__(self, path, start: int, end: int, **kwargs):
+        super().__init__(path, status_code=206, **kwargs)
+        self.start, self.end = start, end
+        size = self.stat_result.st_size
+        self.headers["content-length"] = str(end - start + 1)
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            return await send({"type": "http.response.body", "body": b"", "more_body": False})
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            left = self.end - self.start + 1  # Сколько байт ещё отправить
+            while left > 0:
+                chunk = await file.read(min(self.chunk_size, left))
+                if not chunk:  # Файл укоротился во время отправки
+                    break
+                left -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": left > 0})
+        if left > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+# Разбор заголовка Range: (start, end) для одного диапазона, None - заголовок не поддерживается
+# (несколько диапазонов, другие единицы), ValueError - диапазон за пределами файла
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # Отдаём файл целиком (допустимо по RFC 9110)
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last) or not all(p.isdigit() for p in (first, last) if p):
+        return None  # Некорректный заголовок игнорируется
+    if not first:  # bytes=-N - последние N байт
+        if int(last) == 0:
+            raise ValueError(value)
+        return max(size - int(last), 0), size - 1
+    start, end = int(first), int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(value)
+    return start, min(end, size - 1)
+
+
+# Статические файлы /uploads: имена файлов неизменяемые (uuid4 или sha256 содержимого), поэтому
+# ответы кешируются надолго; поддерживаются запросы Range и сжатые копии файлов
+class UploadsStaticFiles(StaticFiles):
+    def __init__(self, *args, max_age: int = 365 * 24 * 3600, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл под этим именем никогда не меняется - браузеру не нужно его перепроверять
+        self.cache_control = f"public, max-age={max_age}, immutable" if max_age > 0 else "no-cache"
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        headers = {"cache-control": self.cache_control, "accept-ranges": "bytes"}
+        digest = content_digest(os.path.basename(full_path))
+        if digest is not None:  # Сильный ETag, не зависящий от времени изменения файла
+            headers["etag"] = f'"{digest}"'
+        range_header = request_headers.get("range")
+        if range_header is None:  # Для запросов части файла сжатые копии не используются
+            sidecar = self._sidecar(full_path, scope["method"], request_headers)
+            if sidecar is not None:
+                return sidecar
+        response = FileResponse(
+            full_path, status_code=status_code, headers=headers, stat_result=stat_result, method=scope["method"],
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if range_header is None or scope["method"] != "GET" or not self._if_range(response.headers, request_headers):
+            return response
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:  # Диапазон за пределами файла
+            return Response(status_code=416, headers={"content-range": f"bytes */{stat_result.st_size}"})
+        if byte_range is None:
+            return response
+        headers["etag"] = response.headers["etag"]
+        headers["last-modified"] = response.headers["last-modified"]
+        return FileRangeResponse(
+            full_path, *byte_range, headers=headers, media_type=response.media_type, stat_result=stat_result,
+            method=scope["method"],
+        )
+
+    @staticmethod
+    def _if_range(response_headers, request_headers: Headers) -> bool:
+        # If-Range: часть файла отдаётся, только если у клиента та же версия файла
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        return if_range in (response_headers.get("etag"), response_headers.get("last-modified"))
+
+    def _sidecar(self, full_path: str, method: str, request_headers: Headers) -> Optional[Response]:
+        # Сжатая копия файла (file.bmp.br / file.bmp.gz), если клиент принимает её кодировку
+        accept = request_headers.get("accept-encoding")
+        if not accept:
+            return None
+        candidates = [e for e in available_encodings() if os.path.isfile(full_path + SIDECAR_SUFFIXES[e])]
+        encoding = negotiate(accept, candidates) if candidates else None
+        if encoding is None:
+            return None
+        path = full_path + SIDECAR_SUFFIXES[encoding]
+        stat_result = os.stat(path)
+        headers = {"cache-control": self.cache_control, "content-encoding": encoding, "vary": "Accept-Encoding"}
+        digest = content_digest(os.path.basename(full_path))
+        if digest is not None:  # ETag сжатой копии отличается от ETag оригинала
+            headers["etag"] = f'"{digest}-{encoding}"'
+        response = FileResponse(
+            path, headers=headers, media_type=guess_type(full_path)[0] or "application/octet-stream",
+            stat_result=stat_result, method=method,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+# Размер для сообщений об ошибках: "20 МБ", "1.5 МБ", "500 КБ" (лимиты меньше 1 МБ не превращаются в 0)
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{round(size / (1024 * 1024), 1):g} МБ"
+    return f"{round(size / 1024, 1):g} КБ"
+
+
+# ASGI middleware: отклоняет слишком большие загрузки до разбора multipart-тела
+class UploadLimitMiddleware:
+    def __init__(self, app, max_bytes: int, path_suffix: str = "/upload", label_bytes: Optional[int] = None):
+        self.app = app  # Следующее ASGI-приложение
+        self.max_bytes = max_bytes  # Максимальный размер тела запроса на загрузку
+        self.path_suffix = path_suffix  # Маршруты загрузки оканчиваются на /upload
+        # Размер в сообщении об ошибке (лимит файла, без запаса на поля формы)
+        self.label_bytes = label_bytes if label_bytes is not None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT") or not scope["path"].endswith(self.path_suffix):
+            return await self.app(scope, receive, send)
+        # Проверка заголовка Content-Length - тело даже не начинаем читать
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                return await self._reject(send)
+        received = 0  # Счётчик байт для запросов без Content-Length (chunked)
+        overflow = False  # Тело превысило лимит - ответ 413 отправляет middleware
+        started = False  # Начата ли отправка ответа
+
+        async def limited_receive():
+            # Исключение отсюда FastAPI превратил бы в 400 "error parsing the body",
+            # поэтому превышение обрывает тело (как отключение клиента) и запоминается
+            nonlocal received, overflow
+            if overflow:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    overflow = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if overflow and not started:
+                return  # Ответ приложения на оборванное тело заменяется ответом 413
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception:
+            if not overflow or started:
+                raise
+        if overflow and not started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        # Ответ 413 Payload Too Large в формате ошибок FastAPI
+        body = json.dumps({"detail": f"Файл больше {format_size(self.label_bytes)}"}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл media.py - учёт файлов изображений, загруженных через /api/posts/upload
+
+# 2. Класс UploadRegistry - хранит для каждого файла число постов, которые на него
+#    ссылаются. Решение "можно ли удалить файл" принимается за O(1) вместо перебора
+#    всех постов. Реестр потокобезопасен, метод release_file снимает
+#    ссылку и удаляет ненужный файл одной операцией
+
+# 3. Функция reconcile - офлайн-сверка: пересчитывает ссылки по постам и находит в
+#    папке uploads/ файлы, на которые никто не ссылается (запуск: python main.py reconcile-uploads)
+
+# 4. Функция stream_upload - асинхронное сохранение загрузки порциями по CHUNK_SIZE во
+#    временный файл с проверкой размера и атомарным переименованием (os.replace).
+#    Запись выполняется в рабочих потоках по одной порции, поток не занят всю загрузку.
+#    В режиме адресации по содержимому файл называется по sha256 и хранится один раз
+#    на все посты, удаление по-прежнему происходит только когда ссылок не осталось
+
+# 5. Класс UploadsStaticFiles - отдача /uploads со строгим ETag (хеш содержимого) для
+#    файлов, адресованных по содержимому. Имена загрузок не меняются, поэтому ответы
+#    отдаются с Cache-Control: immutable. Запросы Range (перемотка, докачка) получают
+#    206 Partial Content (класс FileRangeResponse, функция parse_range), клиенты с
+#    Accept-Encoding - сжатую копию файла (file.bmp.br / file.bmp.gz), если она есть.
+#    Сжатые копии удаляются вместе с файлом и не считаются файлами без ссылок
+
+# 6. Класс UploadLimitMiddleware - отклоняет запросы на загрузку больше лимита (413)
+#    по заголовку Content-Length или по мере чтения тела, до разбора формы. При превышении
+#    во время чтения (chunked) тело обрывается, а 413 отправляет сам middleware - иначе
+#    FastAPI ответил бы 400 "ошибка разбора тела"
+
+# 7. Классы SpoolFile / SpoolingMultiPartParser и функция spooling_route - разбор формы
+#    загрузки, при котором файл из тела запроса пишется сразу в папку временных загрузок
+#    (Starlette сначала пишет его в SpooledTemporaryFile, больше 1 МБ - на диск, и тогда
+#    stream_upload записывал бы файл второй раз). stream_upload только переименовывает
+#    такой файл в uploads/; sha256 считается во время записи. Файл, который маршрут
+#    не забрал (ошибка проверки, обрыв соединения), удаляется при закрытии формы
+# */
@@ -0,0 +1,324 @@
+# Метрики запросов в формате Prometheus: счётчики, гистограммы задержек и размеров, профилировщик медленных запросов
+# Модуль для хранения снимков метрик воркеров
+import json
+# Модуль для журнала медленных запросов
+import logging
+# Модуль для работы с файловой системой
+import os
+# Модуль для снимков стеков потоков
+import sys
+# Модуль для потоков (счётчики каждого потока, поток профилировщика)
+import threading
+# Модуль для измерения времени
+import time
+# Поиск корзины гистограммы делением пополам
+from bisect import bisect_left
+# Подсчёт одинаковых стеков и ограниченная очередь снимков стеков
+from collections import Counter, deque
+# Контекстный менеджер для замера операций
+from contextlib import contextmanager
+# Модуль для работы с путями файловой системы
+from pathlib import Path
+# Импорт типов для аннотаций
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Границы корзин гистограммы задержек (секунды)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин гистограммы размеров тел запросов и ответов (байты)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+logger = logging.getLogger("metrics")
+
+
+# Реестр метрик процесса. Каждый поток пишет в свой набор счётчиков (без блокировок на запрос),
+# наборы складываются только при чтении метрик
+class Registry:
+    def __init__(self, directory: Optional[Path] = None, stale_after: float = 60.0):
+        self._definitions: Dict[str, Tuple[str, str, Tuple[str, ...], tuple]] = {}  # Имя -> (тип, описание, метки, корзины)
+        self._gauges: List[Tuple[str, Callable[[], Iterable[Tuple[tuple, float]]]]] = []  # Показатели, вычисляемые при чтении
+        self._local = threading.local()  # Набор счётчиков текущего потока
+        self._shards: List[dict] = []  # Наборы счётчиков всех потоков
+        self._shards_lock = threading.Lock()  # Только для регистрации нового потока
+        self.pid = str(os.getpid())
+        self.directory = Path(directory) if directory else None  # Папка снимков воркеров (несколько процессов)
+        self.stale_after = stale_after  # Снимки старше этого считаются снимками завершённых процессов
+        self.in_flight = 0  # Запросы в обработке (меняется только в цикле событий)
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...]):
+        self._definitions[name] = ("counter", help, labels, ())
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...], buckets: tuple = DURATION_BUCKETS):
+        self._definitions[name] = ("histogram", help, labels, buckets)
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...], collect: Callable[[], Iterable[Tuple[tuple, float]]]):
+        # collect возвращает пары (значения меток, значение) в момент чтения метрик
+        self._definitions[name] = ("gauge", help, labels, ())
+        self._gauges.append((name, collect))
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: tuple, value: float = 1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name: str, labels: tuple, value: float):
+        # Значения корзин хранятся без накопления: [корзины..., +Inf, сумма, количество]
+        shard = self._shard()
+        key = (name, labels)
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self._definitions[name][3]) + 3)
+        counts[bisect_left(self._definitions[name][3], value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    @contextmanager
+    def timed(self, operation: str):
+        # Замер отдельной операции внутри маршрута (проверка пароля, запись загрузки)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("app_operation_duration_seconds", (operation,), time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """Сумма наборов всех потоков и текущие значения показателей (для вывода и для снимка воркера)."""
+        merged: Dict[tuple, object] = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.items()):  # Копия словаря делается атомарно (под GIL)
+                if isinstance(value, list):
+                    total = merged.setdefault(key, [0] * len(value))
+                    for i, v in enumerate(value):
+                        total[i] += v
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        for name, collect in self._gauges:
+            for labels, value in collect():
+                merged[(name, tuple(labels))] = value
+        return {"pid": self.pid, "time": time.time(), "series": [[name, list(labels), value] for (name, labels), value in merged.items()]}
+
+    def write_snapshot(self):
+        # Снимок метрик этого воркера в общую папку (атомарная замена файла)
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self.pid}.json"
+        tmp = path.with_suffix(".part")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, path)
+
+    def remove_snapshot(self):
+        if self.directory is not None:
+            (self.directory / f"{self.pid}.json").unlink(missing_ok=True)
+
+    def _snapshots(self) -> List[dict]:
+        # Снимок этого процесса и свежие снимки других воркеров
+        own = self.snapshot()
+        if self.directory is None or not self.directory.exists():
+            return [own]
+        snapshots = [own]
+        for path in self.directory.glob("*.json"):
+            if path.stem == self.pid or time.time() - path.stat().st_mtime > self.stale_after:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # Снимок перезаписывается прямо сейчас
+        return snapshots
+
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus (версия 0.0.4); у каждого ряда метка pid воркера."""
+        by_name: Dict[str, List[Tuple[str, list, object]]] = {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot["series"]:
+                by_name.setdefault(name, []).append((snapshot["pid"], labels, value))
+        lines = []
+        for name, (kind, help, label_names, buckets) in self._definitions.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for pid, labels, value in sorted(by_name.get(name, ()), key=lambda s: (s[0], s[1])):
+                pairs = [("pid", pid)] + list(zip(label_names, labels))
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(pairs)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+# Метки ряда: {a="1",b="2"} (кавычки, обратная косая черта и переводы строк экранируются)
+def _labels(pairs: List[Tuple[str, object]]) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+# Профилировщик медленных запросов: пока есть активные запросы, фоновый поток с заданным
+# интервалом снимает стеки всех потоков; для запроса дольше порога стеки за время запроса
+# передаются в hook (по умолчанию - в журнал)
+class SlowRequestProfiler:
+    def __init__(self, threshold: float, interval: float = 0.005, hook: Optional[Callable[[dict], None]] = None, top: int = 5):
+        self.threshold = threshold  # Порог медленного запроса (секунды)
+        self.interval = interval  # Интервал снятия стеков (секунды)
+        self.hook = hook or self.log  # Обработчик отчёта о медленном запросе
+        self.top = top  # Сколько самых частых стеков попадает в отчёт
+        self.active = 0  # Активные запросы (меняется только в цикле событий)
+        self._samples: deque = deque(maxlen=int(60 / interval))  # (время, стек) за последнюю минуту
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own:
+                    stack = _fold(frame)
+                    if stack is not None:
+                        self._samples.append((now, stack))
+
+    def finish(self, started: float, duration: float, info: dict):
+        # Вызывается по завершении каждого запроса; отчёт - только для медленных
+        if duration < self.threshold:
+            return
+        ended = started + duration
+        stacks = Counter(stack for t, stack in list(self._samples) if started <= t <= ended)
+        self.hook({**info, "duration": duration, "samples": sum(stacks.values()), "stacks": stacks.most_common(self.top)})
+
+    @staticmethod
+    def log(report: dict):
+        lines = [f"{count:5} {stack}" for stack, count in report["stacks"]]
+        logger.warning(
+            "медленный запрос %s %s (%s) %.0f мс, снимков стеков: %d\n%s",
+            report["method"], report["path"], report["route"], report["duration"] * 1000, report["samples"], "\n".join(lines),
+        )
+
+
+# Модули, в которых поток просто ждёт (свободный поток пула, цикл событий без работы)
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+
+
+# Стек потока одной строкой "файл:функция;...", от внешнего вызова к внутреннему; None - поток простаивает
+def _fold(frame, depth: int = 40) -> Optional[str]:
+    if frame.f_code.co_filename.endswith(_IDLE_MODULES):
+        return None
+    parts = []
+    while frame is not None and len(parts) < depth:
+        parts.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+# ASGI middleware: количество, длительность и размеры запросов по шаблону маршрута
+class MetricsMiddleware:
+    def __init__(self, app, registry: Registry, routes: list, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app  # Следующее ASGI-приложение
+        self.registry = registry
+        self.routes = routes  # Маршруты приложения (для шаблона пути по обработчику)
+        self.profiler = profiler
+        self._templates: Optional[Dict[int, str]] = None  # id обработчика -> шаблон пути
+
+    def route_of(self, scope) -> str:
+        # Шаблон пути (/api/posts/{post_id}), а не сам путь: количество рядов метрик ограничено
+        if self._templates is None:
+            self._templates = {id(getattr(r, "endpoint", None) or r.app): r.path for r in self.routes}
+        return self._templates.get(id(scope.get("endpoint")), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500  # Если ответ не начат из-за исключения
+        request_size = response_size = 0
+        self.registry.in_flight += 1
+        if self.profiler is not None:
+            self.profiler.active += 1
+
+        async def counting_receive():
+            nonlocal request_size
+            message = await receive()
+            request_size += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            duration = time.perf_counter() - started
+            self.registry.in_flight -= 1
+            route = self.route_of(scope)
+            labels = (scope["method"], route)
+            registry = self.registry
+            registry.inc("http_requests_total", labels + (str(status),))
+            registry.observe("http_request_duration_seconds", labels, duration)
+            registry.observe("http_request_size_bytes", labels, request_size)
+            registry.observe("http_response_size_bytes", labels, response_size)
+            if self.profiler is not None:
+                self.profiler.active -= 1
+                info = {"method": scope["method"], "path": scope["path"], "route": route, "status": status}
+                self.profiler.finish(started, duration, info)
+
+
+# Реестр с метриками HTTP-запросов (метрики приложения добавляются в main.py)
+def create_registry(directory: Optional[Path] = None) -> Registry:
+    registry = Registry(directory)
+    registry.counter("http_requests_total", "Количество запросов", ("method", "route", "status"))
+    registry.histogram("http_request_duration_seconds", "Длительность обработки запроса", ("method", "route"))
+    registry.histogram("http_request_size_bytes", "Размер тела запроса", ("method", "route"), SIZE_BUCKETS)
+    registry.histogram("http_response_size_bytes", "Размер тела ответа (после сжатия)", ("method", "route"), SIZE_BUCKETS)
+    registry.histogram("app_operation_duration_seconds", "Длительность отдельных операций внутри маршрутов", ("operation",))
+    registry.gauge("http_requests_in_flight", "Запросы в обработке", (), lambda: [((), registry.in_flight)])
+    return registry
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл metrics.py - метрики для маршрута GET /metrics (формат Prometheus): какие
+#    маршруты медленные и куда уходит время
+
+# 2. Класс Registry - счётчики и гистограммы. Каждый поток пишет в свой словарь
+#    (threading.local), поэтому запись метрики не берёт блокировку; словари всех потоков
+#    складываются при чтении метрик. Показатели (gauge) вычисляются функциями в момент
+#    чтения. При нескольких воркерах каждый процесс записывает снимок своих метрик в
+#    папку METRICS_DIR, и /metrics любого воркера отдаёт ряды всех воркеров с меткой pid
+
+# 3. Класс MetricsMiddleware - количество запросов, гистограммы длительности и размеров
+#    тел по шаблону маршрута (из scope["endpoint"]) и число запросов в обработке
+
+# 4. Класс SlowRequestProfiler - необязательный профилировщик: фоновый поток снимает
+#    стеки всех потоков, пока есть активные запросы. Для запроса дольше порога самые
+#    частые стеки за время запроса передаются в hook (по умолчанию - журнал "metrics").
+#    При одновременных запросах в отчёт попадают и стеки соседних запросов
+# */
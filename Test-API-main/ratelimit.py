@@ -0,0 +1,281 @@
+# Ограничение частоты запросов (token bucket) и числа одновременных загрузок
+# Модуль для работы с циклом событий asyncio
+import asyncio
+# Модуль для округления времени ожидания вверх
+import math
+# Модуль для работы с SQLite (общие счётчики нескольких воркеров)
+import sqlite3
+# Модуль для блокировок (зависимости маршрутов выполняются в нескольких потоках)
+import threading
+# Модуль для работы со временем
+import time
+# Упорядоченный словарь (вытеснение давно не использованных ключей) и очередь ожидающих
+from collections import OrderedDict, deque
+# Модуль для работы с путями файловой системы
+from pathlib import Path
+# Импорт типов для аннотаций
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+# Ответ с JSON-телом для отклонённых загрузок
+from starlette.responses import JSONResponse
+
+# Единицы периода в описании бюджета (10/min)
+PERIODS = {"s": 1, "sec": 1, "min": 60, "h": 3600, "hour": 3600}
+
+
+# Бюджет маршрута: скорость пополнения (токенов в секунду) и ёмкость корзины (допустимый всплеск)
+class Budget(NamedTuple):
+    rate: float
+    burst: float
+
+    def scaled(self, factor: float) -> "Budget":
+        return Budget(self.rate * factor, self.burst * factor)
+
+
+# Разбор бюджетов из строки вида "upload=60/min:20,write=1200/min:200" (:N - ёмкость, по умолчанию = лимиту)
+def parse_budgets(spec: str) -> Dict[str, Budget]:
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        limit, _, burst = value.partition(":")
+        count, _, period = limit.partition("/")
+        try:
+            rate, capacity = float(count), float(burst or count)
+        except ValueError:
+            raise ValueError(f"Некорректный бюджет: {item}") from None
+        if period.strip() not in PERIODS:
+            raise ValueError(f"Некорректный бюджет: {item}")
+        if rate <= 0 or capacity <= 0:  # Нулевая скорость пополнения - деление на ноль при расчёте ожидания
+            raise ValueError(f"Лимит и всплеск бюджета должны быть больше нуля: {item}")
+        budgets[name.strip()] = Budget(rate / PERIODS[period.strip()], capacity)
+    return budgets
+
+
+# Уровень корзины с учётом пополнения с момента последнего изменения
+def _refill(tokens: float, updated: float, now: float, budget: Budget) -> float:
+    return min(budget.burst, tokens + max(now - updated, 0.0) * budget.rate)
+
+
+# Корзины в памяти процесса (бэкенд memory, один воркер)
+class MemoryBuckets:
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys  # Давно не использованные корзины вытесняются (их корзина и так полна)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # Ключ -> (токены, время)
+        self._lock = threading.Lock()
+
+    def take(self, items: Sequence[Tuple[str, Budget]], cost: float = 1.0, need: Optional[float] = None) -> float:
+        """Списывает cost из всех корзин сразу, если в каждой есть need токенов (по умолчанию need = cost).
+        0 - разрешено, иначе - секунды до появления токенов. cost=0 - только проверка, без записи."""
+        now = time.time()
+        need = cost if need is None else need
+        with self._lock:
+            levels = [_refill(*self._buckets.get(key, (budget.burst, now)), now, budget) for key, budget in items]
+            wait = max((need - level) / budget.rate for level, (_, budget) in zip(levels, items))
+            if wait > 0 or not cost:  # Не хватает токенов (ничего не списывается) или только проверка
+                return max(wait, 0.0)
+            for level, (key, _) in zip(levels, items):
+                self._buckets[key] = (level - cost, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0.0
+
+
+# Корзины в общей базе SQLite: один лимит на все воркеры (uvicorn --workers N)
+class SqliteBuckets:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (
+            key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at);
+    """
+    SQL_PUT = (
+        "INSERT INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, full_at = excluded.full_at"
+    )
+    # Корзины, которые уже наполнились, не отличаются от отсутствующих
+    SQL_PRUNE = "DELETE FROM buckets WHERE full_at < ?"
+    PRUNE_EVERY = 1000  # Очистка - раз в столько списаний
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()  # Соединение текущего потока
+        self._takes = 0
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # Счётчики лимитов не переживают сбой питания - и не нужно
+            self._local.conn = conn
+        return conn
+
+    def take(self, items: Sequence[Tuple[str, Budget]], cost: float = 1.0, need: Optional[float] = None) -> float:
+        now = time.time()
+        conn = self._conn()
+        keys = [key for key, _ in items]
+        need = cost if need is None else need
+        # Чтение и запись корзин - одна транзакция для всех воркеров (только проверка - без блокировки записи)
+        conn.execute("BEGIN IMMEDIATE" if cost else "BEGIN")
+        try:
+            rows = dict(
+                (key, (tokens, updated)) for key, tokens, updated in conn.execute(
+                    f"SELECT key, tokens, updated FROM buckets WHERE key IN ({','.join('?' * len(keys))})", keys,
+                )
+            )
+            levels = [_refill(*rows.get(key, (budget.burst, now)), now, budget) for key, budget in items]
+            wait = max((need - level) / budget.rate for level, (_, budget) in zip(levels, items))
+            if wait <= 0 and cost:
+                conn.executemany(self.SQL_PUT, [
+                    (key, level - cost, now, now + (budget.burst - level + cost) / budget.rate)
+                    for level, (key, budget) in zip(levels, items)
+                ])
+                self._takes += 1
+                if self._takes % self.PRUNE_EVERY == 0:
+                    conn.execute(self.SQL_PRUNE, (now,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return max(wait, 0.0)
+
+
+# Ограничитель частоты: корзина пользователя на его IP-адресе и общая корзина IP-адреса для
+# каждого бюджета маршрута. Пользователь учитывается вместе с IP: под одним логином (admin)
+# работают разные клиенты, и общая корзина логина превратилась бы в один лимит на всех
+class RateLimiter:
+    def __init__(self, buckets, budgets: Dict[str, Budget], ip_factor: float = 4.0):
+        self.buckets = buckets  # MemoryBuckets или SqliteBuckets
+        self.budgets = budgets
+        # За одним IP могут работать несколько пользователей (NAT) - бюджет IP больше
+        self.ip_factor = ip_factor
+
+    def _items(self, budget_name: str, user: str, ip: str):
+        budget = self.budgets[budget_name]
+        return [
+            (f"{budget_name}:user:{user}@{ip}", budget),
+            (f"{budget_name}:ip:{ip}", budget.scaled(self.ip_factor)),
+        ]
+
+    def check(self, budget_name: str, user: str, ip: str) -> float:
+        """0 - запрос разрешён (токен списан), иначе - через сколько секунд его можно повторить."""
+        if budget_name not in self.budgets:  # Бюджет не задан - маршрут не ограничен
+            return 0.0
+        return self.buckets.take(self._items(budget_name, user, ip))
+
+    def exhausted(self, budget_name: str, user: str, ip: str) -> float:
+        """Как check, но без списания: 0 - в корзинах есть токен (например, попытка входа разрешена)."""
+        if budget_name not in self.budgets:
+            return 0.0
+        return self.buckets.take(self._items(budget_name, user, ip), cost=0.0, need=1.0)
+
+
+# Ограничение одновременных операций: не больше max_active сразу и не больше max_waiting в очереди
+class ConcurrencyGate:
+    def __init__(self, max_active: int, max_waiting: int, wait_timeout: float = 10.0):
+        self.max_active = max_active  # Одновременно выполняемые операции
+        self.max_waiting = max_waiting  # Операции, ожидающие свободного места
+        self.wait_timeout = wait_timeout  # Максимальное ожидание места, с
+        self.active = 0
+        self.rejected = 0  # Сколько операций отклонено
+        self.average = 1.0  # Скользящее среднее длительности операции (для Retry-After)
+        self._waiters: deque = deque()  # (цикл событий, future) ожидающих загрузок
+        self._lock = threading.Lock()  # Запросы могут обслуживаться разными циклами событий (TestClient)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """True - место получено (вызвать release), False - очередь полна или ожидание истекло."""
+        with self._lock:
+            if self.active < self.max_active:
+                self.active += 1
+                return True
+            if len(self._waiters) >= self.max_waiting:
+                self.rejected += 1
+                return False
+            waiter = (asyncio.get_running_loop(), asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], self.wait_timeout)
+            return True
+        except BaseException as exc:  # Истекло ожидание или клиент отключился
+            with self._lock:
+                granted = waiter not in self._waiters  # Место передано ровно в этот момент
+                if not granted:
+                    self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                self.rejected += not granted
+                return granted
+            if granted:
+                self.release()
+            raise
+
+    def release(self, duration: Optional[float] = None):
+        if duration is not None:
+            self.average = 0.9 * self.average + 0.1 * duration
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            loop, future = self._waiters.popleft()  # Место переходит первому ожидающему
+        try:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+        except RuntimeError:  # Цикл событий ожидающего уже закрыт - место свободно
+            self.release()
+
+    def retry_after(self) -> int:
+        # Оценка: сколько займут операции, стоящие в очереди
+        return max(1, math.ceil(self.average * (self.waiting + 1) / self.max_active))
+
+
+# ASGI middleware: загрузки проходят через ConcurrencyGate; при полной очереди - сразу 503 с
+# Retry-After, до чтения тела запроса
+class UploadConcurrencyMiddleware:
+    def __init__(self, app, gate: ConcurrencyGate, path_suffix: str = "/upload"):
+        self.app = app  # Следующее ASGI-приложение
+        self.gate = gate
+        self.path_suffix = path_suffix  # Маршруты загрузки оканчиваются на /upload
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT") or not scope["path"].endswith(self.path_suffix):
+            return await self.app(scope, receive, send)
+        if not await self.gate.acquire():
+            response = JSONResponse(
+                {"detail": "Сервер занят обработкой загрузок, повторите позже"},
+                status_code=503,
+                headers={"Retry-After": str(self.gate.retry_after())},
+            )
+            return await response(scope, receive, send)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gate.release(time.perf_counter() - started)
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл ratelimit.py - защита от клиентов, которые слишком часто вызывают маршруты
+#    записи и загрузки (например, зациклившийся фронтенд)
+
+# 2. Класс RateLimiter - token bucket: у каждого бюджета маршрута (upload, write,
+#    demo_users) своя корзина для пары пользователь + IP-адрес и для IP-адреса. Запрос
+#    списывает токен из обеих корзин сразу; если токенов нет - маршрут отвечает 429 с
+#    Retry-After. Бюджет auth расходуют неудачные попытки входа (метод exhausted
+#    проверяет его до проверки пароля, не списывая токен)
+
+# 3. Классы MemoryBuckets и SqliteBuckets - хранение корзин в памяти процесса или в общей
+#    базе SQLite (один лимит на все воркеры uvicorn). Полные корзины не хранятся
+
+# 4. Классы ConcurrencyGate и UploadConcurrencyMiddleware - ограничение одновременных
+#    загрузок на процесс: лишние загрузки ждут в очереди ограниченной длины, остальные
+#    сразу получают 503 с Retry-After. Проверка выполняется до чтения тела, поэтому
+#    отклонённая загрузка не занимает диск и пул потоков
+# */
@@ -0,0 +1,108 @@
+# Полнотекстовый поиск по постам: инвертированный индекс в памяти
+# Модуль для выбора лучших результатов без полной сортировки
+import heapq
+# Модуль математических функций (логарифм для IDF)
+import math
+# Модуль регулярных выражений для разбиения текста на слова
+import re
+# Импорт типов для аннотаций
+from typing import Dict, Hashable, List, Set, Tuple
+
+# Слово - последовательность букв или цифр любого алфавита (кириллица, латиница)
+_WORD = re.compile(r"[^\W_]+")
+
+
+# Разбиение текста на нормализованные слова
+def tokenize(text: str) -> List[str]:
+    # Нижний регистр и "ё" -> "е": "Ёлка" и "елка" находятся одним запросом
+    return _WORD.findall(text.lower().replace("ё", "е"))
+
+
+# Инвертированный индекс: слово -> {id документа: вес}
+class InvertedIndex:
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights  # Вес совпадения в каждом поле (например, заголовок важнее текста)
+        self._postings: Dict[str, Dict[Hashable, float]] = {}  # Слово -> документы с весом слова
+        self._doc_terms: Dict[Hashable, Set[str]] = {}  # Документ -> его слова (для удаления)
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)  # Количество проиндексированных документов
+
+    def add(self, doc_id: Hashable, fields: Dict[str, str]):
+        # Добавление документа (если он уже был - старая версия удаляется)
+        self.remove(doc_id)
+        scores: Dict[str, float] = {}
+        for field, text in fields.items():
+            weight = self.weights.get(field, 1.0)
+            for term in tokenize(text or ""):
+                scores[term] = scores.get(term, 0.0) + weight
+        for term, score in scores.items():
+            self._postings.setdefault(term, {})[doc_id] = score
+        self._doc_terms[doc_id] = set(scores)
+
+    def remove(self, doc_id: Hashable):
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:  # Слово больше не встречается
+                del self._postings[term]
+
+    def candidates(self, query: str) -> Tuple[List[Dict[Hashable, float]], int]:
+        """Копии списков документов для слов запроса (от самого редкого слова) и число документов.
+
+        Это единственная часть поиска, которой нужен доступ к индексу: копирование выполняется
+        под блокировкой хранилища, а ранжирование (rank) - уже без неё.
+        """
+        terms = set(tokenize(query))
+        postings = [self._postings.get(term) for term in terms]
+        if not terms or any(p is None for p in postings):
+            return [], len(self._doc_terms)  # Пустой запрос или слово, которое не встречается нигде
+        postings.sort(key=len)  # Пересечение начинается с самого редкого слова
+        return [dict(p) for p in postings], len(self._doc_terms)
+
+    def search(self, query: str, start: int = 0, limit: int = 20) -> Tuple[int, List[Hashable]]:
+        """Документы, содержащие все слова запроса, по убыванию релевантности (TF-IDF).
+
+        Возвращает общее количество найденных документов и id документов запрошенной страницы.
+        """
+        postings, total_docs = self.candidates(query)
+        return rank(postings, total_docs, start, limit)
+
+
+# Ранжирование по TF-IDF: пересечение списков документов (первый - самого редкого слова)
+def rank(postings: List[Dict[Hashable, float]], total_docs: int, start: int = 0, limit: int = 20) -> Tuple[int, List[Hashable]]:
+    if not postings:
+        return 0, []
+    idf = [math.log(1 + total_docs / len(p)) for p in postings]
+    scored = []
+    for doc_id, first in postings[0].items():
+        score = first * idf[0]
+        for other, weight in zip(postings[1:], idf[1:]):
+            tf = other.get(doc_id)
+            if tf is None:
+                break
+            score += tf * weight
+        else:
+            scored.append((score, doc_id))
+    top = heapq.nlargest(start + limit, scored, key=lambda item: item[0])  # Только нужная часть рейтинга
+    return len(scored), [doc_id for _, doc_id in top[start:]]
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл search.py - поиск по постам для маршрута GET /api/posts/search
+
+# 2. Функция tokenize - разбивает текст на слова с учётом кириллицы: регистр не важен,
+#    "ё" и "е" считаются одной буквой
+
+# 3. Класс InvertedIndex - для каждого слова хранит посты, в которых оно встречается.
+#    Индекс обновляется при каждом сохранении и удалении поста (PostStore в store.py),
+#    поиск не перебирает все посты, а пересекает списки документов слов запроса и
+#    ранжирует результат по TF-IDF с весами полей
+
+# 4. Метод candidates и функция rank - поиск в два шага: под блокировкой хранилища
+#    копируются только списки документов слов запроса, пересечение и ранжирование
+#    выполняются без блокировки и не задерживают запись постов
+# */
@@ -0,0 +1,569 @@
+# Хранилища данных в памяти с поддержкой индексов (вынесены из main.py)
+# Модуль для двоичного поиска в отсортированных списках
+from bisect import bisect_left, bisect_right, insort
+# Модуль для кодирования курсоров пагинации
+import base64
+# Модуль для блокировок при синхронизации между потоками
+import threading
+# Модуль для генерации метки запуска процесса (часть ETag)
+import uuid
+# Модуль для работы с датой и временем
+from datetime import datetime, timezone
+# Менеджеры контекста (одновременная блокировка нескольких объектов)
+from contextlib import ExitStack, contextmanager
+# Функции для работы с итераторами (срез без копирования)
+from itertools import islice
+# Импорт типов для аннотаций
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+# Бэкенд по умолчанию - только память; ошибка нарушения уникальности
+from storage import DuplicateKey, MemoryBackend
+# Полнотекстовый индекс постов
+from search import InvertedIndex, rank
+
+
+# Значение "больше любого другого" - верхняя граница диапазона в индексе
+class _Top:
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+TOP = _Top()
+
+
+# Отсортированный индекс: поддерживает порядок объектов по ключу без пересортировки
+class SortedIndex:
+    def __init__(self, key: Callable[[Any], Any]):
+        self._key = key  # Функция получения ключа сортировки из объекта
+        self._entries: List[Tuple[Any, Hashable]] = []  # Отсортированный список пар (ключ, id)
+        self._keys: Dict[Hashable, Any] = {}  # Текущий ключ каждого объекта (для удаления старой записи)
+
+    def __len__(self) -> int:
+        return len(self._entries)  # Количество проиндексированных объектов
+
+    def add(self, obj_id: Hashable, obj: Any):
+        entry = (self._key(obj), obj_id)  # Новая запись индекса
+        old_key = self._keys.get(obj_id)  # Предыдущий ключ объекта (если был)
+        if obj_id in self._keys:
+            if old_key == entry[0]:
+                return  # Ключ не изменился - индекс трогать не нужно
+            self.remove(obj_id)  # Удаление устаревшей записи
+        # Новые записи почти всегда попадают в конец (время создания растёт)
+        if not self._entries or self._entries[-1] < entry:
+            self._entries.append(entry)
+        else:
+            insort(self._entries, entry)  # Вставка с сохранением порядка за O(log n) поиска
+        self._keys[obj_id] = entry[0]
+
+    def remove(self, obj_id: Hashable):
+        if obj_id not in self._keys:  # Объект не проиндексирован
+            return
+        entry = (self._keys.pop(obj_id), obj_id)  # Восстановление записи индекса
+        pos = bisect_left(self._entries, entry)  # Поиск позиции записи двоичным поиском
+        if pos < len(self._entries) and self._entries[pos] == entry:
+            del self._entries[pos]  # Удаление записи
+
+    def position_after(self, key: Any, obj_id: Hashable) -> int:
+        # Позиция первой записи строго после (key, obj_id) - O(log n)
+        return bisect_right(self._entries, (key, obj_id))
+
+    def ids(self, start: int = 0, stop: Optional[int] = None) -> List[Hashable]:
+        # Срез идентификаторов по позициям без копирования всего индекса
+        return [obj_id for _, obj_id in self._entries[start:stop]]
+
+    def entry_at(self, pos: int) -> Tuple[Any, Hashable]:
+        return self._entries[pos]  # Запись индекса по позиции
+
+    def bounds(self, low: Any = None, high: Any = None) -> Tuple[int, int]:
+        # Позиции записей с low <= ключ <= high (None - без ограничения) за O(log n)
+        lo = bisect_left(self._entries, (low,)) if low is not None else 0
+        hi = bisect_right(self._entries, (high, TOP)) if high is not None else len(self._entries)
+        return lo, max(lo, hi)
+
+    def iter_ids(self, lo: int, hi: int, reverse: bool = False) -> Iterator[Hashable]:
+        # Ленивый обход диапазона позиций (без копирования списка)
+        positions = range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)
+        for pos in positions:
+            try:
+                yield self._entries[pos][1]
+            except IndexError:  # Индекс укоротился во время обхода (параллельное удаление)
+                return
+
+
+# Количество блокировок объектов в хранилище (объект получает одну из них по хешу ключа)
+LOCK_STRIPES = 64
+
+
+# Ошибка разбора курсора пагинации
+class InvalidCursor(ValueError):
+    pass
+
+
+# Базовое хранилище: словарь объектов с сохранением изменений в бэкенд (storage.py)
+class Store:
+    # Поля, по которым поддерживается сортировка: имя поля -> ключ сортировки
+    sort_fields: Dict[str, Callable[[Any], Any]] = {}
+
+    def __init__(self, name: str, model=None, backend=None):
+        self.name = name  # Имя коллекции в бэкенде
+        self.model = model  # Модель Pydantic для восстановления записей
+        self.backend = backend or MemoryBackend()  # Бэкенд хранения (по умолчанию только память)
+        self._items: Dict[Hashable, Any] = {}  # Объекты по идентификатору
+        # Индексы для сортировки по полям sort_fields (поле -> функция ключа)
+        self._sorted = {field: SortedIndex(key=key) for field, key in self.sort_fields.items()}
+        # Функция, вызываемая при применении изменений других процессов: (старый, новый объект)
+        self.on_remote_change: Optional[Callable[[Any, Any], None]] = None
+        self._sync_lock = threading.Lock()  # Один поток применяет изменения других процессов
+        # Короткая блокировка словаря, индексов и версий (запись в бэкенд выполняется без неё)
+        self._lock = threading.RLock()
+        # Блокировки объектов: изменения разных объектов не ждут друг друга, одного - идут по очереди
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        self._id_lock = threading.Lock()  # Выдача id (счётчик и его сохранение в бэкенде)
+        # Ревизия, до которой применены изменения общей базы (только для shared-бэкендов)
+        self._rev = self.backend.revision(name) if self.backend.shared else 0
+        # Загрузка сохранённых записей (для MemoryBackend - пусто)
+        for key, record in self.backend.records(name).items():
+            obj = self.model.model_validate(record)
+            self._items[key] = obj
+            self._index(key, obj)
+        # Счётчик для генерации числовых идентификаторов (не меньше наибольшего сохранённого id:
+        # значение счётчика в журнале могло не успеть сохраниться, если запись с ним не состоялась)
+        self._counter = max([self.backend.meta(f"{name}.counter", 0)] + [k for k in self._items if isinstance(k, int)])
+        # Версия коллекции: увеличивается при каждом изменении (основа ETag без хеширования списка)
+        self.version = 0
+        self.last_modified = datetime.now(timezone.utc)  # Время последнего изменения коллекции
+        self._revs: Dict[Hashable, int] = {}  # Версия коллекции на момент последнего изменения объекта
+        self._epoch = uuid.uuid4().hex[:8]  # Метка процесса: версии после перезапуска не совпадут со старыми
+        self._json: Dict[Hashable, bytes] = {}  # Кеш JSON объектов (сбрасывается при изменении)
+
+    # --- Интерфейс словаря (совместим с прежними *_db: dict) ---
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def __getitem__(self, key: Hashable):
+        return self._items[key]
+
+    def __setitem__(self, key: Hashable, obj):
+        # Сохранение (или повторное сохранение после изменения) объекта с обновлением индексов
+        with self.locked(key):
+            claims = self._claim(key, obj)  # Уникальные значения занимаются до записи (DuplicateKey)
+            try:
+                if self.backend.persistent:
+                    self.backend.put(self.name, key, obj.model_dump(mode="json"), unique=self._unique_values(obj))
+            except BaseException:
+                self._release(key, claims)
+                raise
+            with self._lock:
+                self._items[key] = obj
+                self._index(key, obj)
+                self._touch(key)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self._items))  # Снимок ключей: словарь может меняться в других потоках
+
+    def get(self, key: Hashable, default=None):
+        return self._items.get(key, default)
+
+    def values(self) -> List[Any]:
+        return list(self._items.values())  # Снимок (безопасен при параллельных изменениях)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        return list(self._items.items())
+
+    def pop(self, key: Hashable):
+        with self.locked(key):
+            obj = self._items[key]  # KeyError если объекта нет (или его уже удалил другой поток)
+            if self.backend.persistent:
+                self.backend.delete(self.name, key)
+            with self._lock:
+                del self._items[key]
+                self._unindex(key, obj)
+                self._touch(key)
+                self._revs.pop(key, None)
+            return obj
+
+    # --- Блокировки ---
+    def locked(self, key: Hashable) -> threading.RLock:
+        """Блокировка объекта key для чтения-изменения-записи: with store.locked(key): ..."""
+        return self._stripes[hash(key) % LOCK_STRIPES]
+
+    @contextmanager
+    def locked_many(self, keys):
+        # Блокировки нескольких объектов, каждая берётся один раз и всегда в одном порядке
+        with ExitStack() as stack:
+            for stripe in sorted({hash(key) % LOCK_STRIPES for key in keys}):
+                stack.enter_context(self._stripes[stripe])
+            yield
+
+    def save(self, obj):
+        self[obj.id] = obj  # Сохранение объекта под его собственным id
+
+    def save_many(self, objs: List[Any]):
+        """Сохранение пакета объектов: одна запись в бэкенд на весь пакет.
+
+        Если бэкенд отклонил пакет (например, DuplicateKey), в памяти ничего не меняется.
+        """
+        with self.locked_many(obj.id for obj in objs):  # Блокировки берутся один раз на пакет
+            claims = []
+            try:
+                for obj in objs:
+                    claims.append((obj.id, self._claim(obj.id, obj)))
+                if self.backend.persistent:
+                    self.backend.put_many(
+                        self.name, [(obj.id, obj.model_dump(mode="json"), self._unique_values(obj)) for obj in objs]
+                    )
+            except BaseException:
+                for key, claim in claims:
+                    self._release(key, claim)
+                raise
+            with self._lock:
+                for obj in objs:
+                    self._items[obj.id] = obj
+                    self._index(obj.id, obj)
+                    self._touch(obj.id)
+
+    def next_id(self) -> int:
+        return self.next_ids(1)[0]  # Следующий числовой идентификатор
+
+    def next_ids(self, count: int) -> List[int]:
+        # Диапазон идентификаторов: счётчик увеличивается один раз (значение сохраняется в бэкенде)
+        if count <= 0:
+            return []
+        with self._id_lock:  # Два потока не получат один id, значения сохраняются по порядку
+            if self.backend.shared:  # Общий счётчик для всех процессов: атомарное увеличение в базе
+                last = self.backend.increment(f"{self.name}.counter", count)
+                self._counter = max(self._counter, last)
+            else:
+                self._counter += count
+                last = self._counter
+                if self.backend.persistent:
+                    # Без ожидания fsync (блокировка id не держится на время записи на диск):
+                    # счётчик сохранится вместе с записью объекта с этим id
+                    self.backend.set_meta(f"{self.name}.counter", last)
+        return list(range(last - count + 1, last + 1))
+
+    def sync(self):
+        """Применяет изменения, сделанные другими процессами (для общего бэкенда sqlite)."""
+        if not self.backend.shared:
+            return
+        with self._sync_lock:
+            for key, record, rev in self.backend.changes(self.name, self._rev):
+                self._rev = rev
+                new = self.model.model_validate(record) if record is not None else None
+                # Блокировка объекта: изменение этого процесса либо уже применено целиком, либо ещё не начато
+                with self.locked(key):
+                    with self._lock:
+                        old = self._items.get(key)
+                        if old is None and new is None:
+                            continue  # Удаление уже применено
+                        if old is not None and new is not None and old.model_dump(mode="json") == record:
+                            continue  # Собственное изменение этого процесса
+                        if new is None:  # Запись удалена
+                            del self._items[key]
+                            self._unindex(key, old)
+                        else:
+                            self._items[key] = new
+                            self._index(key, new)
+                        self._touch(key)
+                        if new is None:
+                            self._revs.pop(key, None)
+                    if self.on_remote_change is not None:
+                        self.on_remote_change(old, new)
+
+    # --- Версии для условных GET-запросов ---
+    def _touch(self, key: Hashable):
+        self.version += 1
+        self._revs[key] = self.version
+        self.last_modified = datetime.now(timezone.utc)
+        self._json.pop(key, None)  # Закешированный JSON объекта устарел
+
+    # --- Быстрая сериализация ---
+    def json_bytes(self, key: Hashable, obj=None) -> bytes:
+        # JSON объекта: сериализуется один раз после каждого изменения
+        data = self._json.get(key)
+        if data is None:
+            obj = obj if obj is not None else self._items[key]
+            data = obj.model_dump_json().encode()
+            with self._lock:
+                if self._items.get(key) is obj:  # Кешируется только текущая версия объекта
+                    self._json[key] = data
+        return data
+
+    def json_list(self, objs) -> bytes:
+        # JSON-массив из закешированных объектов (без повторной валидации и сериализации)
+        return b"[" + b",".join(self.json_bytes(obj.id, obj) for obj in objs) + b"]"
+
+    def etag(self, key: Optional[Hashable] = None) -> str:
+        # ETag коллекции (key=None) или отдельного объекта - по счётчику версий, без сериализации
+        version = self.version if key is None else self._revs.get(key, 0)
+        return f'W/"{self.name}-{self._epoch}-{version}"'
+
+    # --- Выборка по индексам ---
+    def scan(self, index: SortedIndex, lo: int, hi: int, descending: bool = False, start: int = 0,
+             limit: Optional[int] = None, predicate: Optional[Callable[[Any], bool]] = None):
+        """Общее количество и ленивый итератор объектов страницы из диапазона позиций индекса.
+
+        Без predicate количество известно сразу (hi - lo). С predicate диапазон обходится
+        дважды (подсчёт и выдача страницы), но ничего не копируется и не сортируется.
+        """
+        start = max(start, 0)
+        stop = start + limit if limit is not None and limit > 0 else None
+        objects = (self._items.get(key) for key in index.iter_ids(lo, hi, reverse=descending))
+        objects = (obj for obj in objects if obj is not None)
+        if predicate is None:
+            return hi - lo, islice(objects, start, stop)
+        total = sum(1 for obj in objects if predicate(obj))
+        matched = (obj for obj in (self._items.get(key) for key in index.iter_ids(lo, hi, reverse=descending))
+                   if obj is not None and predicate(obj))
+        return total, islice(matched, start, stop)
+
+    def sorted_page(self, sort: str, descending: bool = False, start: int = 0, limit: Optional[int] = None):
+        # Страница, отсортированная по полю sort (из sort_fields) без сортировки коллекции
+        index = self._sorted[sort]
+        return self.scan(index, 0, len(index), descending, start, limit)
+
+    # --- Точки расширения для уникальных значений ---
+    def _claim(self, key: Hashable, obj):
+        """Занимает уникальные значения объекта до записи в бэкенд (DuplicateKey - заняты другим)."""
+        return None
+
+    def _release(self, key: Hashable, claim):
+        pass  # Освобождение значений, занятых _claim, если запись не удалась
+
+    # --- Точки расширения для индексов ---
+    def _index(self, key: Hashable, obj):
+        for index in self._sorted.values():
+            index.add(key, obj)
+
+    def _unindex(self, key: Hashable, obj):
+        for index in self._sorted.values():
+            index.remove(key)
+
+    def _unique_values(self, obj) -> Optional[Dict[str, str]]:
+        return None  # Значения полей, уникальных в пределах коллекции
+
+
+# Хранилище постов: словарь по id + индексы по полям и полнотекстовый индекс
+class PostStore(Store):
+    sort_fields = {
+        "created_at": lambda p: p.created_at,
+        "updated_at": lambda p: p.updated_at,
+        "title": lambda p: p.title.casefold(),
+        "author": lambda p: p.author.casefold(),
+    }
+
+    def __init__(self, name: str = "posts", model=None, backend=None):
+        # Посты автора по каждому полю сортировки: (автор, ключ поля) - фильтр по автору без перебора
+        self._by_author = {
+            field: SortedIndex(key=lambda p, key=key: (p.author.casefold(), key(p)))
+            for field, key in self.sort_fields.items()
+        }
+        # Поиск по словам заголовка, текста и автора (совпадение в заголовке весит больше)
+        self._search = InvertedIndex(weights={"title": 3.0, "author": 2.0, "content": 1.0})
+        super().__init__(name, model, backend)
+        self._by_created = self._sorted["created_at"]  # Порядок по дате создания (пагинация курсором)
+
+    def _index(self, post_id: str, post):
+        super()._index(post_id, post)
+        for index in self._by_author.values():
+            index.add(post_id, post)
+        self._search.add(post_id, {"title": post.title, "content": post.content, "author": post.author})
+
+    def _unindex(self, post_id: str, post):
+        super()._unindex(post_id, post)
+        for index in self._by_author.values():
+            index.remove(post_id)
+        self._search.remove(post_id)
+
+    def query(
+        self,
+        author: Optional[str] = None,
+        created: Tuple[Optional[datetime], Optional[datetime]] = (None, None),
+        updated: Tuple[Optional[datetime], Optional[datetime]] = (None, None),
+        sort: str = "created_at",
+        descending: bool = False,
+        start: int = 0,
+        limit: Optional[int] = None,
+    ):
+        """Фильтрация по автору и диапазонам дат с сортировкой по любому полю из sort_fields.
+
+        Автор и диапазон по полю сортировки выбираются двоичным поиском в индексе,
+        диапазон по второй дате (если задан) проверяется при обходе выбранного диапазона.
+        """
+        ranges = {"created_at": created, "updated_at": updated}
+        low, high = ranges.get(sort, (None, None))  # Диапазон по самому полю сортировки
+        if author is not None:
+            # Индекс (автор, поле): посты автора уже упорядочены по полю сортировки
+            index, prefix = self._by_author[sort], (author.casefold(),)
+            lo, hi = index.bounds(prefix + ((low,) if low is not None else ()), prefix + (high if high is not None else TOP,))
+        else:
+            index = self._sorted[sort]
+            lo, hi = index.bounds(low, high)
+        # Диапазоны дат, не покрытые индексом
+        checks = [
+            (field, low, high) for field, (low, high) in ranges.items()
+            if field != sort and (low is not None or high is not None)
+        ]
+        predicate = None
+        if checks:
+            def predicate(post):
+                for field, low, high in checks:
+                    value = getattr(post, field)
+                    if (low is not None and value < low) or (high is not None and value > high):
+                        return False
+                return True
+        return self.scan(index, lo, hi, descending, start, limit, predicate)
+
+    def search(self, query: str, start: int = 0, limit: int = 20):
+        # Найденные посты по убыванию релевантности и общее количество совпадений
+        # Индекс меняется при каждой записи: под блокировкой хранилища копируются только списки
+        # документов слов запроса, ранжирование - без блокировки
+        with self._lock:
+            postings, total_docs = self._search.candidates(query)
+        total, ids = rank(postings, total_docs, start=max(start, 0), limit=limit)
+        posts = (self._items.get(pid) for pid in ids)
+        return [post for post in posts if post is not None], total  # Удалённые после поиска пропускаются
+
+    # --- Пагинация ---
+    @staticmethod
+    def encode_cursor(created_at: datetime, post_id: str) -> str:
+        # Непрозрачный курсор: дата создания и id последнего отданного поста
+        raw = f"{created_at.isoformat()}|{post_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            created, post_id = raw.split("|", 1)
+            return datetime.fromisoformat(created), post_id
+        except Exception as exc:
+            raise InvalidCursor(cursor) from exc
+
+    def page(self, start: int = 0, limit: Optional[int] = None, cursor: Optional[str] = None):
+        """Страница постов по возрастанию created_at и курсор следующей страницы.
+
+        Позиция находится за O(log n) (двоичный поиск по курсору) или O(1) (смещение),
+        после чего копируются только limit элементов.
+        """
+        pos = 0  # Начальная позиция в индексе
+        if cursor:  # Продолжение с места, на котором остановилась прошлая страница
+            created_at, post_id = self.decode_cursor(cursor)
+            pos = self._by_created.position_after(created_at, post_id)
+        pos += max(start, 0)  # Дополнительное смещение _start
+        stop = pos + limit if limit is not None and limit > 0 else None  # Конец среза
+        with self._lock:  # Срез индекса и объекты - из одного состояния (параллельное удаление не мешает)
+            posts = [self._items[pid] for pid in self._by_created.ids(pos, stop)]
+            next_cursor = None  # Курсор следующей страницы (если она есть)
+            if posts and stop is not None and stop < len(self._by_created):
+                last_key, last_id = self._by_created.entry_at(stop - 1)
+                next_cursor = self.encode_cursor(last_key, last_id)
+        return posts, next_cursor
+
+
+# Хранилище пользователей: словарь по id + хеш-индекс email -> id + индексы для сортировки
+class UserStore(Store):
+    sort_fields = {
+        "id": lambda u: u.id,
+        "name": lambda u: u.name.casefold(),
+        "email": lambda u: u.email.casefold(),
+    }
+
+    def __init__(self, name: str = "users", model=None, backend=None):
+        self._by_email: Dict[str, int] = {}  # Индекс нормализованного email -> id
+        self._email_of: Dict[int, str] = {}  # Проиндексированный email каждого пользователя
+        super().__init__(name, model, backend)
+
+    @staticmethod
+    def normalize_email(email: str) -> str:
+        return email.strip().lower()  # Email сравниваются без учёта регистра и пробелов по краям
+
+    def _index(self, user_id: int, user):
+        super()._index(user_id, user)
+        key = self.normalize_email(user.email)
+        old_key = self._email_of.get(user_id)
+        if old_key is not None and old_key != key and self._by_email.get(old_key) == user_id:
+            del self._by_email[old_key]  # Email изменился - удаляем старую запись индекса
+        self._by_email[key] = user_id
+        self._email_of[user_id] = key
+
+    def _unindex(self, user_id: int, user):
+        super()._unindex(user_id, user)
+        key = self._email_of.pop(user_id)
+        if self._by_email.get(key) == user_id:
+            del self._by_email[key]  # Освобождение email
+
+    def _claim(self, user_id: int, user) -> Optional[str]:
+        # Проверка и занятие email одной операцией: два потока не создадут одинаковый email
+        key = self.normalize_email(user.email)
+        with self._lock:
+            owner = self._by_email.get(key)
+            if owner is not None and owner != user_id:
+                raise DuplicateKey(self.name)
+            if owner is None:
+                self._by_email[key] = user_id
+                return key
+        return None
+
+    def _release(self, user_id: int, key: Optional[str]):
+        with self._lock:
+            if key is not None and self._by_email.get(key) == user_id and self._email_of.get(user_id) != key:
+                del self._by_email[key]
+
+    def _unique_values(self, user) -> Optional[Dict[str, str]]:
+        return {"email": self.normalize_email(user.email)}  # Общий бэкенд тоже проверяет уникальность email
+
+    # --- Уникальность email за O(1) ---
+    def find_by_email(self, email: str) -> Optional[int]:
+        return self._by_email.get(self.normalize_email(email))  # id владельца email или None
+
+    def email_taken(self, email: str, exclude_id: Optional[int] = None) -> bool:
+        owner = self.find_by_email(email)
+        return owner is not None and owner != exclude_id  # Email занят другим пользователем
+
+# /*
+# ===========================================
+# ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
+# ===========================================
+
+# 1. Файл store.py - хранилища данных в памяти, которые используются в main.py
+
+# 2. Класс SortedIndex - отсортированный список пар (ключ, id). Вставка новых постов
+#    обычно попадает в конец списка, удаление и поиск выполняются двоичным поиском
+
+# 3. Класс Store - базовое хранилище с интерфейсом dict, поэтому маршруты работают с ним
+#    так же, как раньше со словарями. Каждое изменение передаётся в бэкенд хранения
+#    (storage.py). После изменения объекта на месте его нужно сохранить заново
+#    (posts_db[post_id] = post или posts_db.save(post)), чтобы обновить индексы и бэкенд.
+#    Метод next_id выдаёт числовые id (замена глобального счётчика user_counter).
+#    Метод sync подтягивает изменения других процессов при общем бэкенде (sqlite).
+#    Счётчик version и время last_modified меняются при каждом изменении коллекции,
+#    метод etag строит по ним ETag коллекции или объекта без сериализации данных.
+#    Методы json_bytes / json_list отдают JSON объектов из кеша, который сбрасывается
+#    при каждом изменении объекта (быстрый режим ответов FAST_JSON в main.py).
+#    Методы save_many / next_ids - пакетное сохранение и выдача диапазона id для
+#    маршрутов :batch (одна запись в бэкенд и одно увеличение счётчика на пакет).
+#    Потокобезопасность: у каждого объекта своя блокировка (одна из LOCK_STRIPES, метод
+#    locked), словарь и индексы меняются под короткой общей блокировкой, запись в бэкенд
+#    идёт без неё. Поэтому изменения разных объектов не выстраиваются в одну очередь.
+#    Маршруты выполняют чтение-изменение-запись под with store.locked(key)
+
+# 4. Класс PostStore - хранилище постов (posts_db) с индексом по дате создания и
+#    полнотекстовым индексом (search.py), метод search - поиск с ранжированием.
+#    Метод query - фильтры по автору и датам и сортировка по полям sort_fields через
+#    вторичные индексы (индексы каждого поля сортировки и индексы (автор, поле)).
+#    Метод page - пагинация по _start/_limit и по непрозрачному курсору без
+#    сортировки и копирования всех постов на каждый запрос
+
+# 5. Класс UserStore - замена словаря users_db с индексом email -> id. Проверка
+#    уникальности email выполняется за O(1) вместо перебора всех пользователей,
+#    email сравниваются без учёта регистра. Email занимается (_claim) до записи в бэкенд,
+#    поэтому два одновременных запроса не создадут одинаковый email. Метод sorted_page - страница пользователей,
+#    отсортированная по id, имени или email
+# */
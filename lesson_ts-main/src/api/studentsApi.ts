@@ -1,12 +1,27 @@
 // Импорт библиотеки axios для выполнения HTTP-запросов к серверу
 import axios from "axios";
 // Импорт типов Student и AttendStatus из файла с типами для использования в функциях API
-import type { Student, AttendStatus } from "../shared/types/Student";
+import type { Student, AttendStatus, StudentChange } from "../shared/types/Student";
 
 // Определение базового URL для API студентов
 const API_URL = "http://localhost:8000/api/students";
 // Определение учетных данных для базовой HTTP-аутентификации
 const auth = { username: "admin", password: "123" };
+// Пауза перед повторным подключением к ленте событий после ошибки (мс)
+const EVENTS_RETRY_MS = 3000;
+
+// Обработчики событий ленты изменений студентов
+export interface StudentEventHandlers {
+    onSnapshot: (students: Student[]) => void;       // Полный список (первое событие подключения)
+    onChanges: (changes: StudentChange[]) => void;   // Изменённые поля студентов
+}
+
+// Получение короткоживущего токена ленты событий: POST-запрос с базовой аутентификацией,
+// сервер возвращает { token, expires_in }
+const getEventsToken = async (): Promise<string> => {
+    const { data } = await axios.post<{ token: string }>(`${API_URL}/events/token`, null, { auth });
+    return data.token;
+};
 
 // Создание и экспорт объекта studentsApi с методами для работы со студентами
 export const studentsApi = {
@@ -54,6 +69,63 @@ export const studentsApi = {
         // Возвращение обновленного студента
         return data;
     },
+
+    // Метод для получения короткоживущего токена подключения к ленте событий
+    // (EventSource не умеет отправлять заголовок Authorization, поэтому токен передаётся в адресе)
+    getEventsToken,
+
+    // Метод для подписки на ленту изменений студентов (Server-Sent Events)
+    // Возвращает функцию отписки (закрывает соединение и отменяет повторные подключения)
+    subscribeEvents: (handlers: StudentEventHandlers): (() => void) => {
+        let source: EventSource | null = null;                            // Текущее соединение
+        let lastSeq: string | null = null;                                // Номер последнего полученного события
+        let retry: ReturnType<typeof setTimeout> | undefined;             // Таймер повторного подключения
+        let closed = false;                                               // Флаг отписки
+
+        // Повторное подключение с новым токеном через паузу
+        const reconnect = () => {
+            source?.close();
+            source = null;
+            if (!closed) retry = setTimeout(connect, EVENTS_RETRY_MS);
+        };
+
+        // Подключение: новый токен, затем EventSource с токеном и номером последнего события
+        const connect = async () => {
+            let token: string;
+            try {
+                token = await getEventsToken();
+            } catch {
+                reconnect();                                              // Сервер недоступен - повтор позже
+                return;
+            }
+            if (closed) return;                                           // Отписались, пока ждали токен
+            const params = new URLSearchParams({ token });
+            if (lastSeq) params.set("since", lastSeq);                    // Сервер дошлёт пропущенные события
+            source = new EventSource(`${API_URL}/events?${params}`);
+            source.addEventListener("snapshot", (e: MessageEvent) => {
+                lastSeq = e.lastEventId || lastSeq;
+                handlers.onSnapshot(JSON.parse(e.data));
+            });
+            source.addEventListener("students", (e: MessageEvent) => {
+                lastSeq = e.lastEventId || lastSeq;
+                handlers.onChanges(JSON.parse(e.data));
+            });
+            // Сервер отключил клиента, который не успевал читать события
+            source.addEventListener("evicted", reconnect);
+            // Браузер сам переподключается с тем же адресом; если это не удалось
+            // (например, токен уже просрочен - ответ 401), соединение закрыто, нужен новый токен
+            source.onerror = () => {
+                if (source?.readyState === EventSource.CLOSED) reconnect();
+            };
+        };
+
+        connect();
+        return () => {
+            closed = true;
+            clearTimeout(retry);
+            source?.close();
+        };
+    },
 };
 
 /*
@@ -138,6 +210,15 @@ export const studentsApi = {
 26. Комментарий "Передача объекта с полем online в теле запроса" - 
     объясняет передачу данных в теле PUT-запроса
 
+27. Комментарий "Метод для получения короткоживущего токена подключения к ленте событий" - 
+    поясняет метод getEventsToken: браузерный EventSource не может передать заголовок
+    Authorization, поэтому токен выдаётся по базовой аутентификации и передаётся в адресе
+
+28. Комментарий "Метод для подписки на ленту изменений студентов (Server-Sent Events)" - 
+    описывает метод subscribeEvents: событие snapshot содержит полный список, события
+    students - только изменённые поля. При переподключении запрашивается новый токен,
+    а номер последнего события передаётся в параметре since (пропущенные события досылаются)
+
 ОСОБЕННОСТИ РЕАЛИЗАЦИИ:
 
 - Использует базовую HTTP-аутентификацию для всех запросов
@@ -150,7 +231,8 @@ export const studentsApi = {
 СТРУКТУРА МОДУЛЯ:
 
 - Константы API_URL и auth для конфигурации
-- Объект studentsApi с четырьмя методами: getStudents, updateAttend, updateGrade, updateOnline
+- Объект studentsApi с методами getStudents, updateAttend, updateGrade, updateOnline,
+  getEventsToken и subscribeEvents (лента изменений)
 - Каждый метод update соответствует определенному аспекту данных студента
 
 ИСПОЛЬЗОВАНИЕ:
@@ -14,7 +14,11 @@ import {
     selectStudentsLoading,    // селектор для получения статуса загрузки
     selectStudentsError,      // селектор для получения ошибок
     clearStudentsError,       // действие для очистки ошибок студентов
+    studentsSnapshotReceived, // действие для полного списка из ленты событий
+    studentsChanged,          // действие для изменений из ленты событий
 } from "../store/slices/studentsSlice";
+// Импорт API студентов для подписки на ленту изменений
+import { studentsApi } from "../api/studentsApi";
 // Импорт типа AppDispatch для типизации dispatch
 import type { AppDispatch } from "../store/store";
 // Импорт типов Student и AttendStatus для типизации
@@ -53,6 +57,15 @@ const StudentsPage: React.FC = () => {
         dispatch(fetchStudents());
     }, [dispatch]); // Зависимость от dispatch
 
+    // Эффект для подписки на ленту изменений: правки с других устройств видны без перезагрузки
+    useEffect(() => {
+        const unsubscribe = studentsApi.subscribeEvents({
+            onSnapshot: (list) => dispatch(studentsSnapshotReceived(list)),
+            onChanges: (changes) => dispatch(studentsChanged(changes)),
+        });
+        return unsubscribe; // Отписка при размонтировании компонента
+    }, [dispatch]);
+
     /**
      * Обработчик изменения статуса присутствия студента
      * @param id - идентификатор студента
@@ -280,6 +293,12 @@ export default StudentsPage;
 19. Комментарий "Ячейка с полем ввода оценки" - поясняет
     числовое поле ввода для оценки студента
 
+20. Комментарий "Эффект для подписки на ленту изменений..." - описывает подписку на
+    Server-Sent Events сервера (studentsApi.subscribeEvents) и отписку при размонтировании
+
+21. Комментарий "Импорт API студентов для подписки на ленту изменений" - поясняет
+    импорт studentsApi, используемого эффектом подписки
+
 ОСОБЕННОСТИ РЕАЛИЗАЦИИ:
 
 - Использование таблицы для отображения списка студентов
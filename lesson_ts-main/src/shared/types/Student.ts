@@ -19,6 +19,9 @@ export interface Student {
     online: boolean;
 }
 
+// Экспорт типа StudentChange: изменение студента из ленты событий (id и только изменённые поля)
+export type StudentChange = Partial<Student> & { id: number };
+
 /*
 ===========================================
 ПОЯСНЕНИЯ К КОММЕНТАРИЯМ В ДАННОМ ФАЙЛЕ:
@@ -47,6 +50,9 @@ export interface Student {
 8. Комментарий "Флаг онлайн-статуса студента (булевый тип)..." - описывает
    свойство online как булево значение, указывающее онлайн статус студента
 
+9. Комментарий "Экспорт типа StudentChange..." - описывает тип изменения из ленты
+   событий сервера (GET /api/students/events): id студента и только изменённые поля
+
 ОСОБЕННОСТИ РЕАЛИЗАЦИИ:
 
 - Тип AttendStatus представляет собой union type с тремя возможными значениями
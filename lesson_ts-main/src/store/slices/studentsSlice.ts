@@ -1,7 +1,7 @@
 // Импорт функции createAsyncThunk и createSlice из Redux Toolkit для создания асинхронных действий и среза состояния
-import { createAsyncThunk, createSlice } from "@reduxjs/toolkit";
+import { createAsyncThunk, createSlice, type PayloadAction } from "@reduxjs/toolkit";
 // Импорт TypeScript типов Student и AttendStatus для типизации данных студента и статуса посещаемости
-import type { Student, AttendStatus } from "../../shared/types/Student";
+import type { Student, AttendStatus, StudentChange } from "../../shared/types/Student";
 // Импорт API функций для работы с данными студентов
 import { studentsApi } from "../../api/studentsApi";
 // Импорт типа RootState для типизированных селекторов состояния всего хранилища
@@ -84,6 +84,15 @@ export const studentsSlice = createSlice({
     reducers: {
         // Редюсер для очистки ошибки в состоянии студентов
         clearStudentsError: (state) => { state.error = null; },
+        // Редюсер для полного списка из ленты событий (событие snapshot при подключении)
+        studentsSnapshotReceived: (state, action: PayloadAction<Student[]>) => { state.students = action.payload; },
+        // Редюсер для изменений из ленты событий: к студенту применяются только пришедшие поля
+        studentsChanged: (state, action: PayloadAction<StudentChange[]>) => {
+            for (const change of action.payload) {
+                const student = state.students.find((s) => s.id === change.id);
+                if (student) Object.assign(student, change);
+            }
+        },
     },
     // Обработчики для асинхронных действий (extraReducers)
     extraReducers: (builder) => {
@@ -114,8 +123,8 @@ export const studentsSlice = createSlice({
     },
 });
 
-// Экспорт действия clearStudentsError
-export const { clearStudentsError } = studentsSlice.actions;
+// Экспорт синхронных действий (очистка ошибки и события ленты изменений)
+export const { clearStudentsError, studentsSnapshotReceived, studentsChanged } = studentsSlice.actions;
 
 // Селектор для получения всех студентов из состояния
 export const selectAllStudents = (state: RootState) => state.students.students;
@@ -173,11 +182,15 @@ export const selectStudentsError = (state: RootState) => state.students.error;
 15. Комментарий "Вспомогательная функция для замены студента в массиве по ID..." - объясняет
     утилитарную функцию для обновления массива студентов
 
-16. Комментарий "Экспорт действия clearStudentsError..." - поясняет экспорт синхронного действия
+16. Комментарий "Экспорт синхронных действий..." - поясняет экспорт синхронных действий
 
 17. Комментарий "Селектор для получения всех студентов из состояния..." - описывает
     создание типизированных функций для извлечения данных из состояния
 
+18. Комментарии "Редюсер для полного списка из ленты событий..." и "Редюсер для изменений
+    из ленты событий..." - описывают действия studentsSnapshotReceived и studentsChanged,
+    которые применяют события ленты GET /api/students/events (studentsApi.subscribeEvents)
+
 ОСОБЕННОСТИ РЕАЛИЗАЦИИ:
 
 - Использование createAsyncThunk для асинхронных операций с студентами